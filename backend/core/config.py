@@ -14,7 +14,72 @@ class Settings(BaseSettings):
     SYN_MODEL_API_KEY : str = os.getenv('SYN_MODEL_API_KEY', 'your_SYN_MODEL_API_KEY')
     VECTOR_STORE_PATH : str = os.getenv('VECTOR_STORE_PATH', './vector_store/faiss_index')
     METADATA_PATH : str = os.getenv('METADATA_PATH', './vector_store/metadata.pkl')
+    VECTOR_STORE_COMPACT_EVERY: int = int(os.getenv('VECTOR_STORE_COMPACT_EVERY', 50))
+    VECTOR_STORE_LOAD_MODE: str = os.getenv('VECTOR_STORE_LOAD_MODE', 'memory')
+    VECTOR_STORE_RELOAD_CHECK_SECONDS: float = float(os.getenv('VECTOR_STORE_RELOAD_CHECK_SECONDS', 2))
+    HYBRID_RETRIEVAL_ENABLED: bool = os.getenv('HYBRID_RETRIEVAL_ENABLED', 'true').lower() == 'true'
+    RETRIEVAL_CANDIDATES: int = int(os.getenv('RETRIEVAL_CANDIDATES', 20))
+    RRF_K: int = int(os.getenv('RRF_K', 60))
+    CLASSIFIER_TOPIC_FILTER_ENABLED: bool = os.getenv('CLASSIFIER_TOPIC_FILTER_ENABLED', 'true').lower() == 'true'
+    VECTOR_INDEX_TYPE: str = os.getenv('VECTOR_INDEX_TYPE', 'flat')
+    VECTOR_HNSW_M: int = int(os.getenv('VECTOR_HNSW_M', 32))
+    VECTOR_HNSW_EF_CONSTRUCTION: int = int(os.getenv('VECTOR_HNSW_EF_CONSTRUCTION', 200))
+    VECTOR_HNSW_EF_SEARCH: int = int(os.getenv('VECTOR_HNSW_EF_SEARCH', 64))
+    VECTOR_IVF_NLIST: int = int(os.getenv('VECTOR_IVF_NLIST', 0))
+    VECTOR_IVF_NPROBE: int = int(os.getenv('VECTOR_IVF_NPROBE', 16))
+    VECTOR_PQ_M: int = int(os.getenv('VECTOR_PQ_M', 64))
+    VECTOR_PQ_NBITS: int = int(os.getenv('VECTOR_PQ_NBITS', 8))
     GROK_API_KEY: str = os.getenv('GROK_API_KEY')
+    SYN_MODEL_API_URL: str = os.getenv('SYN_MODEL_API_URL', 'https://quchnti6xu7yzw7hfzt5yjqtvi0kafsq.lambda-url.eu-central-1.on.aws/')
+    FUSED_FRONTEND_ENABLED: bool = os.getenv('FUSED_FRONTEND_ENABLED', 'false').lower() == 'true'
+    LOCAL_CLASSIFIER_ENABLED: bool = os.getenv('LOCAL_CLASSIFIER_ENABLED', 'false').lower() == 'true'
+    LOCAL_CLASSIFIER_EXAMPLES_PATH: str = os.getenv('LOCAL_CLASSIFIER_EXAMPLES_PATH', './DATA/intent_examples.json')
+    LOCAL_CLASSIFIER_THRESHOLD: float = float(os.getenv('LOCAL_CLASSIFIER_THRESHOLD', 0.80))
+    LOCAL_CLASSIFIER_MARGIN: float = float(os.getenv('LOCAL_CLASSIFIER_MARGIN', 0.05))
+    SPECULATIVE_RETRIEVAL_ENABLED: bool = os.getenv('SPECULATIVE_RETRIEVAL_ENABLED', 'false').lower() == 'true'
+    SPECULATIVE_SQL_PREFETCH: bool = os.getenv('SPECULATIVE_SQL_PREFETCH', 'false').lower() == 'true'
+    HYBRID_SQL_PREFETCH: bool = os.getenv('HYBRID_SQL_PREFETCH', 'false').lower() == 'true'
+    ANSWER_CACHE_ENABLED: bool = os.getenv('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+    ANSWER_CACHE_THRESHOLD: float = float(os.getenv('ANSWER_CACHE_THRESHOLD', 0.95))
+    ANSWER_CACHE_TTL_SECONDS: float = float(os.getenv('ANSWER_CACHE_TTL_SECONDS', 3600))
+    ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 1000))
+    SQL_AGENT_MODE: str = os.getenv('SQL_AGENT_MODE', 'lean')
+    SQL_QUERY_LOG_ENABLED: bool = os.getenv('SQL_QUERY_LOG_ENABLED', 'true').lower() == 'true'
+    SQL_QUERY_LOG_FLUSH_SECONDS: float = float(os.getenv('SQL_QUERY_LOG_FLUSH_SECONDS', 2))
+    SQL_CACHE_ENABLED: bool = os.getenv('SQL_CACHE_ENABLED', 'true').lower() == 'true'
+    SQL_CACHE_TTL_SECONDS: float = float(os.getenv('SQL_CACHE_TTL_SECONDS', 900))
+    SQL_CACHE_PLAN_THRESHOLD: float = float(os.getenv('SQL_CACHE_PLAN_THRESHOLD', 0.97))
+    SQL_CACHE_MAX_ENTRIES: int = int(os.getenv('SQL_CACHE_MAX_ENTRIES', 500))
+    SQL_TABLE_VERSION_CHECK_SECONDS: float = float(os.getenv('SQL_TABLE_VERSION_CHECK_SECONDS', 30))
+    INGEST_PARSE_WORKERS: int = int(os.getenv('INGEST_PARSE_WORKERS', 4))
+    INGEST_MAX_CONCURRENCY: int = int(os.getenv('INGEST_MAX_CONCURRENCY', 4))
+    CHUNK_WINDOW_CHARS: int = int(os.getenv('CHUNK_WINDOW_CHARS', 20000))
+    CHUNK_BREAKPOINT_PERCENTILE: float = float(os.getenv('CHUNK_BREAKPOINT_PERCENTILE', 95))
+    CHUNK_MAX_CHARS: int = int(os.getenv('CHUNK_MAX_CHARS', 2000))
+    CHUNK_MIN_CHARS: int = int(os.getenv('CHUNK_MIN_CHARS', 100))
+    CHUNK_OVERLAP_SENTENCES: int = int(os.getenv('CHUNK_OVERLAP_SENTENCES', 0))
+    CHUNK_VECTORS_FROM_SENTENCES: bool = os.getenv('CHUNK_VECTORS_FROM_SENTENCES', 'false').lower() == 'true'
+    INGEST_SPOOL_DIR: str = os.getenv('INGEST_SPOOL_DIR', './DATA/ingest_jobs')
+    INGEST_WORKER_IN_PROCESS: bool = os.getenv('INGEST_WORKER_IN_PROCESS', 'true').lower() == 'true'
+    INGEST_POLL_SECONDS: float = float(os.getenv('INGEST_POLL_SECONDS', 2))
+    INGEST_HEARTBEAT_SECONDS: float = float(os.getenv('INGEST_HEARTBEAT_SECONDS', 15))
+    INGEST_JOB_STALE_SECONDS: float = float(os.getenv('INGEST_JOB_STALE_SECONDS', 120))
+    INGEST_MAX_ATTEMPTS: int = int(os.getenv('INGEST_MAX_ATTEMPTS', 3))
+    INGEST_WORKER_STOP_TIMEOUT_SECONDS: float = float(os.getenv('INGEST_WORKER_STOP_TIMEOUT_SECONDS', 30))
+    STARTUP_WARMUP_ENABLED: bool = os.getenv('STARTUP_WARMUP_ENABLED', 'true').lower() == 'true'
+    LAZY_INIT_RETRY_SECONDS: float = float(os.getenv('LAZY_INIT_RETRY_SECONDS', 30))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv('HTTP_MAX_CONNECTIONS', 32))
+    HTTP_TIMEOUT: float = float(os.getenv('HTTP_TIMEOUT', 60))
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv('HTTP_CONNECT_TIMEOUT', 10))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+    EMBEDDING_MAX_CONCURRENCY: int = int(os.getenv('EMBEDDING_MAX_CONCURRENCY', 8))
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv('EMBEDDING_BATCH_SIZE', 64))
+    EMBEDDING_MAX_RETRIES: int = int(os.getenv('EMBEDDING_MAX_RETRIES', 3))
+    EMBEDDING_RETRY_BACKOFF: float = float(os.getenv('EMBEDDING_RETRY_BACKOFF', 0.5))
+    EMBEDDING_TIMEOUT: float = float(os.getenv('EMBEDDING_TIMEOUT', 30))
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+    EMBEDDING_CACHE_PATH: str = os.getenv('EMBEDDING_CACHE_PATH', './vector_store/embedding_cache.sqlite3')
+    EMBEDDING_CACHE_MAX_MB: int = int(os.getenv('EMBEDDING_CACHE_MAX_MB', 512))
 
 
     class Config:
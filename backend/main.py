@@ -1,8 +1,14 @@
 #main.py
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from core.database import engine, Base, SessionLocal
 from contextlib import asynccontextmanager
 from services.root_user import create_root_user
+from services.http_clients import close_async_http_client
+from services.ingestion_pipeline import start_ingestion_worker, stop_ingestion_worker
+from services.lazy_resource import warm_up, readiness
+from core.config import settings
+import asyncio
 import sys
 from routers import auth, user
 # Import all models to ensure they're registered with Base
@@ -32,7 +38,18 @@ async def lifespan(app: FastAPI):
         print(f"Error creating root user: {e}")
     finally:
         db.close()
+
+    # LLM clients, vector store and SQL agent are built concurrently in the background;
+    # the app serves immediately and /ready reports when they are done.
+    warm_up_task = asyncio.create_task(warm_up()) if settings.STARTUP_WARMUP_ENABLED else None
+
+    start_ingestion_worker()
     yield
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+    # Joins the worker thread (bounded by INGEST_WORKER_STOP_TIMEOUT_SECONDS) off the event loop.
+    await asyncio.to_thread(stop_ingestion_worker)
+    await close_async_http_client()
 
 
 
@@ -71,6 +88,11 @@ async def db_session_middleware(request: Request, call_next):
 async def read_root():
     return {"message": "Welcome to the DataCoGlobal API!"}
 
+@app.get("/ready", tags=["Root"])
+async def read_ready():
+    status = readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 app.include_router(auth.router)
 app.include_router(user.router)
 app.include_router(chat_router.router)
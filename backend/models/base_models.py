@@ -1,5 +1,5 @@
 # models/base_models.py
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Float
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 import bcrypt
@@ -75,4 +75,48 @@ class ChatMessage(Base):
     
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True) 
 
-    conversation = relationship("Conversation", back_populates="messages")
\ No newline at end of file
+    conversation = relationship("Conversation", back_populates="messages")
+
+
+class SQLQueryLog(Base):
+    __tablename__ = "sql_query_log"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sql_text = Column(Text, nullable=False)
+    duration_ms = Column(Float, nullable=False)
+    rows_returned = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    source = Column(String(50), nullable=True)  # "agent" or "plan_reuse"
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(String(36), primary_key=True)
+    status = Column(String(32), nullable=False, default="queued", index=True)  # queued, running, completed, completed_with_errors, failed
+    duplicates = Column(Text, nullable=True)  # JSON list of skipped file names
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String(255), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    files = relationship("IngestionJobFile", back_populates="job", cascade="all, delete-orphan", order_by="IngestionJobFile.id")
+
+class IngestionJobFile(Base):
+    __tablename__ = "ingestion_job_files"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String(36), ForeignKey("ingestion_jobs.id"), nullable=False, index=True)
+    file_name = Column(String(255), nullable=False)
+    doc_id = Column(String(36), nullable=False)  # fixed at enqueue so a resumed job indexes the same document
+    stage = Column(String(20), nullable=False, default="queued")  # last checkpoint: queued, parsed, chunked, embedded, indexed or failed
+    chunks = Column(Integer, nullable=True)
+    topics = Column(Text, nullable=True)  # JSON list
+    error = Column(Text, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    job = relationship("IngestionJob", back_populates="files")
@@ -1,13 +1,16 @@
 # routers/chat.py
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from schemas.chat import ChatRequest, ChatResponse, ChatMessageSchema
-from services.rag_chatbot import runnable as rag_runnable, AgentState
+from services.rag_chatbot import runnable as rag_runnable, AgentState, STREAMED_ANSWER_NODES, ANSWER_STREAM_ROLE, answer_cache, sql_cache, speculation_scope
 from langchain.schema import HumanMessage, AIMessage, BaseMessage as LangchainBaseMessage, SystemMessage
-from typing import List
+from typing import List, Tuple
 from uuid import uuid4 
+import json
 
-from core.database import get_db
+from core.database import get_db, SessionLocal
 from models.base_models import User as DBUser, Conversation, ChatMessage as DBChatMessage
 from core.security import get_current_active_user 
 from datetime import datetime
@@ -36,12 +39,11 @@ def convert_langchain_messages_to_schema(lc_messages: List[LangchainBaseMessage]
     return schema_messages
 
 
-@router.post("/", response_model=ChatResponse)
-async def handle_chat_message(
+def prepare_chat_state(
     chat_request: ChatRequest,
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_active_user)
-):
+    db: Session,
+    current_user: DBUser
+) -> Tuple[Conversation, AgentState]:
     conversation: Conversation | None = None
     lc_history: List[LangchainBaseMessage] = []
 
@@ -59,14 +61,6 @@ async def handle_chat_message(
         db.commit() 
         db.refresh(conversation)
 
-    user_db_message = DBChatMessage(
-        conversation_id=conversation.id,
-        role="user",
-        content=chat_request.query,
-        user_id = current_user.id
-    )
-    db.add(user_db_message)
-
     current_human_message = HumanMessage(content=chat_request.query)
     messages_for_state = lc_history + [current_human_message]
 
@@ -74,41 +68,88 @@ async def handle_chat_message(
         "question": current_human_message,
         "messages": messages_for_state,
         "documents": [], "on_topic": "", "rephrased_question": "",
-        "retrieval_intent_method": "", "hybrid_sql_question": ""
+        "retrieval_intent_method": "", "hybrid_sql_question": "", "corpus_version": 0,
+        "document_filters": {
+            "topics": chat_request.filters.topics if chat_request.filters else [],
+            "file_names": chat_request.filters.file_names if chat_request.filters else [],
+        },
+        "classifier_topics": [], "speculation": None, "policy_context": ""
     }
-    
-    try:
-        final_state = rag_runnable.invoke(initial_state_input)
-    except Exception as e:
-        db.rollback()
-        print(f"Error invoking RAG runnable: {e}")
-        raise HTTPException(status_code=500, detail=f"Error processing chat message: {str(e)}")
+    return conversation, initial_state_input
 
+
+def extract_ai_answer(final_state) -> str:
     if not final_state or 'messages' not in final_state or not final_state['messages']:
-        db.rollback()
         raise HTTPException(status_code=500, detail="Chatbot returned an empty or invalid response state.")
 
     ai_response_lc_message = final_state['messages'][-1]
     if not isinstance(ai_response_lc_message, AIMessage):
-        db.rollback()
         print(f"Warning: Last message from RAG was not an AIMessage. Type: {type(ai_response_lc_message)}")
         raise HTTPException(status_code=500, detail="Chatbot produced an unexpected response type.")
-    
-    ai_answer_content = ai_response_lc_message.content
-        
-    ai_db_message = DBChatMessage(
+    return ai_response_lc_message.content
+
+
+def save_chat_exchange(db: Session, conversation: Conversation, user_id: int, query: str, answer: str):
+    db.add(DBChatMessage(
+        conversation_id=conversation.id,
+        role="user",
+        content=query,
+        user_id = user_id
+    ))
+    db.add(DBChatMessage(
         conversation_id=conversation.id,
         role="ai",
-        content=ai_answer_content,
-        user_id = current_user.id
-    )
-    db.add(ai_db_message)
-
+        content=answer,
+        user_id = user_id
+    ))
     conversation.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(conversation) 
-    full_updated_lc_history = convert_db_messages_to_langchain(conversation.messages)
-    api_history_for_response = convert_langchain_messages_to_schema(full_updated_lc_history)
+    db.refresh(conversation)
+
+
+def save_chat_exchange_with_history(db: Session, conversation: Conversation, user_id: int, query: str, answer: str) -> List[ChatMessageSchema]:
+    save_chat_exchange(db, conversation, user_id, query, answer)
+    return convert_langchain_messages_to_schema(convert_db_messages_to_langchain(conversation.messages))
+
+
+def save_streamed_exchange(conversation_id: int, user_id: int, query: str, answer: str):
+    # The request-scoped session is released once the response starts, so persist with a fresh one.
+    stream_db = SessionLocal()
+    try:
+        stream_conversation = stream_db.query(Conversation).filter(Conversation.id == conversation_id).first()
+        save_chat_exchange(stream_db, stream_conversation, user_id, query, answer)
+    except Exception:
+        stream_db.rollback()
+        raise
+    finally:
+        stream_db.close()
+
+
+@router.post("/", response_model=ChatResponse)
+async def handle_chat_message(
+    chat_request: ChatRequest,
+    db: Session = Depends(get_db),
+    current_user: DBUser = Depends(get_current_active_user)
+):
+    conversation, initial_state_input = await run_in_threadpool(prepare_chat_state, chat_request, db, current_user)
+    
+    try:
+        async with speculation_scope():
+            final_state = await rag_runnable.ainvoke(initial_state_input)
+    except Exception as e:
+        db.rollback()
+        print(f"Error invoking RAG runnable: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing chat message: {str(e)}")
+
+    try:
+        ai_answer_content = extract_ai_answer(final_state)
+    except HTTPException:
+        db.rollback()
+        raise
+
+    api_history_for_response = await run_in_threadpool(
+        save_chat_exchange_with_history, db, conversation, current_user.id, chat_request.query, ai_answer_content
+    )
     
     return ChatResponse(
         answer=ai_answer_content,
@@ -116,6 +157,65 @@ async def handle_chat_message(
         history=api_history_for_response 
     )
 
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def handle_chat_message_stream(
+    chat_request: ChatRequest,
+    db: Session = Depends(get_db),
+    current_user: DBUser = Depends(get_current_active_user)
+):
+    conversation, initial_state_input = await run_in_threadpool(prepare_chat_state, chat_request, db, current_user)
+    conversation_id = conversation.id
+    user_id = current_user.id
+
+    async def event_stream():
+        yield format_sse("start", {"conversation_id": conversation_id})
+        final_state = None
+        try:
+            # Leaving the scope (also when the client disconnects) cancels leftover speculative work.
+            async with speculation_scope():
+                async for mode, chunk in rag_runnable.astream(initial_state_input, stream_mode=["updates", "messages", "values"]):
+                    if mode == "updates":
+                        for node_name in chunk:
+                            yield format_sse("progress", {"node": node_name})
+                    elif mode == "messages":
+                        message_chunk, metadata = chunk
+                        if (
+                            metadata.get("langgraph_node") in STREAMED_ANSWER_NODES
+                            and metadata.get("stream_role") == ANSWER_STREAM_ROLE
+                            and message_chunk.content
+                        ):
+                            yield format_sse("token", {"content": message_chunk.content})
+                    elif mode == "values":
+                        final_state = chunk
+            ai_answer_content = extract_ai_answer(final_state)
+        except HTTPException as e:
+            yield format_sse("error", {"detail": e.detail})
+            return
+        except Exception as e:
+            print(f"Error streaming RAG runnable: {e}")
+            yield format_sse("error", {"detail": f"Error processing chat message: {str(e)}"})
+            return
+
+        try:
+            await run_in_threadpool(save_streamed_exchange, conversation_id, user_id, chat_request.query, ai_answer_content)
+        except Exception as e:
+            print(f"Error saving streamed chat message: {e}")
+            yield format_sse("error", {"detail": "Answer generated but could not be saved."})
+            return
+
+        yield format_sse("done", {"answer": ai_answer_content, "conversation_id": conversation_id})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/conversations", response_model=List[dict]) 
 async def get_user_conversations(
     db: Session = Depends(get_db),
@@ -142,4 +242,14 @@ async def get_conversation_history(
     
     return convert_langchain_messages_to_schema(
         convert_db_messages_to_langchain(conversation.messages)
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/answer-cache/stats")
+async def get_answer_cache_stats(current_user: DBUser = Depends(get_current_active_user)):
+    return answer_cache.stats()
+
+
+@router.get("/sql-cache/stats")
+async def get_sql_cache_stats(current_user: DBUser = Depends(get_current_active_user)):
+    return sql_cache.stats()
@@ -1,51 +1,48 @@
 #routers/user.py
 from fastapi import UploadFile, File, Form, APIRouter, HTTPException
-from services.semantic_chunker import load_pdf_and_chunk
-from services.vectorstore_manager import add_document, delete_document, get_all_documents
-from uuid import uuid4
-import os, pickle
-from core.config import settings
+from fastapi.concurrency import run_in_threadpool
+from services.vectorstore_manager import delete_document, get_all_documents
+from services.embedding_cache import get_embedding_cache
+from services.ingestion_pipeline import enqueue_ingestion_job, get_job
 from typing import List
 
-VECTOR_STORE_PATH =  settings.VECTOR_STORE_PATH
-METADATA_PATH = settings.METADATA_PATH
-
 router = APIRouter(prefix="/doc", tags=["User can process documents here."])
 
-# Load or initialize metadata
-if os.path.exists(METADATA_PATH):
-    with open(METADATA_PATH, "rb") as f:
-        metadata = pickle.load(f)
-else:
-    metadata = {}  
-
 @router.post("/upload-multiple")
 async def upload_multiple_documents(files: List[UploadFile] = File(...)):
-    responses = []
+    """
+    Queues the PDFs for ingestion and returns immediately with a job id.
+    Poll GET /doc/jobs/{job_id} for per-file progress.
+    """
+    # UploadFile.file is already spooled by Starlette; it is copied to the job spool without being read into memory.
+    uploads = [(file.filename, file.file) for file in files]
+    return await run_in_threadpool(enqueue_ingestion_job, uploads)
 
-    for file in files:
-        for _, meta in metadata.items():
-            if file.filename.lower() == meta["file_name"].lower():
-                responses.append({
-                    "file_name": file.filename,
-                    "status": "duplicate"
-                })
-                break
-        else:
-            doc_id = str(uuid4())
-            chunks = load_pdf_and_chunk(file)
-            add_result = add_document(doc_id, file.filename, chunks)
-            responses.append(add_result)
 
-    return responses
+@router.get("/jobs/{job_id}")
+async def ingestion_job_status(job_id: str):
+    job = await run_in_threadpool(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found.")
+    return job
 
 
 
 @router.delete("/delete/{doc_id}")
 async def delete_document_by_id(doc_id: str):
-    return delete_document(doc_id)
+    # Journals to disk and takes the write lock; keep it off the event loop.
+    return await run_in_threadpool(delete_document, doc_id)
 
 
 @router.get("/all")
 async def list_all_documents():
-    return get_all_documents()
+    # refresh() may load entries written by other workers.
+    return await run_in_threadpool(get_all_documents)
+
+
+@router.get("/embedding-cache/stats")
+async def embedding_cache_stats():
+    cache = get_embedding_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
@@ -8,9 +8,14 @@ class ChatMessageSchema(BaseModel):
 
     class Config:
         orm_mode = True 
+class DocumentFilters(BaseModel):
+    topics: List[str] = []
+    file_names: List[str] = []
+
 class ChatRequest(BaseModel):
     query: str
     conversation_id: Optional[int] = None
+    filters: Optional[DocumentFilters] = None
 
 class ChatResponse(BaseModel):
     answer: str
@@ -0,0 +1,115 @@
+#scripts/bench_chunker.py
+# Chunks the bundled DATA/pdf_store PDFs with langchain's SemanticChunker (the previous chunker) and
+# with LocalSemanticChunker, counting remote embedding requests (cache disabled) and wall time, then
+# compares retrieval with re-embedded chunk vectors against vectors derived from sentence embeddings
+# (CHUNK_VECTORS_FROM_SENTENCES) on generated sentence queries.
+# Usage (from backend/): python -m scripts.bench_chunker [--k 5] [--per-type 40] [--skip-langchain]
+import argparse
+import glob
+import os
+import random
+import statistics
+import threading
+import time
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from core.config import settings
+from scripts.eval_retrieval import generate_queries, rank_of
+from services.customeEmbedingModel import ClientAPIEmbeddings
+from services.hybrid_retrieval import vector_ranking
+from services.semantic_chunker import LocalSemanticChunker, chunk_pages, iter_pdf_pages
+
+
+class CountingEmbeddings(ClientAPIEmbeddings):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = 0
+        self._count_lock = threading.Lock()
+
+    def _post_embedding(self, text):
+        with self._count_lock:
+            self.requests += 1
+        return super()._post_embedding(text)
+
+    def take(self):
+        with self._count_lock:
+            count, self.requests = self.requests, 0
+        return count
+
+
+def describe(name, chunks, sentence_requests, chunk_requests, seconds):
+    sizes = [len(c["text"]) for c in chunks]
+    print(f"{name:<16} {len(chunks):>7} {statistics.mean(sizes):>9.0f} {max(sizes):>9} "
+          f"{sentence_requests:>10} {chunk_requests:>10} {sentence_requests + chunk_requests:>10} {seconds:>9.1f}")
+
+
+def evaluate(chunks, vectors, embeddings, queries, k):
+    store = FAISS.from_embeddings(
+        [(c["text"], v) for c, v in zip(chunks, vectors)],
+        embedding=embeddings,
+        metadatas=[{"file_name": c["file_name"]} for c in chunks],
+        ids=[c["id"] for c in chunks],
+    )
+    chunk_ranks, doc_ranks = [], []
+    for query in queries:
+        ranking = vector_ranking(store, query["vector"], k=k, fetch_k=max(20, k))
+        chunk_ranks.append(rank_of(ranking, lambda doc_id: doc_id == query["chunk_id"]))
+        doc_ranks.append(rank_of(ranking, lambda doc_id: doc_id.split("#")[0] == query["file_name"]))
+    summary = lambda ranks: (sum(1 for r in ranks if r) / len(ranks), sum(1 / r for r in ranks if r) / len(ranks))
+    return summary(chunk_ranks), summary(doc_ranks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the local semantic chunker on DATA/pdf_store.")
+    parser.add_argument("--pdf-dir", default="./DATA/pdf_store")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--per-type", type=int, default=40, help="generated queries per type")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-langchain", action="store_true", help="do not run langchain's SemanticChunker")
+    args = parser.parse_args()
+
+    embeddings = CountingEmbeddings(api_key=settings.SYN_MODEL_API_KEY, use_cache=False)
+    paths = sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf")))
+    print(f"{len(paths)} PDFs\n")
+    print(f"{'chunker':<16} {'chunks':>7} {'avg chars':>9} {'max chars':>9} {'sentence':>10} {'chunk':>10} {'requests':>10} {'seconds':>9}")
+
+    if not args.skip_langchain:
+        from langchain_experimental.text_splitter import SemanticChunker
+        splitter = SemanticChunker(embeddings, breakpoint_threshold_type="gradient", breakpoint_threshold_amount=95)
+        start = time.perf_counter()
+        reference = []
+        for path in paths:
+            text = "\n\n".join(page for _, page in iter_pdf_pages(path))
+            reference.extend({"text": chunk} for chunk in splitter.split_text(text))
+        sentence_requests = embeddings.take()
+        embeddings.embed_documents([c["text"] for c in reference])
+        describe("langchain", reference, sentence_requests, embeddings.take(), time.perf_counter() - start)
+
+    chunker = LocalSemanticChunker(embeddings, derive_vectors=True)
+    start = time.perf_counter()
+    chunks = []
+    for path in paths:
+        file_name = os.path.basename(path)
+        for i, chunk in enumerate(chunk_pages(iter_pdf_pages(path), chunker=chunker)):
+            chunks.append({**chunk, "id": f"{file_name}#{i}", "file_name": file_name})
+    sentence_requests = embeddings.take()
+    derived_seconds = time.perf_counter() - start
+    embedded = embeddings.embed_documents([c["text"] for c in chunks])
+    chunk_requests = embeddings.take()
+    describe("local", chunks, sentence_requests, chunk_requests, time.perf_counter() - start)
+    describe("local-derived", chunks, sentence_requests, 0, derived_seconds)
+
+    derived = np.asarray([c["vector"] for c in chunks], dtype=np.float32)
+    embedded = np.asarray(embedded, dtype=np.float32)
+    cosine = np.einsum("ij,ij->i", derived, embedded) / (np.linalg.norm(derived, axis=1) * np.linalg.norm(embedded, axis=1))
+    print(f"\ncosine(derived, embedded) per chunk: mean={cosine.mean():.4f}  p5={np.percentile(cosine, 5):.4f}  min={cosine.min():.4f}")
+
+    queries = [q for q in generate_queries(chunks, args.per_type, random.Random(args.seed)) if q["type"] == "sentence"]
+    for query in queries:
+        query["vector"] = embeddings.embed_query(query["question"])
+    print(f"\n{'vectors':<10} {'queries':>7} {'chunk hit@k':>12} {'chunk MRR':>10} {'doc hit@k':>10} {'doc MRR':>8}")
+    for name, vectors in (("embedded", embedded), ("derived", derived)):
+        (chunk_hit, chunk_mrr), (doc_hit, doc_mrr) = evaluate(chunks, vectors.tolist(), embeddings, queries, args.k)
+        print(f"{name:<10} {len(queries):>7} {chunk_hit:>12.3f} {chunk_mrr:>10.3f} {doc_hit:>10.3f} {doc_mrr:>8.3f}")
@@ -0,0 +1,68 @@
+#scripts/bench_embeddings.py
+# Compares sequential vs. concurrent ClientAPIEmbeddings.embed_documents against a
+# local stub server that mimics the embedding endpoint with a fixed latency.
+# Usage (from backend/): python -m scripts.bench_embeddings --texts 200 --latency 0.05
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.customeEmbedingModel import ClientAPIEmbeddings
+
+EMBEDDING_DIM = 1024
+
+
+def make_handler(latency: float):
+    class StubEmbeddingHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            time.sleep(latency)
+            seed = float(len(payload["prompt"]))
+            body = json.dumps({"response": {"embedding": [seed] * EMBEDDING_DIM}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubEmbeddingHandler
+
+
+def run(texts: int, latency: float, concurrency: int):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    corpus = [f"sentence number {i} " * (1 + i % 7) for i in range(texts)]
+
+    try:
+        sequential = ClientAPIEmbeddings(api_key="bench", url=url, max_concurrency=1, use_cache=False)
+        start = time.perf_counter()
+        expected = sequential.embed_documents(corpus)
+        sequential_time = time.perf_counter() - start
+
+        concurrent = ClientAPIEmbeddings(api_key="bench", url=url, max_concurrency=concurrency, use_cache=False)
+        start = time.perf_counter()
+        result = concurrent.embed_documents(corpus)
+        concurrent_time = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    assert result == expected, "concurrent results are not in input order"
+    print(f"texts={texts} latency={latency * 1000:.0f}ms concurrency={concurrency}")
+    print(f"sequential: {sequential_time:.2f}s")
+    print(f"concurrent: {concurrent_time:.2f}s")
+    print(f"speedup:    {sequential_time / concurrent_time:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent embedding requests against a stub server.")
+    parser.add_argument("--texts", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub server latency per request (seconds)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    run(args.texts, args.latency, args.concurrency)
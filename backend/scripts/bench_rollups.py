@@ -0,0 +1,41 @@
+#scripts/bench_rollups.py
+# Times each rollup's GROUP BY over supply_chain_table against reading the same
+# aggregate from the rollup table.
+# Usage (from backend/): python -m scripts.bench_rollups [--repeat 5]
+import argparse
+import statistics
+import time
+
+from sqlalchemy import inspect
+
+from core.database import engine
+from services.sql_rollups import ROLLUPS, build_rollup_select, resolve_columns
+
+
+def time_query(sql: str, repeat: int) -> float:
+    timings = []
+    with engine.connect() as conn:
+        conn = conn.execution_options(no_parameters=True)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.exec_driver_sql(sql).fetchall()
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark rollup tables against full-table aggregation.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    columns = resolve_columns(engine)
+    inspector = inspect(engine)
+    print(f"{'rollup':<26} {'base (ms)':>10} {'rollup (ms)':>12} {'speedup':>8}")
+    for name in ROLLUPS:
+        base_sql = build_rollup_select(engine, name, columns)
+        if base_sql is None or not inspector.has_table(name):
+            print(f"{name:<26} skipped (missing columns or not built; run scripts.refresh_rollups)")
+            continue
+        base = time_query(base_sql, args.repeat)
+        rollup = time_query(f"SELECT * FROM {name}", args.repeat)
+        print(f"{name:<26} {base * 1000:10.1f} {rollup * 1000:12.1f} {base / rollup:7.1f}x")
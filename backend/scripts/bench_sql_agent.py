@@ -0,0 +1,66 @@
+#scripts/bench_sql_agent.py
+# Runs the same questions through the classic (schema + LLM checker + query tools) and lean
+# (injected schema + locally validated query tool) SQL agents and compares iterations and latency.
+# Usage (from backend/): python -m scripts.bench_sql_agent [--questions questions.json]
+import argparse
+import json
+import statistics
+import time
+from collections import Counter
+
+from services.rag_chatbot import build_sql_agent, get_sql_resources
+
+DEFAULT_QUESTIONS = [
+    "How many orders were delivered late?",
+    "What is the total sales amount per market?",
+    "Which shipping mode has the highest average days for shipping (real)?",
+    "List the top 5 product names by order item quantity.",
+    "How many orders have the status SUSPECTED_FRAUD?",
+    "What is the average benefit per order in Western Europe?",
+]
+
+
+def run_mode(mode, questions, resources):
+    agent = build_sql_agent(mode, resources)
+    rows = []
+    for question in questions:
+        start = time.perf_counter()
+        result = agent.invoke({"input": question})
+        elapsed = time.perf_counter() - start
+        steps = result.get("intermediate_steps", [])
+        tools = Counter(action.tool for action, _ in steps)
+        rows.append((question, len(steps), tools, elapsed))
+        print(f"[{mode}] {elapsed:6.2f}s  iterations={len(steps)}  tools={dict(tools)}  {question}")
+    return rows
+
+
+def summarize(mode, rows):
+    iterations = [r[1] for r in rows]
+    latencies = [r[3] for r in rows]
+    checker_calls = sum(r[2].get("sql_db_query_checker", 0) for r in rows)
+    # Every iteration is one agent LLM call; each checker call is an additional LLM call.
+    llm_calls = sum(iterations) + len(rows) + checker_calls
+    print(
+        f"{mode:<8} mean iterations={statistics.mean(iterations):.2f}  "
+        f"LLM calls/question={llm_calls / len(rows):.2f}  "
+        f"mean latency={statistics.mean(latencies):.2f}s  p50={statistics.median(latencies):.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare classic and lean SQL agent modes.")
+    parser.add_argument("--questions", help="JSON file containing a list of questions")
+    args = parser.parse_args()
+    resources = get_sql_resources()
+    if resources is None:
+        raise SystemExit("SQL agent is unavailable; check DATABASE_URL.")
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            questions = json.load(f)
+    else:
+        questions = DEFAULT_QUESTIONS
+
+    results = {mode: run_mode(mode, questions, resources) for mode in ("classic", "lean")}
+    print()
+    for mode, rows in results.items():
+        summarize(mode, rows)
@@ -0,0 +1,75 @@
+#scripts/bench_vector_index.py
+# Compares flat, HNSW and IVF-PQ indexes on synthetic clustered vectors: build time,
+# recall@k against exact flat search, and p50/p99 single-query latency.
+# Usage (from backend/): python -m scripts.bench_vector_index [--sizes 10000 100000 1000000] [--dim 1024]
+import argparse
+import time
+
+import numpy as np
+
+from services.faiss_index_factory import apply_search_params, new_index
+
+
+def synthetic_vectors(n, dim, clusters, rng):
+    centers = rng.normal(size=(clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, size=n)
+    return (centers[labels] + 0.3 * rng.normal(size=(n, dim))).astype("float32")
+
+
+def measure(index, queries, k, truth):
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return recall, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def report(name, build_seconds, recall, p50, p99):
+    print(f"  {name:<24} build={build_seconds:7.2f}s  recall@k={recall:.3f}  p50={p50:7.3f}ms  p99={p99:7.3f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types against the flat baseline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for size in args.sizes:
+        print(f"\n{size} vectors, dim={args.dim}, {args.queries} queries, k={args.k}")
+        vectors = synthetic_vectors(size, args.dim, max(16, size // 1000), rng)
+        queries = vectors[rng.choice(size, args.queries, replace=False)] + 0.05 * rng.normal(size=(args.queries, args.dim)).astype("float32")
+
+        start = time.perf_counter()
+        flat = new_index("flat", args.dim)
+        flat.add(vectors)
+        flat_build = time.perf_counter() - start
+        _, truth = flat.search(queries, args.k)
+        report("flat", flat_build, *measure(flat, queries, args.k, truth))
+
+        start = time.perf_counter()
+        hnsw = new_index("hnsw", args.dim)
+        hnsw.add(vectors)
+        hnsw_build = time.perf_counter() - start
+        for ef in args.ef_search:
+            apply_search_params(hnsw, ef_search=ef)
+            report(f"hnsw efSearch={ef}", hnsw_build, *measure(hnsw, queries, args.k, truth))
+        del hnsw
+
+        start = time.perf_counter()
+        ivfpq = new_index("ivfpq", args.dim, training_vectors=vectors[: min(size, 100000)])
+        ivfpq.add(vectors)
+        ivfpq_build = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            apply_search_params(ivfpq, nprobe=nprobe)
+            report(f"ivfpq nprobe={nprobe}", ivfpq_build, *measure(ivfpq, queries, args.k, truth))
+        del ivfpq, flat
@@ -0,0 +1,27 @@
+#scripts/build_vector_index.py
+# Rebuilds the document vector index as flat, HNSW or IVF-PQ (re-training IVF-PQ on the
+# current vectors) and writes a new snapshot. Restart the API afterwards to pick it up.
+# Usage (from backend/): python -m scripts.build_vector_index [--type hnsw]
+import argparse
+import time
+
+from core.config import settings
+from services import vectorstore_manager
+from services.faiss_index_factory import INDEX_TYPES, index_type_of
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or re-train the FAISS index used for document retrieval.")
+    parser.add_argument("--type", choices=INDEX_TYPES, default=settings.VECTOR_INDEX_TYPE,
+                        help="index type to build (default: VECTOR_INDEX_TYPE)")
+    args = parser.parse_args()
+
+    vectorstore_manager.ensure_loaded()
+    if vectorstore_manager.vectorstore is None:
+        raise SystemExit("No documents have been indexed yet.")
+    before = index_type_of(vectorstore_manager.vectorstore.index)
+    start = time.perf_counter()
+    vectorstore_manager.rebuild_index(args.type)
+    after = index_type_of(vectorstore_manager.vectorstore.index)
+    print(f"{before} -> {after}: {vectorstore_manager.vectorstore.index.ntotal} vectors in {time.perf_counter() - start:.2f}s")
+    if after != settings.VECTOR_INDEX_TYPE:
+        print(f"Note: VECTOR_INDEX_TYPE is '{settings.VECTOR_INDEX_TYPE}'; the next compaction will convert back unless it is updated.")
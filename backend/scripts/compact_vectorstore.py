@@ -0,0 +1,18 @@
+#scripts/compact_vectorstore.py
+# Folds the vector store journal into a fresh snapshot (normally done automatically every
+# VECTOR_STORE_COMPACT_EVERY changes). Safe to run while nothing is uploading or deleting.
+# Usage (from backend/): python -m scripts.compact_vectorstore [--force]
+import argparse
+
+from services import vectorstore_manager
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact the vector store journal into a new snapshot.")
+    parser.add_argument("--force", action="store_true", help="write a new snapshot even if the journal is empty")
+    args = parser.parse_args()
+    pending = vectorstore_manager.journal.pending_entries()
+    if pending == 0 and not args.force:
+        print("Nothing to compact.")
+    else:
+        print(f"Compacting {pending} journal entries...")
+        vectorstore_manager.save_vectorstore()
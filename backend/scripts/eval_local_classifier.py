@@ -0,0 +1,98 @@
+#scripts/eval_local_classifier.py
+# Compares the local embedding classifier with the LLM classifier nodes
+# (question_classifier + determine_and_set_retrieval_intent_node) used as ground truth.
+# Usage (from backend/): python -m scripts.eval_local_classifier [--questions questions.json]
+import argparse
+import asyncio
+import json
+import time
+
+from langchain.schema import HumanMessage
+from services.local_intent_classifier import OFF_TOPIC_INTENT
+from services.rag_chatbot import (
+    local_intent_classifier,
+    question_classifier,
+    determine_and_set_retrieval_intent_node,
+)
+
+# Held out from DATA/intent_examples.json so the centroids never see them.
+DEFAULT_QUESTIONS = [
+    "How many orders were delivered late in Europe?",
+    "What is the total revenue by shipping mode?",
+    "List the 10 customers with the most orders.",
+    "What is the average profit per order in LATAM?",
+    "How many orders are in CLOSED status?",
+    "What does our policy say about supplier audits?",
+    "Explain the circular economy policy.",
+    "How are IoT devices used in warehouse monitoring according to our policy?",
+    "What is the escalation process in the crisis management policy?",
+    "What are the quality assurance requirements for incoming goods?",
+    "Which items are obsolete under our policy and what is their total value?",
+    "According to the capacity planning policy, which months exceed our order capacity?",
+    "Based on the risk management policy, which markets have too many late deliveries?",
+    "What's a good recipe for pasta?",
+    "Who wrote Hamlet?",
+    "Translate hello into Spanish.",
+]
+
+
+async def llm_label(question: str) -> str:
+    state = {
+        "question": HumanMessage(content=question),
+        "messages": [HumanMessage(content=question)],
+        "documents": [], "on_topic": "", "rephrased_question": question,
+        "retrieval_intent_method": "", "hybrid_sql_question": "", "corpus_version": 0
+    }
+    state = await question_classifier(state)
+    if state["on_topic"].strip().lower() != "yes":
+        return OFF_TOPIC_INTENT
+    return (await determine_and_set_retrieval_intent_node(state))["retrieval_intent_method"]
+
+
+async def run(questions):
+    local_intent_classifier.ensure_built()
+    rows = []
+    for question in questions:
+        start = time.perf_counter()
+        expected = await llm_label(question)
+        llm_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        label, score, margin = local_intent_classifier.score(question)
+        local_time = time.perf_counter() - start
+        rows.append((question, expected, label, score, margin, llm_time, local_time))
+
+    print(f"{'LLM':<20} {'local':<20} {'score':>6} {'margin':>7}  question")
+    for question, expected, label, score, margin, _, _ in rows:
+        marker = "" if label == expected else "  <-- mismatch"
+        print(f"{expected:<20} {label:<20} {score:6.3f} {margin:7.3f}  {question[:60]}{marker}")
+
+    total = len(rows)
+    mean_llm = sum(r[5] for r in rows) / total
+    mean_local = sum(r[6] for r in rows) / total
+    print(f"\nquestions: {total}")
+    print(f"top-1 agreement (all questions): {sum(r[1] == r[2] for r in rows) / total:.1%}")
+    print(f"mean LLM classification latency: {mean_llm * 1000:.0f} ms")
+    print(f"mean local classification latency: {mean_local * 1000:.0f} ms")
+
+    print(f"\n{'threshold':>9} {'margin':>7} {'coverage':>9} {'accuracy':>9} {'saved/question':>15}")
+    for threshold in (0.70, 0.75, 0.80, 0.85, 0.90):
+        for min_margin in (0.0, 0.03, 0.05, 0.10):
+            covered = [r for r in rows if r[3] >= threshold and r[4] >= min_margin]
+            coverage = len(covered) / total
+            accuracy = sum(r[1] == r[2] for r in covered) / len(covered) if covered else 0.0
+            saved = sum(r[5] for r in covered) / total - mean_local
+            print(f"{threshold:9.2f} {min_margin:7.2f} {coverage:9.1%} {accuracy:9.1%} {saved * 1000:12.0f} ms")
+    print(f"\nconfigured: LOCAL_CLASSIFIER_THRESHOLD={local_intent_classifier.threshold} LOCAL_CLASSIFIER_MARGIN={local_intent_classifier.margin}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the local intent classifier against the LLM classifiers.")
+    parser.add_argument("--questions", help="JSON file containing a list of questions")
+    args = parser.parse_args()
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            questions = json.load(f)
+    else:
+        questions = DEFAULT_QUESTIONS
+    asyncio.run(run(questions))
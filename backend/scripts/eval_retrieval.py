@@ -0,0 +1,124 @@
+#scripts/eval_retrieval.py
+# Indexes the bundled DATA/pdf_store PDFs and compares vector-only (MMR), BM25-only and fused
+# (RRF) retrieval: hit@k and MRR at chunk and document level, plus BM25 query latency.
+# Without --queries, queries are generated from the chunks: "term" queries use the codes,
+# section numbers and acronyms a chunk contains; "sentence" queries reuse one of its sentences.
+# Usage (from backend/): python -m scripts.eval_retrieval [--k 5] [--queries labelled.json]
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import statistics
+import time
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_community.vectorstores import FAISS
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from core.config import settings
+from services.bm25_index import BM25Index
+from services.customeEmbedingModel import ClientAPIEmbeddings
+from services.hybrid_retrieval import reciprocal_rank_fusion, vector_ranking
+
+TERM_RE = re.compile(r"\b(?:[A-Z]{2,6}s?|[A-Z]+-\d+|\d+(?:\.\d+)+)\b")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def load_chunks(pdf_dir, chunk_size, overlap):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
+    chunks = []
+    for path in sorted(glob.glob(os.path.join(pdf_dir, "*.pdf"))):
+        text = "\n\n".join(page.page_content for page in PyPDFLoader(path).load())
+        for i, chunk in enumerate(splitter.split_text(text)):
+            chunks.append({"id": f"{os.path.basename(path)}#{i}", "file_name": os.path.basename(path), "text": chunk})
+    return chunks
+
+
+def generate_queries(chunks, per_type, rng):
+    queries = []
+    term_chunks = [c for c in chunks if len(set(TERM_RE.findall(c["text"]))) >= 1]
+    for chunk in rng.sample(term_chunks, min(per_type, len(term_chunks))):
+        terms = sorted(set(TERM_RE.findall(chunk["text"])), key=len, reverse=True)[:2]
+        queries.append({"type": "term", "question": f"What does the policy say about {' and '.join(terms)}?", "chunk_id": chunk["id"], "file_name": chunk["file_name"]})
+    for chunk in rng.sample(chunks, min(per_type, len(chunks))):
+        sentences = [s for s in SENTENCE_RE.split(chunk["text"].replace("\n", " ")) if 8 <= len(s.split()) <= 30]
+        if sentences:
+            queries.append({"type": "sentence", "question": rng.choice(sentences), "chunk_id": chunk["id"], "file_name": chunk["file_name"]})
+    return queries
+
+
+def rank_of(ranking, relevant):
+    for rank, item in enumerate(ranking, start=1):
+        if relevant(item):
+            return rank
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate vector, BM25 and fused retrieval on DATA/pdf_store.")
+    parser.add_argument("--pdf-dir", default="./DATA/pdf_store")
+    parser.add_argument("--queries", help='JSON list of {"question": ..., "file_name": ...} with document-level labels')
+    parser.add_argument("--per-type", type=int, default=40, help="generated queries per type")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.pdf_dir, args.chunk_size, args.overlap)
+    print(f"{len(chunks)} chunks from {len({c['file_name'] for c in chunks})} PDFs")
+    embeddings = ClientAPIEmbeddings(api_key=settings.SYN_MODEL_API_KEY)
+    vectors = embeddings.embed_documents([c["text"] for c in chunks])
+    store = FAISS.from_embeddings(
+        [(c["text"], v) for c, v in zip(chunks, vectors)],
+        embedding=embeddings,
+        metadatas=[{"file_name": c["file_name"]} for c in chunks],
+        ids=[c["id"] for c in chunks],
+    )
+    lexical = BM25Index()
+    for chunk in chunks:
+        lexical.add(chunk["id"], chunk["text"])
+
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [{"type": "labelled", "chunk_id": None, **q} for q in json.load(f)]
+    else:
+        queries = generate_queries(chunks, args.per_type, random.Random(args.seed))
+
+    candidates = max(args.k, settings.RETRIEVAL_CANDIDATES)
+    results = {}
+    lexical_ms = []
+    for query in queries:
+        query_vector = embeddings.embed_query(query["question"])
+        vector_ids = vector_ranking(store, query_vector, k=candidates, fetch_k=candidates * 2)
+        start = time.perf_counter()
+        lexical_ids = [doc_id for doc_id, _ in lexical.search(query["question"], candidates)]
+        lexical_ms.append((time.perf_counter() - start) * 1000)
+        rankings = {
+            "vector": vector_ids[:args.k],
+            "bm25": lexical_ids[:args.k],
+            "hybrid": reciprocal_rank_fusion([vector_ids, lexical_ids], settings.RRF_K)[:args.k],
+        }
+        for method, ranking in rankings.items():
+            row = results.setdefault((query["type"], method), {"chunk": [], "doc": []})
+            if query["chunk_id"] is not None:
+                row["chunk"].append(rank_of(ranking, lambda doc_id: doc_id == query["chunk_id"]))
+            row["doc"].append(rank_of(ranking, lambda doc_id: doc_id.split("#")[0] == query["file_name"]))
+
+    print(f"\n{'queries':<10} {'method':<8} {'n':>4} {'chunk hit@k':>12} {'chunk MRR':>10} {'doc hit@k':>10} {'doc MRR':>8}")
+    for (query_type, method), row in sorted(results.items()):
+        def summary(ranks):
+            if not ranks:
+                return "-", "-"
+            hits = sum(1 for r in ranks if r) / len(ranks)
+            mrr = sum(1 / r for r in ranks if r) / len(ranks)
+            return f"{hits:.3f}", f"{mrr:.3f}"
+        chunk_hit, chunk_mrr = summary(row["chunk"])
+        doc_hit, doc_mrr = summary(row["doc"])
+        print(f"{query_type:<10} {method:<8} {len(row['doc']):>4} {chunk_hit:>12} {chunk_mrr:>10} {doc_hit:>10} {doc_mrr:>8}")
+
+    lexical_ms.sort()
+    print(f"\nBM25 latency over {len(lexical_ms)} queries: p50={statistics.median(lexical_ms):.3f}ms  "
+          f"p99={lexical_ms[min(len(lexical_ms) - 1, int(len(lexical_ms) * 0.99))]:.3f}ms")
@@ -0,0 +1,54 @@
+#scripts/index_advisor.py
+# Proposes (and with --apply, creates) B-tree indexes on supply_chain_table from the SQL agent's
+# query log, then replays the affected logged queries to report latency before and after.
+# Usage (from backend/): python -m scripts.index_advisor [--days 30] [--limit 5] [--apply]
+import argparse
+
+from core.database import engine
+from services.sql_index_advisor import create_indexes, load_query_log, recommend_indexes, time_queries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recommend indexes for supply_chain_table from the SQL query log.")
+    parser.add_argument("--days", type=int, default=30, help="only analyze queries logged in the last N days")
+    parser.add_argument("--limit", type=int, default=5, help="maximum number of indexes to recommend")
+    parser.add_argument("--min-queries", type=int, default=2, help="ignore columns used by fewer logged queries")
+    parser.add_argument("--replay", type=int, default=10, help="number of logged queries to replay per index")
+    parser.add_argument("--apply", action="store_true", help="create the recommended indexes")
+    args = parser.parse_args()
+
+    entries = load_query_log(args.days)
+    print(f"Analyzing {len(entries)} logged queries from the last {args.days} days")
+    recommendations = recommend_indexes(engine, entries, limit=args.limit, min_queries=args.min_queries)
+    if not recommendations:
+        raise SystemExit("No index recommendations: every frequently filtered column is already indexed.")
+
+    print(f"\n{'column':<32} {'score':>8} {'queries':>8} {'total ms':>10}  clauses")
+    for r in recommendations:
+        print(f"{r['column']:<32} {r['score']:8.1f} {r['queries']:8d} {r['total_ms']:10.1f}  {', '.join(sorted(r['clauses']))}")
+    print()
+    for r in recommendations:
+        print(f"{r['ddl']};")
+
+    if not args.apply:
+        print("\nDry run; re-run with --apply to create these indexes and measure the effect.")
+        raise SystemExit(0)
+
+    replay = []
+    for r in recommendations:
+        replay.extend(sorted(r["sql"])[:args.replay])
+    replay = list(dict.fromkeys(replay))
+
+    before = time_queries(engine, replay)
+    create_indexes(engine, recommendations)
+    after = time_queries(engine, replay)
+
+    print(f"\n{'before (ms)':>12} {'after (ms)':>11} {'speedup':>8}  query")
+    total_before = total_after = 0.0
+    for sql in replay:
+        if sql not in before or sql not in after:
+            continue
+        total_before += before[sql]
+        total_after += after[sql]
+        print(f"{before[sql]:12.1f} {after[sql]:11.1f} {before[sql] / max(after[sql], 0.001):7.1f}x  {' '.join(sql.split())[:90]}")
+    if total_after:
+        print(f"\ntotal: {total_before:.1f} ms -> {total_after:.1f} ms ({total_before / total_after:.1f}x)")
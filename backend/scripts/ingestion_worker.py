@@ -0,0 +1,38 @@
+#scripts/ingestion_worker.py
+# Runs ingestion workers outside the API process. Each worker claims queued upload jobs from the
+# database, resumes jobs whose worker died from their last checkpoint, and indexes the documents.
+# Set INGEST_WORKER_IN_PROCESS=false on the API when running dedicated workers.
+# Usage (from backend/): python -m scripts.ingestion_worker [--workers 2] [--once]
+import argparse
+import multiprocessing
+
+from core.database import Base, engine
+
+
+def worker_main(once):
+    from services.ingestion_pipeline import run_worker, shutdown_parse_pool
+    try:
+        run_worker(once=once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_parse_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process queued document ingestion jobs.")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes to start")
+    parser.add_argument("--once", action="store_true", help="exit once the queue is empty")
+    args = parser.parse_args()
+
+    import models.base_models  # noqa: F401  registers the ingestion tables
+    Base.metadata.create_all(bind=engine)
+    if args.workers == 1:
+        worker_main(args.once)
+    else:
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=worker_main, args=(args.once,), name=f"ingest-worker-{i}") for i in range(args.workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
@@ -0,0 +1,103 @@
+#scripts/measure_cold_start.py
+# Measures worker cold start: the time to import main (what every uvicorn worker pays before
+# serving), the time until GET / answers, and the time until GET /ready reports ready.
+# With --ref, the same is measured for a git ref checked out in a temporary worktree, pointed at
+# this tree's database and vector store, so before/after numbers come from one run.
+# Usage (from backend/): python -m scripts.measure_cold_start [--runs 3] [--ref HEAD~1]
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from core.config import settings
+
+
+def shared_env():
+    env = dict(os.environ)
+    env["VECTOR_STORE_PATH"] = os.path.abspath(settings.VECTOR_STORE_PATH)
+    env["METADATA_PATH"] = os.path.abspath(settings.METADATA_PATH)
+    env["EMBEDDING_CACHE_PATH"] = os.path.abspath(settings.EMBEDDING_CACHE_PATH)
+    if settings.DATABASE_URL.startswith("sqlite:///"):
+        env["DATABASE_URL"] = "sqlite:///" + os.path.abspath(settings.DATABASE_URL[len("sqlite:///"):])
+    # Dedicated ingestion workers would otherwise start (and claim jobs) inside the measured server.
+    env["INGEST_WORKER_IN_PROCESS"] = "false"
+    return env
+
+
+def time_import(cwd, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=cwd, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def wait_for(url, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.05)
+    return False
+
+
+def time_server(cwd, env, port, timeout):
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)], cwd=cwd, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + timeout
+        serving = time.perf_counter() - start if wait_for(f"http://127.0.0.1:{port}/", deadline) else None
+        ready = wait_for(f"http://127.0.0.1:{port}/ready", deadline)
+        # A tree without /ready is "ready" when it serves.
+        ready_seconds = (time.perf_counter() - start) if ready else (serving if ready is None else None)
+        return serving, ready_seconds
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def measure(label, cwd, env, args):
+    imports, serving, ready = [], [], []
+    for _ in range(args.runs):
+        imports.append(time_import(cwd, env))
+        s, r = time_server(cwd, env, args.port, args.timeout)
+        if s is not None:
+            serving.append(s)
+        if r is not None:
+            ready.append(r)
+    fmt = lambda values: f"{statistics.median(values):.2f}s" if values else "-"
+    print(f"{label:<20} import={fmt(imports):>8}  serving={fmt(serving):>8}  ready={fmt(ready):>8}  (median of {args.runs})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import, time-to-serve and time-to-ready for the API.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--ref", help="also measure this git ref (e.g. the commit before lazy startup)")
+    args = parser.parse_args()
+
+    env = shared_env()
+    here = os.getcwd()
+    measure("working tree", here, env, args)
+    if args.ref:
+        repo_root = subprocess.run(["git", "rev-parse", "--show-toplevel"], capture_output=True, text=True, check=True).stdout.strip()
+        worktree = tempfile.mkdtemp(prefix="cold-start-")
+        subprocess.run(["git", "worktree", "add", "--detach", worktree, args.ref], check=True, stdout=subprocess.DEVNULL)
+        try:
+            measure(args.ref, os.path.join(worktree, os.path.relpath(here, repo_root)), env, args)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", worktree], check=False)
+            shutil.rmtree(worktree, ignore_errors=True)
@@ -0,0 +1,17 @@
+#scripts/refresh_rollups.py
+# Rebuilds the pre-aggregated supply_chain_table rollups used by the SQL agent.
+# Usage (from backend/): python -m scripts.refresh_rollups [rollup_by_region ...]
+import argparse
+
+from core.database import engine
+from services.sql_rollups import ROLLUPS, refresh_rollups
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh supply chain rollup tables.")
+    parser.add_argument("rollups", nargs="*", help=f"rollups to refresh (default: all of {', '.join(ROLLUPS)})")
+    args = parser.parse_args()
+    unknown = [name for name in args.rollups if name not in ROLLUPS]
+    if unknown:
+        parser.error(f"unknown rollups: {', '.join(unknown)}")
+    for result in refresh_rollups(engine, args.rollups or None):
+        print(result)
@@ -0,0 +1,89 @@
+#scripts/report_worker_memory.py
+# Starts N worker processes that each load the vector store (like N uvicorn workers) and run a
+# few searches, then reports RSS and PSS per worker for the in-memory and mmap load modes.
+# PSS splits shared pages between the processes mapping them, so it shows what mmap saves.
+# Usage (from backend/): python -m scripts.report_worker_memory [--workers 4] [--searches 50]
+import argparse
+import multiprocessing
+import os
+
+
+def read_memory_kb():
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                values["rss"] = int(line.split()[1])
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    values["pss"] = int(line.split()[1])
+    except FileNotFoundError:
+        values["pss"] = None
+    return values
+
+
+def worker(mode, searches, barrier, results):
+    os.environ["VECTOR_STORE_LOAD_MODE"] = mode
+    import numpy as np
+    from services import vectorstore_manager
+
+    vectorstore_manager.ensure_loaded()
+    store = vectorstore_manager.vectorstore
+    if store is not None and store.index.ntotal:
+        rng = np.random.default_rng(os.getpid())
+        for _ in range(searches):
+            vector = rng.normal(size=store.index.d).astype("float32")
+            store.similarity_search_by_vector(vector.tolist(), k=5)
+    # Measure while every worker is alive, so shared pages are split between all of them.
+    barrier.wait()
+    results.put({"mode": mode, "pid": os.getpid(), "loaded": read_memory_kb()})
+    barrier.wait()
+
+
+def run_mode(mode, workers, searches):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(mode, searches, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return rows
+
+
+def fmt_mb(kb):
+    return "n/a" if kb is None else f"{kb / 1024:8.1f}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report per-worker memory for in-memory vs mmap vector store loading.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--searches", type=int, default=50)
+    args = parser.parse_args()
+
+    from core.config import settings
+    from services.mmap_docstore import DOCS_IDS_FILE
+    from services.vectorstore_persistence import VectorStoreJournal
+
+    snapshot_dir, _ = VectorStoreJournal(settings.VECTOR_STORE_PATH).current_snapshot()
+    if snapshot_dir is None or not os.path.exists(os.path.join(snapshot_dir, DOCS_IDS_FILE)):
+        raise SystemExit("No snapshot with an mmap docstore yet; run python -m scripts.compact_vectorstore --force first.")
+
+    totals = {}
+    for mode in ("memory", "mmap"):
+        rows = run_mode(mode, args.workers, args.searches)
+        print(f"\n{mode} mode, {args.workers} workers (MB)")
+        print(f"  {'pid':>8} {'RSS':>8} {'PSS':>8}")
+        for row in rows:
+            print(f"  {row['pid']:>8} {fmt_mb(row['loaded']['rss'])} {fmt_mb(row['loaded']['pss'])}")
+        totals[mode] = {
+            "rss": sum(row["loaded"]["rss"] for row in rows),
+            "pss": sum(row["loaded"]["pss"] or 0 for row in rows),
+        }
+        print(f"  {'total':>8} {fmt_mb(totals[mode]['rss'])} {fmt_mb(totals[mode]['pss'])}")
+
+    print(f"\nTotal PSS: memory={totals['memory']['pss'] / 1024:.1f} MB  mmap={totals['mmap']['pss'] / 1024:.1f} MB")
@@ -1,36 +1,42 @@
 #services/ClaudeRunnable.py
 from langchain_core.runnables import Runnable
+from typing import List, Optional
+import asyncio
 import requests
+import httpx
 import json
+from core.config import settings
+from services.http_clients import get_http_session, get_async_http_client
 
 class LLM(Runnable):
-    def __init__(self, api_key: str, model_id="claude-3.5-sonnet", max_tokens = None, temperature=0.3):
+    def __init__(self, api_key: str, model_id="claude-3.5-sonnet", max_tokens = None, temperature=0.3, url: Optional[str] = None):
         self.api_key = api_key
-        self.url = "https://quchnti6xu7yzw7hfzt5yjqtvi0kafsq.lambda-url.eu-central-1.on.aws/"
+        self.url = url or settings.SYN_MODEL_API_URL
         self.model_id = model_id
         self.max_tokens = max_tokens
         self.temperature = temperature
         self.headers = {"Content-Type": "application/json"}
 
-    def invoke(self, input: str, config=None) -> str:
-      if hasattr(input, "to_string"):
-          input = input.to_string()
-
-      model_params = {}
-      if self.max_tokens is not None:
-          model_params["max_tokens"] = self.max_tokens
-      if self.temperature is not None:
-          model_params["temperature"] = self.temperature
-
-      payload = {
-          "api_key": self.api_key,
-          "prompt": input,
-          "model_id": self.model_id,
-          "model_params": model_params
-      }
+    def _payload(self, input) -> str:
+        if hasattr(input, "to_string"):
+            input = input.to_string()
+
+        model_params = {}
+        if self.max_tokens is not None:
+            model_params["max_tokens"] = self.max_tokens
+        if self.temperature is not None:
+            model_params["temperature"] = self.temperature
 
+        return json.dumps({
+            "api_key": self.api_key,
+            "prompt": input,
+            "model_id": self.model_id,
+            "model_params": model_params
+        })
+
+    def invoke(self, input: str, config=None) -> str:
       try:
-          response = requests.post(self.url, headers=self.headers, data=json.dumps(payload))
+          response = get_http_session().post(self.url, headers=self.headers, data=self._payload(input), timeout=settings.HTTP_TIMEOUT)
           response.raise_for_status()
           data = response.json()
           return data["response"]["content"][0]["text"]
@@ -38,3 +44,31 @@ class LLM(Runnable):
           raise RuntimeError(f"Request failed: {e}")
       except KeyError:
           raise RuntimeError("Unexpected response structure.")
+
+    async def ainvoke(self, input: str, config=None, **kwargs) -> str:
+      try:
+          response = await get_async_http_client().post(self.url, headers=self.headers, content=self._payload(input))
+          response.raise_for_status()
+          data = response.json()
+          return data["response"]["content"][0]["text"]
+      except httpx.HTTPError as e:
+          raise RuntimeError(f"Request failed: {e}")
+      except KeyError:
+          raise RuntimeError("Unexpected response structure.")
+
+    async def abatch(self, inputs: List[str], config=None, *, return_exceptions: bool = False, **kwargs) -> List[str]:
+      max_concurrency = settings.LLM_MAX_CONCURRENCY
+      if isinstance(config, dict) and config.get("max_concurrency"):
+          max_concurrency = config["max_concurrency"]
+      semaphore = asyncio.Semaphore(max_concurrency)
+
+      async def _run(input):
+          async with semaphore:
+              try:
+                  return await self.ainvoke(input)
+              except Exception as e:
+                  if return_exceptions:
+                      return e
+                  raise
+
+      return await asyncio.gather(*(_run(input) for input in inputs))
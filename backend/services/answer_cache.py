@@ -0,0 +1,97 @@
+#services/answer_cache.py
+from typing import List, Optional
+import threading
+import time
+import numpy as np
+from core.config import settings
+from services.cache_stats import hit_stats
+
+
+def bypasses_cache(document_filters: Optional[dict]) -> bool:
+    """Answers built from a user-filtered subset of documents must not be served to unfiltered questions, nor the reverse."""
+    filters = document_filters or {}
+    return bool(filters.get('topics') or filters.get('file_names'))
+
+
+class SemanticAnswerCache:
+    """
+    In-process cache of generated answers keyed by the embedding of the rephrased question.
+    A lookup is a hit when the nearest cached question has cosine similarity >= threshold,
+    has not outlived its TTL and was answered against the current corpus version.
+    """
+
+    def __init__(
+        self,
+        threshold: float = settings.ANSWER_CACHE_THRESHOLD,
+        ttl_seconds: float = settings.ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = settings.ANSWER_CACHE_MAX_ENTRIES,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.corpus_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[dict] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def lookup(self, vector: List[float]) -> Optional[dict]:
+        query = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            if self._entries:
+                live = [i for i, entry in enumerate(self._entries) if entry["expires_at"] > now]
+                if len(live) != len(self._entries):
+                    self._entries = [self._entries[i] for i in live]
+                    self._vectors = self._vectors[live] if live else None
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            similarities = self._vectors @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry = self._entries[best]
+            return {"question": entry["question"], "answer": entry["answer"], "similarity": float(similarities[best])}
+
+    def put(self, question: str, vector: List[float], answer: str, corpus_version: int):
+        with self._lock:
+            if corpus_version != self.corpus_version:
+                # Answer was produced against a corpus that has since changed.
+                return
+            row = self._normalize(vector)[None, :]
+            self._entries.append({"question": question, "answer": answer, "expires_at": time.time() + self.ttl_seconds})
+            self._vectors = row if self._vectors is None else np.vstack([self._vectors, row])
+            if len(self._entries) > self.max_entries:
+                overflow = len(self._entries) - self.max_entries
+                self._entries = self._entries[overflow:]
+                self._vectors = self._vectors[overflow:]
+
+    def invalidate(self, corpus_version: Optional[int] = None):
+        with self._lock:
+            self._entries = []
+            self._vectors = None
+            self.invalidations += 1
+            if corpus_version is not None:
+                self.corpus_version = corpus_version
+
+    def stats(self) -> dict:
+        return {
+            **hit_stats(self.misses, hits=self.hits),
+            "entries": len(self._entries),
+            "invalidations": self.invalidations,
+            "corpus_version": self.corpus_version,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+        }
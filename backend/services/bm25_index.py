@@ -0,0 +1,101 @@
+#services/bm25_index.py
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+import heapq
+import math
+import re
+
+# Keeps section numbers, SKU codes and dotted/hyphenated identifiers ("4.2.1", "SKU-1042")
+# as whole tokens, and also indexes their parts.
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-/_][a-z0-9]+)*")
+PART_SPLIT_RE = re.compile(r"[.\-/_]")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "our", "that", "the", "this", "to", "was", "what", "when", "which",
+    "who", "why", "with", "we", "do", "does", "can", "i", "you",
+}
+
+
+def _fold_plural(token: str) -> str:
+    if len(token) > 3 and token.isalpha() and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for match in TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if PART_SPLIT_RE.search(token):
+            tokens.extend(part for part in PART_SPLIT_RE.split(token) if part)
+    return [_fold_plural(token) for token in tokens if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring, keyed by the same ids as the FAISS
+    docstore. Not thread-safe on its own; vectorstore_manager guards it with the search lock.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self._total_length = 0
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore) -> "BM25Index":
+        index = cls()
+        if vectorstore is not None:
+            for doc_id in vectorstore.index_to_docstore_id.values():
+                doc = vectorstore.docstore.search(doc_id)
+                if not isinstance(doc, str):
+                    index.add(doc_id, doc.page_content)
+        return index
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def add(self, doc_id: str, text: str):
+        if doc_id in self._doc_lengths:
+            self.remove(doc_id)
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._doc_lengths[doc_id] = len(tokens)
+        self._doc_terms[doc_id] = tuple(counts)
+        self._total_length += len(tokens)
+
+    def remove(self, doc_id: str):
+        if doc_id not in self._doc_lengths:
+            return
+        for term in self._doc_terms.pop(doc_id):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+
+    def search(self, query: str, k: int = 20, allowed: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        n_docs = len(self._doc_lengths)
+        if not n_docs:
+            return []
+        avg_length = self._total_length / n_docs
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
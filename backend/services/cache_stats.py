@@ -0,0 +1,11 @@
+#services/cache_stats.py
+
+
+def hit_stats(misses: int, **hit_counters: int) -> dict:
+    """
+    The hits/misses/hit_rate part of a cache's stats(). Every keyword is a kind of hit
+    (e.g. hits=..., plan_hits=...), and hit_rate is their sum over all lookups.
+    """
+    hits = sum(hit_counters.values())
+    lookups = hits + misses
+    return {**hit_counters, "misses": misses, "hit_rate": hits / lookups if lookups else 0.0}
@@ -1,47 +1,177 @@
 #services/customeEmbedingModel.py
 from langchain_core.embeddings import Embeddings
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import asyncio
 import requests
+import httpx
 import json
+import time
+from core.config import settings
+from services.embedding_cache import EmbeddingCache, embedding_cache_key, get_embedding_cache
+from services.http_clients import get_http_session, get_async_http_client
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
 
 class ClientAPIEmbeddings(Embeddings):
-    def __init__(self, api_key: str, model_id: str = "amazon-embedding-v2"):
+    def __init__(
+        self,
+        api_key: str,
+        model_id: str = "amazon-embedding-v2",
+        url: Optional[str] = None,
+        max_concurrency: int = settings.EMBEDDING_MAX_CONCURRENCY,
+        batch_size: int = settings.EMBEDDING_BATCH_SIZE,
+        max_retries: int = settings.EMBEDDING_MAX_RETRIES,
+        retry_backoff: float = settings.EMBEDDING_RETRY_BACKOFF,
+        timeout: float = settings.EMBEDDING_TIMEOUT,
+        cache: Optional[EmbeddingCache] = None,
+        use_cache: bool = True,
+    ):
         self.api_key = api_key
         self.model_id = model_id
-        self.url = "https://quchnti6xu7yzw7hfzt5yjqtvi0kafsq.lambda-url.eu-central-1.on.aws/"
-
-    def embed_documents(self, texts):
-      embeddings = []
-      for text in texts:
-          payload = {
-              "api_key": self.api_key,
-              "prompt": text,
-              "model_id": self.model_id
-          }
-          headers = {"Content-Type": "application/json"}
-          response = requests.post(self.url, headers=headers, data=json.dumps(payload))
-          
-          try:
-              result = response.json()
-          except Exception:
-              print("Non-JSON response:", response.text)
-              raise
-          
-          if "response" not in result:
-              print("Unexpected response format:", result) 
-              raise KeyError("Missing 'response' key in API response")
-
-          embedding_vector = result["response"]["embedding"]
-          embeddings.append(embedding_vector)
-      return embeddings
-
-
-    def embed_query(self, text):
-        payload = {
+        self.url = url or settings.SYN_MODEL_API_URL
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json"}
+        self.session = get_http_session()
+        self.cache = cache if cache is not None else (get_embedding_cache() if use_cache else None)
+
+    def _payload(self, text: str) -> str:
+        return json.dumps({
             "api_key": self.api_key,
             "prompt": text,
             "model_id": self.model_id
-        }
-        headers = {"Content-Type": "application/json"}
-        response = requests.post(self.url, headers=headers, data=json.dumps(payload))
-        result = response.json()
+        })
+
+    @staticmethod
+    def _parse_embedding(response) -> List[float]:
+        try:
+            result = response.json()
+        except Exception:
+            print("Non-JSON response:", response.text)
+            raise
+
+        if "response" not in result:
+            print("Unexpected response format:", result)
+            raise KeyError("Missing 'response' key in API response")
+
         return result["response"]["embedding"]
+
+    def _post_embedding(self, text: str) -> List[float]:
+        payload = self._payload(text)
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(self.url, headers=self.headers, data=payload, timeout=self.timeout)
+                if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                    raise requests.exceptions.HTTPError(f"Retryable status {response.status_code}", response=response)
+                break
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.HTTPError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                print(f"Embedding request failed ({e}), retrying in {delay:.2f}s [{attempt + 1}/{self.max_retries}]")
+                time.sleep(delay)
+                attempt += 1
+
+        # Out of retries (or not retryable): surface the HTTP error rather than a parse error.
+        response.raise_for_status()
+        return self._parse_embedding(response)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        if not texts:
+            return []
+        if self.cache is None:
+            return self._fetch_embeddings(texts)
+
+        cached = self.cache.get_many(self.model_id, texts)
+        missing = list({text: None for text in texts if embedding_cache_key(self.model_id, text) not in cached})
+        if missing:
+            fetched = self._fetch_embeddings(missing)
+            self.cache.put_many(self.model_id, missing, fetched)
+            for text, vector in zip(missing, fetched):
+                cached[embedding_cache_key(self.model_id, text)] = vector
+        return [cached[embedding_cache_key(self.model_id, text)] for text in texts]
+
+    def _fetch_embeddings(self, texts: List[str]) -> List[List[float]]:
+        if self.max_concurrency == 1 or len(texts) == 1:
+            return [self._post_embedding(text) for text in texts]
+
+        # The endpoint takes a single prompt per request, so batches are fanned out
+        # over a bounded pool; map() keeps results in input order.
+        embeddings = []
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(texts))) as executor:
+            for start in range(0, len(texts), self.batch_size):
+                batch = texts[start:start + self.batch_size]
+                embeddings.extend(executor.map(self._post_embedding, batch))
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.cache is None:
+            return self._post_embedding(text)
+        vector = self.cache.get(self.model_id, text)
+        if vector is None:
+            vector = self._post_embedding(text)
+            self.cache.put(self.model_id, text, vector)
+        return vector
+
+    async def _apost_embedding(self, text: str, semaphore: asyncio.Semaphore) -> List[float]:
+        client = get_async_http_client()
+        payload = self._payload(text)
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    response = await client.post(self.url, headers=self.headers, content=payload, timeout=self.timeout)
+                if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                    raise httpx.HTTPStatusError(f"Retryable status {response.status_code}", request=response.request, response=response)
+                break
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                print(f"Embedding request failed ({e}), retrying in {delay:.2f}s [{attempt + 1}/{self.max_retries}]")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        # Out of retries (or not retryable): surface the HTTP error rather than a parse error.
+        response.raise_for_status()
+        return self._parse_embedding(response)
+
+    async def _afetch_embeddings(self, texts: List[str]) -> List[List[float]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            embeddings.extend(await asyncio.gather(*(self._apost_embedding(text, semaphore) for text in batch)))
+        return embeddings
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        if not texts:
+            return []
+        if self.cache is None:
+            return await self._afetch_embeddings(texts)
+
+        cached = await asyncio.to_thread(self.cache.get_many, self.model_id, texts)
+        missing = list({text: None for text in texts if embedding_cache_key(self.model_id, text) not in cached})
+        if missing:
+            fetched = await self._afetch_embeddings(missing)
+            await asyncio.to_thread(self.cache.put_many, self.model_id, missing, fetched)
+            for text, vector in zip(missing, fetched):
+                cached[embedding_cache_key(self.model_id, text)] = vector
+        return [cached[embedding_cache_key(self.model_id, text)] for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if self.cache is None:
+            return await self._apost_embedding(text, asyncio.Semaphore(1))
+        vector = await asyncio.to_thread(self.cache.get, self.model_id, text)
+        if vector is None:
+            vector = await self._apost_embedding(text, asyncio.Semaphore(1))
+            await asyncio.to_thread(self.cache.put, self.model_id, text, vector)
+        return vector
@@ -0,0 +1,138 @@
+#services/embedding_cache.py
+from array import array
+from typing import Dict, List, Optional
+from pathlib import Path
+import threading
+import hashlib
+import sqlite3
+import time
+from core.config import settings
+from services.cache_stats import hit_stats
+
+
+def embedding_cache_key(model_id: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk, content-addressed embedding store (SQLite) shared by every ClientAPIEmbeddings
+    instance in the process. Entries are keyed by sha256(model_id, text) and evicted
+    least-recently-used once the stored vectors exceed max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " model_id TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+
+    def get_many(self, model_id: str, texts: List[str]) -> Dict[str, List[float]]:
+        keys = list({embedding_cache_key(model_id, text): None for text in texts})
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("d", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in found])
+                self._conn.commit()
+
+            for text in texts:
+                if embedding_cache_key(model_id, text) in found:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def get(self, model_id: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model_id, [text]).get(embedding_cache_key(model_id, text))
+
+    def put_many(self, model_id: str, texts: List[str], vectors: List[List[float]]):
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = array("d", vector).tobytes()
+            rows.append((embedding_cache_key(model_id, text), model_id, blob, len(blob), now))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model_id, vector, size, last_access) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+            self._writes_since_eviction += len(rows)
+            if self._writes_since_eviction >= 256:
+                self._evict_locked()
+
+    def put(self, model_id: str, text: str, vector: List[float]):
+        self.put_many(model_id, [text], [vector])
+
+    def _evict_locked(self):
+        self._writes_since_eviction = 0
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_access ASC"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self._conn.commit()
+        print(f"Embedding cache evicted {len(victims)} entries ({freed} bytes)")
+
+    def evict(self):
+        with self._lock:
+            self._evict_locked()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+        return {
+            **hit_stats(self.misses, hits=self.hits),
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    global _cache
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024)
+    return _cache
@@ -0,0 +1,176 @@
+#services/faiss_index_factory.py
+import faiss
+import numpy as np
+from typing import List, Optional, Set
+from core.config import settings
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+# IVF k-means wants roughly this many training points per list.
+MIN_POINTS_PER_LIST = 39
+
+
+def index_type_of(index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivfpq"
+    return "flat"
+
+
+def auto_nlist(n_vectors: int) -> int:
+    if settings.VECTOR_IVF_NLIST > 0:
+        nlist = settings.VECTOR_IVF_NLIST
+    else:
+        nlist = int(4 * np.sqrt(max(n_vectors, 1)))
+    return max(1, min(nlist, n_vectors // MIN_POINTS_PER_LIST))
+
+
+def pq_subquantizers(dim: int) -> int:
+    """Largest subquantizer count <= VECTOR_PQ_M that divides the dimension."""
+    for m in range(min(settings.VECTOR_PQ_M, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def can_build(index_type: str, n_vectors: int) -> bool:
+    if index_type == "ivfpq":
+        return n_vectors >= MIN_POINTS_PER_LIST and n_vectors >= 2 ** settings.VECTOR_PQ_NBITS
+    return True
+
+
+def new_index(index_type: str, dim: int, training_vectors: Optional[np.ndarray] = None):
+    """Creates an empty (and, for IVF-PQ, trained) index using the L2 metric the flat store uses."""
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.index_factory(dim, f"HNSW{settings.VECTOR_HNSW_M}", faiss.METRIC_L2)
+        index.hnsw.efConstruction = settings.VECTOR_HNSW_EF_CONSTRUCTION
+    elif index_type == "ivfpq":
+        if training_vectors is None or not can_build(index_type, len(training_vectors)):
+            raise ValueError("IVF-PQ needs enough training vectors; keep the flat index until the corpus grows")
+        nlist = auto_nlist(len(training_vectors))
+        index = faiss.index_factory(dim, f"IVF{nlist},PQ{pq_subquantizers(dim)}x{settings.VECTOR_PQ_NBITS}", faiss.METRIC_L2)
+        index.train(np.ascontiguousarray(training_vectors, dtype="float32"))
+    else:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+    apply_search_params(index)
+    return index
+
+
+def apply_search_params(index, ef_search: Optional[int] = None, nprobe: Optional[int] = None):
+    kind = index_type_of(index)
+    if kind == "hnsw":
+        faiss.downcast_index(index).hnsw.efSearch = ef_search or settings.VECTOR_HNSW_EF_SEARCH
+    elif kind == "ivfpq":
+        faiss.extract_index_ivf(index).nprobe = nprobe or settings.VECTOR_IVF_NPROBE
+    return index
+
+
+def search_positions(index, query: np.ndarray, k: int, positions: Optional[np.ndarray] = None,
+                     excluded: Optional[Set[int]] = None):
+    """
+    index.search, optionally restricted to the given FAISS positions, or skipping the excluded
+    (deleted) ones, with an IDSelector.
+    """
+    if positions is not None:
+        selector = faiss.IDSelectorBatch(np.asarray(positions, dtype=np.int64))
+    elif excluded:
+        batch = faiss.IDSelectorBatch(np.fromiter(excluded, dtype=np.int64, count=len(excluded)))
+        selector = faiss.IDSelectorNot(batch)
+    else:
+        return index.search(query, k)
+    kind = index_type_of(index)
+    if kind == "hnsw":
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=faiss.downcast_index(index).hnsw.efSearch)
+    elif kind == "ivfpq":
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=faiss.extract_index_ivf(index).nprobe)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    # selector (and the batch it wraps) must stay referenced until the search returns.
+    return index.search(query, k, params=params)
+
+
+def ensure_direct_map(index):
+    """IVF indexes can only reconstruct (for MMR and rebuilds) with a direct map; adds keep it up to date."""
+    if index_type_of(index) == "ivfpq":
+        ivf = faiss.extract_index_ivf(index)
+        if ivf.direct_map.type == faiss.DirectMap.NoMap:
+            ivf.make_direct_map()
+    return index
+
+
+def reconstruct_all(index) -> np.ndarray:
+    """Returns the stored vectors in position order (approximate for IVF-PQ)."""
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype="float32")
+    ensure_direct_map(index)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def build_from_vectors(index_type: str, vectors: np.ndarray, template=None):
+    """
+    Builds an index of the given type holding vectors in position order. An already trained
+    IVF-PQ template is reused so deletes do not re-run k-means.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    if template is not None and index_type_of(template) == index_type == "ivfpq":
+        index = faiss.clone_index(template)
+        index.reset()
+        apply_search_params(index)
+    else:
+        index = new_index(index_type, vectors.shape[1], training_vectors=vectors)
+    if len(vectors):
+        index.add(vectors)
+    return ensure_direct_map(index)
+
+
+def deleted_positions(vectorstore) -> Set[int]:
+    """Positions deleted from an HNSW/IVF-PQ store but still physically in its index."""
+    return getattr(vectorstore, "deleted_positions", None) or set()
+
+
+def _rebuild_without_deleted(vectorstore, index_type: str, template=None):
+    deleted = deleted_positions(vectorstore)
+    vectors = reconstruct_all(vectorstore.index)
+    keep = [pos for pos in sorted(vectorstore.index_to_docstore_id) if pos not in deleted]
+    vectorstore.index = build_from_vectors(index_type, vectors[keep], template=template)
+    vectorstore.index_to_docstore_id = {new_pos: vectorstore.index_to_docstore_id[pos] for new_pos, pos in enumerate(keep)}
+    vectorstore.deleted_positions = set()
+
+
+def convert_vectorstore(vectorstore, index_type: str) -> bool:
+    """
+    Rebuilds vectorstore.index as index_type (re-training IVF-PQ), dropping deleted positions.
+    Returns False if there are too few vectors.
+    """
+    if not can_build(index_type, vectorstore.index.ntotal - len(deleted_positions(vectorstore))):
+        return False
+    _rebuild_without_deleted(vectorstore, index_type)
+    return True
+
+
+def purge_deleted(vectorstore) -> bool:
+    """Physically removes deleted positions (reusing a trained IVF-PQ quantizer). Returns False if there were none."""
+    if vectorstore is None or not deleted_positions(vectorstore):
+        return False
+    _rebuild_without_deleted(vectorstore, index_type_of(vectorstore.index), template=vectorstore.index)
+    return True
+
+
+def delete_from_vectorstore(vectorstore, ids: List[str]):
+    """
+    Flat indexes remove the vectors right away (FAISS.delete renumbers positions). HNSW cannot
+    remove at all and IVF-PQ would need a rebuild, so their positions are only marked deleted:
+    searches skip them, and purge_deleted() drops them on the next compaction.
+    """
+    if index_type_of(vectorstore.index) == "flat":
+        vectorstore.delete(ids=ids)
+        return
+    remove = set(ids)
+    deleted = deleted_positions(vectorstore)
+    deleted.update(pos for pos, doc_id in vectorstore.index_to_docstore_id.items() if doc_id in remove)
+    vectorstore.deleted_positions = deleted
+    vectorstore.docstore.delete([doc_id for doc_id in ids if doc_id in vectorstore.docstore._dict])
@@ -0,0 +1,49 @@
+#services/http_clients.py
+from requests.adapters import HTTPAdapter
+import threading
+import asyncio
+import weakref
+import requests
+import httpx
+from core.config import settings
+
+_session = None
+_session_lock = threading.Lock()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_http_session(pool_size: int = settings.HTTP_MAX_CONNECTIONS) -> requests.Session:
+    # One pooled session per process so keep-alive connections are reused across calls.
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    # httpx.AsyncClient is bound to the loop it was first used on, so keep one per running loop.
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_CONNECTIONS,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_http_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
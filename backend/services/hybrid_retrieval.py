@@ -0,0 +1,57 @@
+#services/hybrid_retrieval.py
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+from langchain_core.documents import Document
+from typing import Dict, List, Optional, Sequence, Set
+import numpy as np
+from core.config import settings
+from services.bm25_index import BM25Index
+from services.faiss_index_factory import deleted_positions, search_positions
+
+
+def vector_ranking(vectorstore, query_vector: List[float], k: int, fetch_k: int, lambda_mult: float = 0.5,
+                   allowed_positions: Optional[np.ndarray] = None) -> List[str]:
+    """
+    Docstore ids ranked by MMR over the fetch_k nearest neighbours (same as the old mmr retriever),
+    optionally searching only allowed_positions. Deleted positions not yet compacted away are skipped.
+    """
+    query = np.array([query_vector], dtype=np.float32)
+    _, positions = search_positions(vectorstore.index, query, fetch_k, allowed_positions, excluded=deleted_positions(vectorstore))
+    positions = [int(p) for p in positions[0] if p != -1]
+    if not positions:
+        return []
+    try:
+        vectors = [vectorstore.index.reconstruct(p) for p in positions]
+        order = maximal_marginal_relevance(query, vectors, k=min(k, len(positions)), lambda_mult=lambda_mult)
+    except RuntimeError:
+        # Defensive: an index that cannot reconstruct (e.g. without a direct map); keep the distance order.
+        order = range(min(k, len(positions)))
+    return [vectorstore.index_to_docstore_id[positions[i]] for i in order]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[str]], rrf_k: int = 60) -> List[str]:
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def hybrid_search(vectorstore, lexical_index: Optional[BM25Index], query: str, query_vector: List[float], k: int = 5,
+                  allowed_ids: Optional[Set[str]] = None, allowed_positions: Optional[np.ndarray] = None) -> List[Document]:
+    """
+    Fuses the MMR vector ranking and the BM25 ranking with reciprocal-rank fusion. Without a
+    lexical index this is plain MMR. allowed_ids/allowed_positions restrict both sides to a subset.
+    """
+    if lexical_index is None:
+        ranked = vector_ranking(vectorstore, query_vector, k=k, fetch_k=max(20, k), allowed_positions=allowed_positions)
+    else:
+        candidates = max(k, settings.RETRIEVAL_CANDIDATES)
+        vector_ids = vector_ranking(vectorstore, query_vector, k=candidates, fetch_k=candidates * 2, allowed_positions=allowed_positions)
+        lexical_ids = [doc_id for doc_id, _ in lexical_index.search(query, candidates, allowed=allowed_ids)]
+        ranked = reciprocal_rank_fusion([vector_ids, lexical_ids], settings.RRF_K)
+    documents = []
+    for doc_id in ranked[:k]:
+        doc = vectorstore.docstore.search(doc_id)
+        if not isinstance(doc, str):
+            documents.append(doc)
+    return documents
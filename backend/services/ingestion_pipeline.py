@@ -0,0 +1,421 @@
+#services/ingestion_pipeline.py
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import BinaryIO, List, Optional, Tuple
+from uuid import uuid4
+from sqlalchemy import and_, func, or_
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import socket
+import threading
+from core.config import settings
+from core.database import SessionLocal
+from models.base_models import IngestionJob, IngestionJobFile
+from services.semantic_chunker import write_pdf_pages, iter_pages_file, chunk_pages
+from services.topic_extractor import extract_topics_from_text
+import services.vectorstore_manager as vectorstore_manager
+
+# Jobs live in the database and their files in INGEST_SPOOL_DIR/<job_id>/, so any worker (the
+# in-process thread or `python -m scripts.ingestion_worker`) can pick them up. Each file moves
+# through checkpoints, each saved to disk before its stage is recorded:
+#   queued -> parsed (<id>.pages.jsonl) -> chunked (<id>.chunks.json) -> embedded (<id>.embedded.pkl) -> indexed
+# A job whose worker stops heartbeating is claimed again and resumes from the last checkpoint.
+CHECKPOINT_STAGES = ("queued", "parsed", "chunked", "embedded", "indexed")
+FINAL_STAGES = ("indexed", "failed")
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+_wake = threading.Event()
+_worker_stop = threading.Event()
+_worker_thread: Optional[threading.Thread] = None
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # spawn: the API process has running threads, which fork does not copy safely.
+            _parse_pool = ProcessPoolExecutor(max_workers=settings.INGEST_PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _parse_pool
+
+
+def shutdown_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(cancel_futures=True)
+            _parse_pool = None
+
+
+def _job_dir(job_id: str) -> str:
+    return os.path.join(settings.INGEST_SPOOL_DIR, job_id)
+
+
+def _artifact(job_id: str, file_id: int, suffix: str) -> str:
+    return os.path.join(_job_dir(job_id), f"{file_id}{suffix}")
+
+
+def _write_artifact(path: str, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_stream_artifact(path: str, stream: BinaryIO):
+    tmp_path = f"{path}.tmp"
+    stream.seek(0)
+    with open(tmp_path, "wb") as f:
+        shutil.copyfileobj(stream, f, 1024 * 1024)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_artifact(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# ---------- enqueue + poll ----------
+
+def _pending_file_names(db) -> set:
+    rows = (
+        db.query(func.lower(IngestionJobFile.file_name))
+        .join(IngestionJob)
+        .filter(IngestionJob.status.in_(("queued", "running")), IngestionJobFile.stage.notin_(FINAL_STAGES))
+        .all()
+    )
+    return {name for (name,) in rows}
+
+
+def enqueue_ingestion_job(files: List[Tuple[str, BinaryIO]]) -> dict:
+    """Copies the uploaded PDF streams to the spool, records the job and returns its status. A worker picks it up asynchronously."""
+    job_id = str(uuid4())
+    db = SessionLocal()
+    try:
+        seen = _pending_file_names(db)
+        job = IngestionJob(id=job_id, status="queued")
+        duplicates = []
+        accepted = []
+        for file_name, stream in files:
+            if file_name.lower() in seen or vectorstore_manager.find_document_by_file_name(file_name) is not None:
+                duplicates.append(file_name)
+                continue
+            seen.add(file_name.lower())
+            row = IngestionJobFile(file_name=file_name, doc_id=str(uuid4()), stage="queued")
+            job.files.append(row)
+            accepted.append((row, stream))
+        job.duplicates = json.dumps(duplicates)
+        if not accepted:
+            job.status = "completed"
+            job.finished_at = datetime.utcnow()
+        db.add(job)
+        db.flush()
+
+        os.makedirs(_job_dir(job_id), exist_ok=True)
+        for row, stream in accepted:
+            _write_stream_artifact(_artifact(job_id, row.id, ".pdf"), stream)
+        db.commit()
+    except Exception:
+        db.rollback()
+        shutil.rmtree(_job_dir(job_id), ignore_errors=True)
+        raise
+    finally:
+        db.close()
+    _wake.set()
+    return get_job(job_id)
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        job = db.get(IngestionJob, job_id)
+        if job is None:
+            return None
+        files = {}
+        stages = {}
+        done = 0.0
+        for row in job.files:
+            files[row.file_name] = {
+                "stage": row.stage,
+                "doc_id": row.doc_id if row.stage == "indexed" else None,
+                "chunks": row.chunks,
+                "topics": json.loads(row.topics) if row.topics else None,
+                "error": row.error,
+            }
+            stages[row.stage] = stages.get(row.stage, 0) + 1
+            if row.stage == "failed":
+                done += 1
+            else:
+                done += CHECKPOINT_STAGES.index(row.stage) / (len(CHECKPOINT_STAGES) - 1)
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "attempts": job.attempts,
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            "duplicates": json.loads(job.duplicates) if job.duplicates else [],
+            "progress": done / len(files) if files else 1.0,
+            "stages": stages,
+            "files": files,
+        }
+    finally:
+        db.close()
+
+
+# ---------- claiming ----------
+
+def _claimable(now: datetime):
+    stale_before = now - timedelta(seconds=settings.INGEST_JOB_STALE_SECONDS)
+    return or_(
+        IngestionJob.status == "queued",
+        and_(IngestionJob.status == "running", IngestionJob.heartbeat_at < stale_before),
+    )
+
+
+def claim_next_job(worker_id: str) -> Optional[str]:
+    """
+    Takes the oldest queued job, or a running one whose worker stopped heartbeating. The
+    conditional UPDATE makes the claim atomic when several workers race for the same job.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        candidates = db.query(IngestionJob.id).filter(_claimable(now)).order_by(IngestionJob.created_at).limit(5).all()
+        for (job_id,) in candidates:
+            claimed = (
+                db.query(IngestionJob)
+                .filter(IngestionJob.id == job_id, _claimable(now))
+                .update({
+                    IngestionJob.status: "running",
+                    IngestionJob.worker_id: worker_id,
+                    IngestionJob.heartbeat_at: now,
+                    IngestionJob.attempts: IngestionJob.attempts + 1,
+                    IngestionJob.started_at: func.coalesce(IngestionJob.started_at, now),
+                }, synchronize_session=False)
+            )
+            db.commit()
+            if claimed:
+                return job_id
+        return None
+    finally:
+        db.close()
+
+
+def _heartbeat(job_id: str, worker_id: str) -> bool:
+    """Refreshes the claim. False means another worker has taken the job over."""
+    db = SessionLocal()
+    try:
+        updated = (
+            db.query(IngestionJob)
+            .filter(IngestionJob.id == job_id, IngestionJob.worker_id == worker_id, IngestionJob.status == "running")
+            .update({IngestionJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+        )
+        db.commit()
+        return updated == 1
+    finally:
+        db.close()
+
+
+def _set_file(file_id: int, **fields):
+    db = SessionLocal()
+    try:
+        db.query(IngestionJobFile).filter(IngestionJobFile.id == file_id).update(fields, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _finish_job(job_id: str, worker_id: str, status: str, error: Optional[str] = None):
+    db = SessionLocal()
+    try:
+        fields = {IngestionJob.status: status, IngestionJob.error: error}
+        if status in ("completed", "completed_with_errors", "failed"):
+            fields[IngestionJob.finished_at] = datetime.utcnow()
+        db.query(IngestionJob).filter(IngestionJob.id == job_id, IngestionJob.worker_id == worker_id).update(fields, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _outcome(job_id: str) -> Tuple[str, Optional[str]]:
+    """Final job status from its files: completed, completed_with_errors or failed (nothing indexed)."""
+    db = SessionLocal()
+    try:
+        stages = [row.stage for row in db.query(IngestionJobFile).filter(IngestionJobFile.job_id == job_id)]
+    finally:
+        db.close()
+    indexed = stages.count("indexed")
+    if indexed == len(stages):
+        return "completed", None
+    failed = len(stages) - indexed
+    if indexed == 0:
+        return "failed", f"none of the {failed} files could be indexed"
+    return "completed_with_errors", f"{failed} of {len(stages)} files failed"
+
+
+# ---------- processing ----------
+
+def _advance_file(job_id: str, file_id: int, doc_id: str, file_name: str, stage: str, topic_pool: ThreadPoolExecutor, lost: threading.Event) -> dict:
+    """Runs the remaining stages of one file, checkpointing after each, and returns its index payload."""
+    if stage == "queued":
+        # The child memory-maps the spooled PDF and streams page texts to disk, one page at a time.
+        get_parse_pool().submit(write_pdf_pages, _artifact(job_id, file_id, ".pdf"), _artifact(job_id, file_id, ".pages.jsonl")).result()
+        _set_file(file_id, stage="parsed")
+        stage = "parsed"
+    if lost.is_set():
+        raise RuntimeError("job was claimed by another worker")
+
+    if stage == "parsed":
+        chunks = list(chunk_pages(iter_pages_file(_artifact(job_id, file_id, ".pages.jsonl")), embeddings=vectorstore_manager.embedding))
+        if not chunks:
+            raise ValueError("no text could be extracted from the PDF")
+        _write_artifact(_artifact(job_id, file_id, ".chunks.json"), json.dumps(chunks).encode("utf-8"))
+        _set_file(file_id, stage="chunked", chunks=len(chunks))
+        stage = "chunked"
+    if lost.is_set():
+        raise RuntimeError("job was claimed by another worker")
+
+    if stage == "chunked":
+        chunks = json.loads(_read_artifact(_artifact(job_id, file_id, ".chunks.json")))
+        texts = [chunk["text"] for chunk in chunks]
+        topics_future = topic_pool.submit(extract_topics_from_text, "\n".join(texts))
+        if all("vector" in chunk for chunk in chunks):
+            # CHUNK_VECTORS_FROM_SENTENCES: the chunker already derived them from its sentence embeddings.
+            vectors = [chunk["vector"] for chunk in chunks]
+        else:
+            vectors = vectorstore_manager.embedding.embed_documents(texts)
+        topics = topics_future.result()
+        page_metadatas = [{"page": chunk["page"], "page_end": chunk["page_end"]} for chunk in chunks]
+        payload = vectorstore_manager.build_document_payload(doc_id, file_name, texts, vectors, topics, chunk_metadatas=page_metadatas)
+        _write_artifact(_artifact(job_id, file_id, ".embedded.pkl"), pickle.dumps(payload))
+        _set_file(file_id, stage="embedded", topics=json.dumps(topics))
+        return payload
+
+    return pickle.loads(_read_artifact(_artifact(job_id, file_id, ".embedded.pkl")))
+
+
+def process_job(job_id: str, worker_id: str):
+    db = SessionLocal()
+    try:
+        job = db.get(IngestionJob, job_id)
+        attempts = job.attempts
+        pending = [(row.id, row.doc_id, row.file_name, row.stage) for row in job.files if row.stage not in FINAL_STAGES]
+    finally:
+        db.close()
+
+    if attempts > settings.INGEST_MAX_ATTEMPTS:
+        for file_id, *_ in pending:
+            _set_file(file_id, stage="failed", error="gave up after repeated worker failures")
+        _finish_job(job_id, worker_id, "failed", f"gave up after {attempts - 1} attempts")
+        return
+
+    lost = threading.Event()
+    stop_heartbeat = threading.Event()
+
+    def heartbeat():
+        while not stop_heartbeat.wait(settings.INGEST_HEARTBEAT_SECONDS):
+            if not _heartbeat(job_id, worker_id):
+                lost.set()
+                return
+
+    heartbeat_thread = threading.Thread(target=heartbeat, name=f"ingest-heartbeat-{job_id[:8]}", daemon=True)
+    heartbeat_thread.start()
+    try:
+        prepared = []
+        with ThreadPoolExecutor(max_workers=settings.INGEST_MAX_CONCURRENCY) as file_pool, \
+                ThreadPoolExecutor(max_workers=settings.INGEST_MAX_CONCURRENCY) as topic_pool:
+            futures = {
+                file_pool.submit(_advance_file, job_id, file_id, doc_id, file_name, stage, topic_pool, lost): (file_id, file_name)
+                for file_id, doc_id, file_name, stage in pending
+            }
+            for future in as_completed(futures):
+                file_id, file_name = futures[future]
+                try:
+                    prepared.append((file_id, future.result()))
+                except Exception as e:
+                    if lost.is_set():
+                        continue
+                    print(f"Ingestion of {file_name} failed: {e}")
+                    _set_file(file_id, stage="failed", error=str(e))
+
+        if lost.is_set() or not _heartbeat(job_id, worker_id):
+            print(f"Ingestion job {job_id} was taken over by another worker; stopping.")
+            return
+
+        # A crash between the vector store commit and the stage update must not index a document twice.
+        to_index = [(file_id, payload) for file_id, payload in prepared if not vectorstore_manager.has_document(payload["doc_id"])]
+        vectorstore_manager.commit_documents([payload for _, payload in to_index])
+        for file_id, _ in prepared:
+            _set_file(file_id, stage="indexed")
+            for suffix in (".pdf", ".pages.jsonl", ".chunks.json", ".embedded.pkl"):
+                path = _artifact(job_id, file_id, suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+        status, error = _outcome(job_id)
+        _finish_job(job_id, worker_id, status, error)
+        shutil.rmtree(_job_dir(job_id), ignore_errors=True)
+        print(f"Ingestion job {job_id} {status}: {len(to_index)} documents indexed" + (f" ({error})" if error else ""))
+    except Exception as e:
+        # Checkpoints stay on disk; the next attempt resumes from them.
+        status = "queued" if attempts < settings.INGEST_MAX_ATTEMPTS else "failed"
+        print(f"Ingestion job {job_id} failed (attempt {attempts}), {status}: {e}")
+        _finish_job(job_id, worker_id, status, str(e))
+    finally:
+        stop_heartbeat.set()
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def run_worker(worker_id: Optional[str] = None, stop_event: Optional[threading.Event] = None, once: bool = False):
+    """Claims and processes jobs until stop_event is set (or, with once, until the queue is empty)."""
+    worker_id = worker_id or default_worker_id()
+    stop_event = stop_event or threading.Event()
+    print(f"Ingestion worker {worker_id} started")
+    while not stop_event.is_set():
+        try:
+            job_id = claim_next_job(worker_id)
+        except Exception as e:
+            print(f"Ingestion worker could not poll the job queue: {e}")
+            job_id = None
+        if job_id is None:
+            if once:
+                break
+            _wake.wait(settings.INGEST_POLL_SECONDS)
+            _wake.clear()
+            continue
+        process_job(job_id, worker_id)
+
+
+def start_ingestion_worker():
+    """Runs one worker thread inside the API process (INGEST_WORKER_IN_PROCESS)."""
+    global _worker_thread
+    if not settings.INGEST_WORKER_IN_PROCESS or (_worker_thread is not None and _worker_thread.is_alive()):
+        return
+    _worker_stop.clear()
+    _worker_thread = threading.Thread(target=run_worker, kwargs={"stop_event": _worker_stop}, name="ingest-worker", daemon=True)
+    _worker_thread.start()
+
+
+def stop_ingestion_worker():
+    global _worker_thread
+    _worker_stop.set()
+    _wake.set()
+    if _worker_thread is not None:
+        # A job in progress may outlast the timeout; its heartbeat then goes stale and another worker resumes it.
+        _worker_thread.join(timeout=settings.INGEST_WORKER_STOP_TIMEOUT_SECONDS)
+        if _worker_thread.is_alive():
+            print("Ingestion worker is still finishing a job; not starting another until it exits")
+            return
+    _worker_thread = None
+    shutdown_parse_pool()
@@ -0,0 +1,118 @@
+#services/lazy_resource.py
+from typing import Callable, Dict, Generic, Optional, TypeVar
+import asyncio
+import threading
+import time
+from core.config import settings
+
+T = TypeVar("T")
+
+# Every LazyResource registers here so the app lifespan can warm them up and /ready can report them.
+_registry: Dict[str, "LazyResource"] = {}
+_warm_up_state = {"started": False, "finished": False, "seconds": None}
+
+
+class ResourceUnavailable(RuntimeError):
+    def __init__(self, name: str, error: Optional[str]):
+        super().__init__(f"{name} is unavailable: {error}")
+        self.name = name
+        self.error = error
+
+
+class LazyResource(Generic[T]):
+    """
+    Builds a resource on first use, exactly once, under a lock (double-checked, so the ready path
+    takes no lock). A failed build is retried on a later get() once retry_seconds have passed,
+    instead of leaving the resource disabled for the life of the process.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T], required: bool = True, retry_seconds: Optional[float] = None):
+        self.name = name
+        self.factory = factory
+        self.required = required
+        self.retry_seconds = retry_seconds if retry_seconds is not None else settings.LAZY_INIT_RETRY_SECONDS
+        self.build_seconds: Optional[float] = None
+        self._value: Optional[T] = None
+        self._ready = False
+        self._error: Optional[str] = None
+        self._failed_at: Optional[float] = None
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def get(self) -> T:
+        if self._ready:
+            return self._value
+        with self._lock:
+            if self._ready:
+                return self._value
+            if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_seconds:
+                raise ResourceUnavailable(self.name, self._error)
+            start = time.perf_counter()
+            try:
+                value = self.factory()
+            except Exception as e:
+                self._error = f"{e.__class__.__name__}: {e}"
+                self._failed_at = time.monotonic()
+                print(f"Initializing {self.name} failed, retrying in {self.retry_seconds:.0f}s: {self._error}")
+                raise ResourceUnavailable(self.name, self._error) from e
+            self.build_seconds = time.perf_counter() - start
+            self._value = value
+            self._error = None
+            self._failed_at = None
+            self._ready = True
+            print(f"{self.name} initialized in {self.build_seconds:.2f}s")
+            return value
+
+    def get_or_none(self) -> Optional[T]:
+        try:
+            return self.get()
+        except ResourceUnavailable:
+            return None
+
+    async def aget(self) -> T:
+        """get() for async code: the first build runs in a worker thread instead of on the event loop."""
+        if self._ready:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+    async def aget_or_none(self) -> Optional[T]:
+        try:
+            return await self.aget()
+        except ResourceUnavailable:
+            return None
+
+    def status(self) -> dict:
+        return {
+            "ready": self._ready,
+            "required": self.required,
+            "build_seconds": round(self.build_seconds, 3) if self.build_seconds is not None else None,
+            "error": self._error,
+        }
+
+
+async def warm_up():
+    """Initializes every registered resource concurrently in worker threads."""
+    _warm_up_state["started"] = True
+    start = time.perf_counter()
+    await asyncio.gather(*(asyncio.to_thread(resource.get_or_none) for resource in list(_registry.values())))
+    _warm_up_state["seconds"] = round(time.perf_counter() - start, 3)
+    _warm_up_state["finished"] = True
+    print(f"Warm-up finished in {_warm_up_state['seconds']:.2f}s")
+
+
+def readiness() -> dict:
+    """Ready once warm-up has finished and every required resource is built; optional ones only degrade."""
+    resources = {name: resource.status() for name, resource in _registry.items()}
+    required_ready = all(status["ready"] for status in resources.values() if status["required"])
+    # Without a startup warm-up, resources are built by the first request that needs them.
+    ready = not settings.STARTUP_WARMUP_ENABLED or (_warm_up_state["finished"] and required_ready)
+    return {
+        "ready": ready,
+        "degraded": sorted(name for name, status in resources.items() if not status["ready"] and not status["required"]),
+        "warm_up_seconds": _warm_up_state["seconds"],
+        "resources": resources,
+    }
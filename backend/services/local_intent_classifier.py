@@ -0,0 +1,95 @@
+#services/local_intent_classifier.py
+from langchain_core.embeddings import Embeddings
+from typing import Callable, Dict, List, Optional, Tuple
+import threading
+import json
+import numpy as np
+from core.config import settings
+
+OFF_TOPIC_INTENT = "off_topic_response"
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalIntentClassifier:
+    """
+    Nearest-centroid intent classifier over question embeddings. Centroids are built from the
+    labelled examples in DATA/intent_examples.json, with the stored document topics added to
+    'fetch_doc', and rebuilt whenever the topic set changes.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        topics_provider: Callable[[], List[str]],
+        examples_path: str = settings.LOCAL_CLASSIFIER_EXAMPLES_PATH,
+        threshold: float = settings.LOCAL_CLASSIFIER_THRESHOLD,
+        margin: float = settings.LOCAL_CLASSIFIER_MARGIN,
+    ):
+        self.embeddings = embeddings
+        self.topics_provider = topics_provider
+        self.examples_path = examples_path
+        self.threshold = threshold
+        self.margin = margin
+        self.labels: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+        self._topics_key: Optional[Tuple[str, ...]] = None
+        self._lock = threading.Lock()
+
+    def _load_examples(self) -> Dict[str, List[str]]:
+        with open(self.examples_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def ensure_built(self):
+        topics = self.topics_provider() or []
+        topics_key = tuple(sorted(topics))
+        if self.centroids is not None and topics_key == self._topics_key:
+            return
+        with self._lock:
+            if self.centroids is not None and topics_key == self._topics_key:
+                return
+            examples = self._load_examples()
+            examples.setdefault("fetch_doc", [])
+            examples["fetch_doc"] = examples["fetch_doc"] + [f"What is our policy on {topic}?" for topic in topics]
+
+            labels = [label for label, texts in examples.items() if texts]
+            texts = [text for label in labels for text in examples[label]]
+            vectors = _normalize(np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32))
+
+            centroids = []
+            offset = 0
+            for label in labels:
+                count = len(examples[label])
+                centroids.append(vectors[offset:offset + count].mean(axis=0))
+                offset += count
+
+            self.labels = labels
+            self.centroids = _normalize(np.vstack(centroids))
+            self._topics_key = topics_key
+            print(f"Local intent classifier built: {len(texts)} examples, {len(topics)} document topics")
+
+    def score(self, question: str, vector: Optional[List[float]] = None) -> Tuple[str, float, float]:
+        """Returns (label, best cosine similarity, margin over the runner-up label)."""
+        self.ensure_built()
+        if vector is None:
+            vector = self.embeddings.embed_query(question)
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        similarities = self.centroids @ query
+        order = np.argsort(similarities)[::-1]
+        best = float(similarities[order[0]])
+        runner_up = float(similarities[order[1]]) if len(order) > 1 else -1.0
+        return self.labels[order[0]], best, best - runner_up
+
+    def is_confident(self, score: float, margin: float) -> bool:
+        return score >= self.threshold and margin >= self.margin
+
+    def classify(self, question: str, vector: Optional[List[float]] = None) -> Optional[str]:
+        """Returns the predicted intent, or None when the LLM classifiers should decide."""
+        label, score, margin = self.score(question, vector)
+        if self.is_confident(score, margin):
+            return label
+        return None
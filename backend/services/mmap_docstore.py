@@ -0,0 +1,109 @@
+#services/mmap_docstore.py
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from typing import List, Union
+import numpy as np
+import faiss
+import mmap
+import json
+import os
+
+# Snapshot files next to index.faiss/index.pkl. Records are JSON, stored back to back in
+# FAISS position order; offsets has n + 1 entries so record i is data[offsets[i]:offsets[i + 1]].
+# docs.ids lists the docstore ids in the same order, one per line.
+DOCS_DATA_FILE = "docs.bin"
+DOCS_OFFSETS_FILE = "docs.offsets.npy"
+DOCS_IDS_FILE = "docs.ids"
+
+
+def write_mmap_docstore(path: str, vectorstore: FAISS):
+    offsets = [0]
+    ids = [vectorstore.index_to_docstore_id[position] for position in range(vectorstore.index.ntotal)]
+    with open(os.path.join(path, DOCS_DATA_FILE), "wb") as f:
+        for doc_id in ids:
+            doc = vectorstore.docstore.search(doc_id)
+            record = json.dumps({"text": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False).encode("utf-8")
+            f.write(record)
+            offsets.append(offsets[-1] + len(record))
+        f.flush()
+        os.fsync(f.fileno())
+    np.save(os.path.join(path, DOCS_OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+    with open(os.path.join(path, DOCS_IDS_FILE), "w", encoding="utf-8") as f:
+        f.write("\n".join(ids))
+
+
+def save_snapshot_files(vectorstore: FAISS, path: str):
+    """save_local (index.faiss + pickled docstore) plus the mmap-able docstore, so either load mode works."""
+    vectorstore = materialize(vectorstore)
+    vectorstore.save_local(path)
+    write_mmap_docstore(path, vectorstore)
+
+
+class MmapDocstore(Docstore):
+    """Read-only docstore over docs.bin. Pages are shared between worker processes via the page cache."""
+
+    def __init__(self, path: str):
+        self._offsets = np.load(os.path.join(path, DOCS_OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(path, DOCS_DATA_FILE), "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        with open(os.path.join(path, DOCS_IDS_FILE), "r", encoding="utf-8") as f:
+            self._ids = f.read().split("\n") if len(self._offsets) > 1 else []
+        self._positions = {doc_id: position for position, doc_id in enumerate(self._ids)}
+
+    def _read(self, position: int) -> dict:
+        return json.loads(self._data[int(self._offsets[position]):int(self._offsets[position + 1])])
+
+    def __len__(self):
+        return len(self._positions)
+
+    def ids_in_order(self) -> List[str]:
+        return list(self._ids)
+
+    def search(self, search: str) -> Union[str, Document]:
+        position = self._positions.get(search)
+        if position is None:
+            return f"ID {search} not found."
+        record = self._read(position)
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+    def delete(self, ids: List) -> None:
+        raise NotImplementedError("MmapDocstore is read-only; call materialize() before mutating the store")
+
+    def to_in_memory(self) -> InMemoryDocstore:
+        return InMemoryDocstore({doc_id: self.search(doc_id) for doc_id in self.ids_in_order()})
+
+
+def mmap_flags() -> int:
+    # IO_FLAG_MMAP_IFC (faiss >= 1.8) also maps flat codes; older builds only map IVF lists.
+    return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+
+def load_mmap_vectorstore(path: str, embedding: Embeddings) -> FAISS:
+    """Memory-maps index.faiss and docs.bin. Falls back to load_local for snapshots without docs.bin."""
+    if not os.path.exists(os.path.join(path, DOCS_IDS_FILE)):
+        print(f"No mmap docstore in {path}; loading it into memory instead")
+        return FAISS.load_local(path, embedding, allow_dangerous_deserialization=True)
+    index = faiss.read_index(os.path.join(path, "index.faiss"), mmap_flags())
+    docstore = MmapDocstore(path)
+    index_to_docstore_id = dict(enumerate(docstore.ids_in_order()))
+    return FAISS(embedding_function=embedding, index=index, docstore=docstore, index_to_docstore_id=index_to_docstore_id)
+
+
+def is_mmapped(vectorstore) -> bool:
+    return vectorstore is not None and isinstance(vectorstore.docstore, MmapDocstore)
+
+
+def materialize(vectorstore):
+    """Returns a private, writable in-memory copy of an mmapped store (or the store itself)."""
+    if not is_mmapped(vectorstore):
+        return vectorstore
+    return FAISS(
+        embedding_function=vectorstore.embedding_function,
+        # A serialize round trip gives an index that owns its memory instead of viewing the mapping.
+        index=faiss.deserialize_index(faiss.serialize_index(vectorstore.index)),
+        docstore=vectorstore.docstore.to_in_memory(),
+        index_to_docstore_id=dict(vectorstore.index_to_docstore_id),
+    )
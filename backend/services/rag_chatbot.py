@@ -1,46 +1,49 @@
 # services/rag_chatbot.py
-from typing import List, TypedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import List, Optional, TypedDict
 from langchain.schema import BaseMessage, HumanMessage, AIMessage, Document, SystemMessage
 from langchain.prompts import ChatPromptTemplate
 from langchain_community.utilities import SQLDatabase
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
 from langchain.agents import initialize_agent, AgentType
+from langchain.tools import Tool
 from langchain_groq import ChatGroq
 from langgraph.graph import StateGraph, END
-import os
-from langchain_community.vectorstores import FAISS 
 from pydantic import BaseModel, Field
 
-from services.customeEmbedingModel import ClientAPIEmbeddings 
+from services.local_intent_classifier import LocalIntentClassifier, OFF_TOPIC_INTENT
+from services.vectorstore_manager import get_all_topics, register_corpus_listener
+from services.answer_cache import SemanticAnswerCache, bypasses_cache
+from services.sql_cache import SQLResultCache, extract_final_sql
+from services.sql_validation import clean_sql, validate_sql
+from services.sql_rollups import describe_rollups_for_prompt
+from services.sql_query_log import run_logged_query
+from services.lazy_resource import LazyResource
+from core.database import engine
+import services.vectorstore_manager as vectorstore_manager
 from core.config import settings
+import asyncio
 
 
+# LLM clients, the vector store and the SQL agent are built on first use (or by the warm-up
+# in main.py's lifespan), not at import.
+def _build_llms() -> dict:
+    return {
+        "default": ChatGroq(model="llama3-70b-8192", api_key=settings.GROK_API_KEY, temperature=0.2),
+        "fast": ChatGroq(model="llama3-70b-8192", api_key=settings.GROK_API_KEY, temperature=0.2),
+        "sql": ChatGroq(model="llama3-70b-8192", api_key=settings.GROK_API_KEY, temperature=0.6),
+    }
 
-llm_default = ChatGroq(model="llama3-70b-8192", api_key=settings.GROK_API_KEY, temperature=0.2)
-llm_fast = ChatGroq(model="llama3-70b-8192", api_key=settings.GROK_API_KEY, temperature=0.2)
-groq_llm=ChatGroq(model="llama3-70b-8192", api_key=settings.GROK_API_KEY, temperature=0.6)
 
-# Embeddings & vector store
-emb = ClientAPIEmbeddings(api_key=settings.SYN_MODEL_API_KEY)
-vector_path = settings.VECTOR_STORE_PATH 
+_llms = LazyResource("llms", _build_llms)
 
-vectorstore = None
-retriever = None
 
+def get_llm(role: str = "default"):
+    return _llms.get()[role]
 
-if vector_path and os.path.exists(vector_path) and os.listdir(vector_path): 
-    try:
-        vectorstore = FAISS.load_local(vector_path, emb, allow_dangerous_deserialization=True)
-        retriever = vectorstore.as_retriever(search_type="mmr", search_kwargs={"k": 5})
-        print(f"Successfully loaded vector store from {vector_path}")
-    except Exception as e:
-        print(f"Error loading vector store from {vector_path}: {e}. Document retrieval will be limited.")
-        vectorstore = None
-        retriever = None
-else:
-    print(f"Vector store path {vector_path} not found, empty, or not configured. Document retrieval will be unavailable.")
-    vectorstore = None
-    retriever = None
+# Embeddings & vector store: one shared instance per process, owned by vectorstore_manager.
+emb = vectorstore_manager.embedding
 
 
 
@@ -57,7 +60,17 @@ Context: {context}
 Question: {question}
 '''
 prompt_template = ChatPromptTemplate.from_template(template) 
-rag_chain = prompt_template | llm_default
+# Tokens from runs tagged with this role are forwarded to clients by /chat/stream.
+ANSWER_STREAM_ROLE = "answer"
+_rag_chain = LazyResource("rag_chain", lambda: (prompt_template | get_llm("default")).with_config(metadata={"stream_role": ANSWER_STREAM_ROLE}))
+
+
+async def aget_llm(role: str = "default"):
+    return (await _llms.aget())[role]
+
+
+async def aget_rag_chain():
+    return await _rag_chain.aget()
 
 
 # AgentState definition
@@ -69,12 +82,17 @@ class AgentState(TypedDict):
     question: HumanMessage
     retrieval_intent_method: str
     hybrid_sql_question: str
+    policy_context: str
+    corpus_version: int
+    document_filters: dict
+    classifier_topics: List[str]
+    speculation: Optional[dict]
+    answer_cache_hit: bool
 
 
 # ------------- Question Rewriting and Classification -------------
 
-def question_rewriter(state: AgentState):
-    print(f"Entering question_rewriter with current question: {state['question'].content}")
+def reset_turn_state(state: AgentState):
     if 'messages' not in state or state['messages'] is None:
         state['messages'] = [] 
 
@@ -83,8 +101,17 @@ def question_rewriter(state: AgentState):
     state["rephrased_question"] = ""
     state['retrieval_intent_method'] = ""
     state['hybrid_sql_question'] = ""
+    state['policy_context'] = ""
+    state['corpus_version'] = vectorstore_manager.corpus_version
+    state['classifier_topics'] = []
+    state['speculation'] = None
+    state['answer_cache_hit'] = False
+    if not state.get('document_filters'):
+        state['document_filters'] = {}
 
 
+def rephrase_messages(state: AgentState):
+    """Prompt for rephrasing the latest question, or None when there is no history to resolve it against."""
     current_question_content = state['question'].content
 
  
@@ -114,25 +141,29 @@ def question_rewriter(state: AgentState):
         msgs_for_rephrasing.append(HumanMessage(content=f"Latest user question to rephrase: {current_question_content}"))
         
         rephrase_prompt_template = ChatPromptTemplate.from_messages(msgs_for_rephrasing)
-        response = llm_fast.invoke(rephrase_prompt_template.format_messages())
+        return rephrase_prompt_template.format_messages()
+    return None
+
+
+async def question_rewriter(state: AgentState):
+    print(f"Entering question_rewriter with current question: {state['question'].content}")
+    reset_turn_state(state)
+
+    messages = rephrase_messages(state)
+    if messages:
+        response = await (await aget_llm("fast")).ainvoke(messages)
         state['rephrased_question'] = response.content.strip()
         print(f"Rephrased question (using human-only history): {state['rephrased_question']}")
     else:
-        state['rephrased_question'] = current_question_content
+        state['rephrased_question'] = state['question'].content
         print(f"No prior history, using original question: {state['rephrased_question']}")
-    
-    return state
-
 
-class GradeOutput(BaseModel):
-    decision: str = Field(description="Must be 'Yes' or 'No', indicating if the question is on topic.")
+    if settings.SPECULATIVE_RETRIEVAL_ENABLED:
+        start_speculation(state)
+    return state
 
-def question_classifier(state: AgentState):
-    print("Entering question_classifier")
-    system_msg = SystemMessage(content="""
-You are an expert classifier for DataCoGlobal's supply chain chatbot.
-Your task is to determine if a user's rephrased question is relevant to supply chain operations *within the context of DataCoGlobal*.
 
+ON_TOPIC_GUIDELINES = """
 Relevant topics to DataCoGlobal's supply chain operations include, but are not limited to:
 -   **Inventory Management:** Questions about inventory levels, stockouts, obsolete inventory, inventory turnover, stock locations, etc. (e.g., "How many units of product X are in stock?", "What is our policy on obsolete items?")
 -   **Orders and Sales Data:** Questions about order status, fulfillment, lead times, sales figures, sales amounts, order details, customer orders, purchase orders. (e.g., "What is the total sales amount for all orders?", "Find orders for customer Y.", "What's the status of order 123?")
@@ -147,26 +178,45 @@ Irrelevant topics (answer 'No' for these):
 -   Company HR policies, stock market performance, or overall business strategy unless directly and explicitly tied to a specific supply chain operation or data point mentioned above.
 -   Marketing campaign strategies (unless specifically about product demand forecasting impacting supply).
 -   Questions clearly outside the scope of internal supply chain data and policies.
+"""
 
+QUESTION_CLASSIFIER_PROMPT = """
+You are an expert classifier for DataCoGlobal's supply chain chatbot.
+Your task is to determine if a user's rephrased question is relevant to supply chain operations *within the context of DataCoGlobal*.
+""" + ON_TOPIC_GUIDELINES + """
 You MUST use the 'GradeOutput' tool to provide your answer.
 Based on the rephrased user question, if the question is relevant to DataCoGlobal's supply chain operations as described above, set the 'decision' field in the GradeOutput tool to 'Yes'.
 If the question is not relevant, set the 'decision' field to 'No'.
-""")
+"""
+
+class GradeOutput(BaseModel):
+    decision: str = Field(description="Must be 'Yes' or 'No', indicating if the question is on topic.")
+
+def grade_prompt(state: AgentState) -> ChatPromptTemplate:
+    system_msg = SystemMessage(content=QUESTION_CLASSIFIER_PROMPT)
     human_msg = HumanMessage(content=f"User question: {state['rephrased_question']}")
-    grade_prompt_template = ChatPromptTemplate.from_messages([system_msg, human_msg])
-    
-    structured_llm = llm_default.with_structured_output(GradeOutput) 
-    
+    return ChatPromptTemplate.from_messages([system_msg, human_msg])
+
+
+def question_classifier_failed(state: AgentState, e: Exception):
+    print(f"Error in question_classifier during LLM call: {e}")
+    state['on_topic'] = "No" 
+    if hasattr(e, 'response') and hasattr(e.response, 'text'):
+        print(f"Groq API response text for question_classifier error: {e.response.text}")
+
+
+async def question_classifier(state: AgentState):
+    print("Entering question_classifier")
+    structured_llm = (await aget_llm("default")).with_structured_output(GradeOutput)
+
     try:
-        result = (grade_prompt_template | structured_llm).invoke({})
-        state['on_topic'] = result.decision.strip() # Use the 'decision' field from GradeOutput
+        result = await (grade_prompt(state) | structured_llm).ainvoke({})
+        state['on_topic'] = result.decision.strip()
     except Exception as e:
-        print(f"Error in question_classifier during LLM call: {e}")
-        state['on_topic'] = "No" 
-        if hasattr(e, 'response') and hasattr(e.response, 'text'):
-            print(f"Groq API response text for question_classifier error: {e.response.text}")
+        question_classifier_failed(state, e)
 
     print(f"Question classified as on_topic: {state['on_topic']}")
+    settle_speculation(state)
     return state
 
 def on_topic_router(state: AgentState) -> str:
@@ -182,14 +232,7 @@ def on_topic_router(state: AgentState) -> str:
 
 # ------------- Intent Routing -------------
 
-def determine_and_set_retrieval_intent_node(state: AgentState) -> AgentState:
-    print("Entering determine_and_set_retrieval_intent_node")
-    
-    sys_msg_content = """
-You are an intent classifier. Your goal is to classify the user's rephrased question.
-You MUST use the 'IntentClassification' tool to provide your answer.
-The 'intent' field in your response must be one of: 'fetch_doc', 'fetch_sql', 'hybrid', or 'off_topic_response'.
-
+INTENT_GUIDELINES = """
 Consider these rules carefully for choosing the intent:
 - 'fetch_doc': The question asks *about* a policy, a definition, a procedure, or qualitative information typically found in documents. It does NOT ask for specific data values that would require calculations or direct database lookups based on that policy.
     
@@ -205,35 +248,191 @@ NOTE: IN FUE CASES DON'T ATTEMPT TO GO FOR fetch_sql, eg. okay now can you tell
 
 The document repository contains policies on: Inventory Management, Obsolete Inventory Handling, HSE, Supplier Selection, Ethical Sourcing, etc.
 The database contains transactional data for supply chain operations (orders, customers, products).
+"""
 
+INTENT_CLASSIFIER_PROMPT = """
+You are an intent classifier. Your goal is to classify the user's rephrased question.
+You MUST use the 'IntentClassification' tool to provide your answer.
+The 'intent' field in your response must be one of: 'fetch_doc', 'fetch_sql', 'hybrid', or 'off_topic_response'.
+""" + INTENT_GUIDELINES + """
 Classify the user's question based on the above guidelines.
-User's question: """ 
+User's question: """
+
+class IntentClassification(BaseModel):
+    intent: str = Field(description="The classification intent. Must be one of 'fetch_doc', 'fetch_sql', 'hybrid', or 'off_topic_response'.")
+    topics: List[str] = Field(default_factory=list, description="Document topics, copied exactly from the provided list, that the question is about. Empty if unsure.")
+
+
+def topic_filter_instructions() -> str:
+    """Lists the indexed document topics so the classifier can narrow retrieval to them."""
+    if not settings.CLASSIFIER_TOPIC_FILTER_ENABLED:
+        return ""
+    topics = sorted(get_all_topics())
+    if not topics:
+        return ""
+    return (
+        "\nIf the intent is 'fetch_doc' or 'hybrid', also fill 'topics' with up to 3 document topics from this list that the question is clearly about "
+        "(copy them exactly; leave 'topics' empty if none clearly applies):\n" + "\n".join(f"- {topic}" for topic in topics)
+    )
+
+
+def select_known_topics(candidates: List[str]) -> List[str]:
+    known = {topic.strip().lower(): topic for topic in get_all_topics()}
+    return [known[c.strip().lower()] for c in candidates or [] if c.strip().lower() in known][:3]
+
+
+def intent_prompt(state: AgentState) -> ChatPromptTemplate:
+    sys_msg_content = INTENT_CLASSIFIER_PROMPT + topic_filter_instructions()
     sys = SystemMessage(content=sys_msg_content)
     human = HumanMessage(content=f"{state['rephrased_question']}")
+    return ChatPromptTemplate.from_messages([sys, human])
 
-    class IntentClassification(BaseModel):
-       intent: str = Field(description="The classification intent. Must be one of 'fetch_doc', 'fetch_sql', 'hybrid', or 'off_topic_response'.")
 
-    structured_llm = llm_fast.with_structured_output(IntentClassification)
-    intent_prompt_template = ChatPromptTemplate.from_messages([sys, human])
-    
-    try:
-        result = (intent_prompt_template | structured_llm).invoke({}) 
+def apply_intent(state: AgentState, result: IntentClassification = None, error: Exception = None) -> str:
+    if error is None:
         intent = result.intent.strip()
-    except Exception as e:
-        print(f"Error in determine_and_set_retrieval_intent_node during LLM call: {e}")
+        state['classifier_topics'] = select_known_topics(result.topics) if intent in ['fetch_doc', 'hybrid'] else []
+    else:
+        print(f"Error in determine_and_set_retrieval_intent_node during LLM call: {error}")
         intent = "off_topic_response"
-        if hasattr(e, 'response') and hasattr(e.response, 'text'):
-            print(f"Groq API response text for intent_classification error: {e.response.text}")
-            
-    if retriever is None and intent in ['fetch_doc', 'hybrid']:
-        print(f"Retriever not available. Original intent was '{intent}'. Downstream nodes will handle missing documents.")
-
+        if hasattr(error, 'response') and hasattr(error.response, 'text'):
+            print(f"Groq API response text for intent_classification error: {error.response.text}")
     state['retrieval_intent_method'] = intent 
     print(f"determine_and_set_retrieval_intent_node: intent set to '{intent}' in state.")
+    return intent
+
+
+async def determine_and_set_retrieval_intent_node(state: AgentState) -> AgentState:
+    print("Entering determine_and_set_retrieval_intent_node")
+    structured_llm = (await aget_llm("fast")).with_structured_output(IntentClassification)
+
+    try:
+        intent = apply_intent(state, result=await (intent_prompt(state) | structured_llm).ainvoke({}))
+    except Exception as e:
+        intent = apply_intent(state, error=e)
+
+    if intent in ['fetch_doc', 'hybrid'] and not await asyncio.to_thread(vectorstore_manager.is_available):
+        print(f"Retriever not available. Original intent was '{intent}'. Downstream nodes will handle missing documents.")
+    settle_speculation(state)
+    return state
+
+
+# ------------- Local Fast-path Classifier -------------
+
+local_intent_classifier = LocalIntentClassifier(emb, get_all_topics)
+if settings.LOCAL_CLASSIFIER_ENABLED:
+    # Registered so the startup warm-up embeds the examples; score() would otherwise do it on the first question.
+    LazyResource("local_classifier", lambda: local_intent_classifier.ensure_built() or local_intent_classifier, required=False)
+
+async def local_classifier_node(state: AgentState) -> AgentState:
+    print("Entering local_classifier_node")
+    if not settings.LOCAL_CLASSIFIER_ENABLED:
+        return state
+    try:
+        vector = await aquery_vector(state)
+        # Scoring is NumPy work against the centroids (rebuilt from the topics when they change).
+        label, score, margin = await asyncio.to_thread(local_intent_classifier.score, state['rephrased_question'], vector)
+    except Exception as e:
+        print(f"Error in local_classifier_node, deferring to LLM classifiers: {e}")
+        return state
+    state = apply_local_classification(state, label, score, margin)
+    settle_speculation(state)
+    return state
+
+
+def apply_local_classification(state: AgentState, label: str, score: float, margin: float) -> AgentState:
+    if not local_intent_classifier.is_confident(score, margin):
+        print(f"local_classifier_node: low confidence for '{label}' (score={score:.3f}, margin={margin:.3f}), deferring to LLM classifiers.")
+        return state
+
+    state['on_topic'] = "No" if label == OFF_TOPIC_INTENT else "Yes"
+    state['retrieval_intent_method'] = label
+    print(f"local_classifier_node: intent set to '{label}' (score={score:.3f}, margin={margin:.3f}).")
+    return state
+
+
+def local_classifier_router(state: AgentState) -> str:
+    return state.get('retrieval_intent_method') or 'llm_classifier'
+
+
+# ------------- Fused Front-end -------------
+
+RETRIEVAL_INTENTS = ['fetch_doc', 'fetch_sql', 'hybrid', 'off_topic_response']
+
+FUSED_FRONTEND_PROMPT = """
+You are the front-end analyser for DataCoGlobal's supply chain chatbot. In ONE step you must rephrase the user's latest question, decide whether it is on topic, and classify its intent.
+You MUST use the 'FrontEndAnalysis' tool to provide your answer.
+
+1. 'rephrased_question': Rephrase the 'Latest user question' into a clear, self-contained question optimized for information retrieval.
+    - Focus entirely on the latest question. Use 'Previous User Questions' *only* to resolve pronouns (e.g., "it", "that") or very short follow-ups.
+    - Do NOT invent information. If there are no previous questions, return the latest question unchanged.
+2. 'on_topic': 'Yes' if the rephrased question is relevant to DataCoGlobal's supply chain operations, otherwise 'No'.
+""" + ON_TOPIC_GUIDELINES + """
+3. 'intent': One of 'fetch_doc', 'fetch_sql', 'hybrid', or 'off_topic_response'. Use 'off_topic_response' whenever 'on_topic' is 'No'.
+""" + INTENT_GUIDELINES
+
+
+class FrontEndAnalysis(BaseModel):
+    rephrased_question: str = Field(description="The latest user question rephrased as a clear, standalone question.")
+    on_topic: str = Field(description="Must be 'Yes' or 'No', indicating if the question is on topic.")
+    intent: str = Field(description="The classification intent. Must be one of 'fetch_doc', 'fetch_sql', 'hybrid', or 'off_topic_response'.")
+    topics: List[str] = Field(default_factory=list, description="Document topics, copied exactly from the provided list, that the question is about. Empty if unsure.")
+
+
+async def fused_frontend_node(state: AgentState) -> AgentState:
+    print(f"Entering fused_frontend_node with current question: {state['question'].content}")
+    reset_turn_state(state)
+
+    structured_llm = (await aget_llm("fast")).with_structured_output(FrontEndAnalysis)
+    try:
+        result = await (frontend_prompt(state) | structured_llm).ainvoke({})
+    except Exception as e:
+        print(f"Error in fused_frontend_node, falling back to separate nodes: {e}")
+        return state
+    return apply_frontend_analysis(state, result)
+
+
+def frontend_prompt(state: AgentState) -> ChatPromptTemplate:
+    msgs = [SystemMessage(content=FUSED_FRONTEND_PROMPT + topic_filter_instructions())]
+    for msg in state['messages'][:-1]:
+        if isinstance(msg, HumanMessage):
+            msgs.append(HumanMessage(content=f"A Previous User Question: {msg.content}"))
+    msgs.append(HumanMessage(content=f"Latest user question: {state['question'].content}"))
+    return ChatPromptTemplate.from_messages(msgs)
+
+
+def apply_frontend_analysis(state: AgentState, result: FrontEndAnalysis) -> AgentState:
+    """Validates the structured analysis; an invalid one leaves 'on_topic' empty so the graph falls back."""
+    try:
+        on_topic = result.on_topic.strip()
+        intent = result.intent.strip()
+        rephrased = result.rephrased_question.strip()
+        if on_topic.lower() not in ('yes', 'no') or intent not in RETRIEVAL_INTENTS or not rephrased:
+            raise ValueError(f"Invalid front-end analysis: {result}")
+    except Exception as e:
+        print(f"Error in fused_frontend_node, falling back to separate nodes: {e}")
+        return state
+
+    if on_topic.lower() == 'no':
+        intent = 'off_topic_response'
+    state['rephrased_question'] = rephrased
+    state['on_topic'] = on_topic
+    state['retrieval_intent_method'] = intent
+    state['classifier_topics'] = select_known_topics(result.topics) if intent in ['fetch_doc', 'hybrid'] else []
+    print(f"fused_frontend_node: rephrased='{rephrased}', on_topic='{on_topic}', intent='{intent}', topics={state['classifier_topics']}")
     return state
 
 
+def entry_router(state: AgentState) -> str:
+    return 'fused_frontend' if settings.FUSED_FRONTEND_ENABLED else 'question_rewriter'
+
+
+def fused_frontend_router(state: AgentState) -> str:
+    if not state.get('on_topic'):
+        return 'fallback'
+    return state['retrieval_intent_method']
+
+
 def route_on_retrieval_intent_condition(state: AgentState) -> str:
     intent = state.get('retrieval_intent_method')
     if not intent:
@@ -242,42 +441,248 @@ def route_on_retrieval_intent_condition(state: AgentState) -> str:
     print(f"route_on_retrieval_intent_condition: Routing via key '{intent}'")
     return intent
 
-def retrieve_docs(state: AgentState): 
-    print("Entered retrieve_docs method.")
-    if retriever is None:
-        print("retrieve_docs: Retriever is not available. Skipping document retrieval.")
-        state["documents"] = []
-        state["messages"].append(AIMessage(content="I cannot access policy documents right now to answer this fully."))
-        return state
-    
+def retriever_unavailable(state: AgentState):
+    print("retrieve_docs: Retriever is not available. Skipping document retrieval.")
+    state["documents"] = []
+    state["messages"].append(AIMessage(content="I cannot access policy documents right now to answer this fully."))
+    return state
+
+
+def retrieval_filters(state: AgentState) -> dict:
+    filters = state.get("document_filters") or {}
+    if filters.get("topics") or filters.get("file_names"):
+        # Filters chosen by the user are strict.
+        return {"topics": filters.get("topics"), "file_names": filters.get("file_names")}
+    if state.get("classifier_topics"):
+        return {"topics": state["classifier_topics"], "strict": False}
+    return {}
+
 
-    documents = retriever.invoke(state["rephrased_question"])
+async def retrieve_docs(state: AgentState):
+    print("Entered retrieve_docs method.")
+    if not await asyncio.to_thread(vectorstore_manager.is_available):
+        return retriever_unavailable(state)
+
+    filters = retrieval_filters(state)
+    documents = await speculative_documents(state, filters)
+    if documents is None:
+        # The query is embedded over the async HTTP client; the FAISS/BM25 search itself is CPU work.
+        query_vector = await aquery_vector(state)
+        documents = await asyncio.to_thread(
+            vectorstore_manager.retrieve, state["rephrased_question"], query_vector=query_vector, **filters
+        )
     print(f"retrieve_docs: Retrieved {len(documents)} documents")
     state["documents"] = documents
     return state
 
-def generate_doc_answer(state: AgentState):
-    print("Entered generate_doc_answer method")
+# ------------- Speculative Retrieval -------------
+# With SPECULATIVE_RETRIEVAL_ENABLED, the graph starts embedding the rephrased question and
+# searching the vector store as soon as the rewriter returns, while the classifiers are still running.
+# Routes that turn out not to need documents cancel the speculative work; retrieval with different
+# filters (e.g. topics picked by the intent classifier) searches again but still reuses the vector.
+# Every speculative task is also registered with the request's speculation_scope(), which cancels
+# whatever is still running when the graph run ends, raises or the streaming client goes away.
 
-    
-    history_for_generation = state["messages"] 
-    documents_context = state["documents"]
-    question_to_answer = state["rephrased_question"] 
+_request_tasks: ContextVar[Optional[list]] = ContextVar("speculative_tasks", default=None)
+
+
+@asynccontextmanager
+async def speculation_scope():
+    # Each request runs in its own task and context, so the variable is simply set for this one.
+    tasks = []
+    _request_tasks.set(tasks)
+    try:
+        yield
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+def _report_speculation_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Speculative {task.get_name()} failed: {task.exception()}")
+
+
+async def _speculative_retrieve(question: str, filters: dict, vector_task: asyncio.Task):
+    if not await asyncio.to_thread(vectorstore_manager.is_available):
+        return None
+    # Shielded so cancelling the search does not cancel the embedding other nodes may still use.
+    query_vector = await asyncio.shield(vector_task)
+    return await asyncio.to_thread(vectorstore_manager.retrieve, question, query_vector=query_vector, **filters)
+
+
+def start_speculation(state: AgentState):
+    question = state['rephrased_question']
+    filters = retrieval_filters(state)
+    state['speculation'] = {'question': question, 'filters': filters, 'tasks': {}}
+    vector_task = add_speculative_task(state, 'vector', emb.aembed_query(question), "query embedding")
+    add_speculative_task(state, 'documents', _speculative_retrieve(question, filters, vector_task), "retrieval")
+    if settings.SPECULATIVE_SQL_PREFETCH:
+        # Builds the SQL agent and its schema/rollup context if startup warm-up has not already done it.
+        add_speculative_task(state, 'sql_resources', _sql_resources.aget_or_none(), "SQL prefetch")
+    print(f"start_speculation: started {', '.join(state['speculation']['tasks'])} for '{question}'")
+
+
+def add_speculative_task(state: AgentState, name: str, coro, description: str = None):
+    if not state.get('speculation'):
+        state['speculation'] = {'question': state['rephrased_question'], 'filters': None, 'tasks': {}}
+    task = asyncio.create_task(coro, name=description or name)
+    task.add_done_callback(_report_speculation_error)
+    state['speculation']['tasks'][name] = task
+    request_tasks = _request_tasks.get()
+    if request_tasks is not None:
+        request_tasks.append(task)
+    return task
+
+
+def cancel_speculative_task(state: AgentState, name: str):
+    speculation = state.get('speculation')
+    task = speculation['tasks'].get(name) if speculation else None
+    if task is not None and not task.done():
+        print(f"discard_speculation: cancelling speculative {task.get_name()}")
+        # A search already running in a worker thread finishes there; only its result is dropped.
+        task.cancel()
+
+
+def discard_speculation(state: AgentState, keep=()):
+    speculation = state.get('speculation')
+    if not speculation:
+        return
+    for name in speculation['tasks']:
+        if name not in keep:
+            cancel_speculative_task(state, name)
+
+
+def settle_speculation(state: AgentState):
+    """Cancels the speculative work the route chosen so far cannot use."""
+    intent = state.get('retrieval_intent_method')
+    if state.get('on_topic') == "No" or intent == 'off_topic_response':
+        discard_speculation(state)
+    elif intent == 'fetch_sql':
+        discard_speculation(state, keep=('vector', 'sql_resources'))
+
+
+async def speculative_result(state: AgentState, name: str):
+    """Result of a speculative task started for the current rephrased question, or None."""
+    speculation = state.get('speculation')
+    if not speculation or speculation['question'] != state['rephrased_question']:
+        return None
+    task = speculation['tasks'].get(name)
+    if task is None or task.cancelled():
+        return None
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        return None
+
+
+async def speculative_documents(state: AgentState, filters: dict):
+    speculation = state.get('speculation')
+    if not speculation:
+        return None
+    if speculation['filters'] != filters:
+        # Searched with other filters; stop it so it does not hold a thread and the search lock.
+        cancel_speculative_task(state, 'documents')
+        return None
+    documents = await speculative_result(state, 'documents')
+    if documents is not None:
+        print(f"speculative_documents: using {len(documents)} documents retrieved during classification")
+    return documents
+
+
+async def aquery_vector(state: AgentState):
+    """Embedding of the rephrased question, shared with the speculative retrieval when there is one."""
+    vector = await speculative_result(state, 'vector')
+    if vector is None:
+        vector = await emb.aembed_query(state['rephrased_question'])
+    return vector
+
+# ------------- Semantic Answer Cache -------------
+
+answer_cache = SemanticAnswerCache()
+answer_cache.corpus_version = vectorstore_manager.corpus_version
+register_corpus_listener(answer_cache.invalidate)
+
+def has_user_filters(state: AgentState) -> bool:
+    return bypasses_cache(state.get('document_filters'))
+
+async def answer_cache_lookup_node(state: AgentState):
+    print("Entering answer_cache_lookup_node")
+    if not settings.ANSWER_CACHE_ENABLED or has_user_filters(state):
+        return state
+    try:
+        # Another worker may have changed the corpus; refresh() notices it (without waiting on
+        # writers) and invalidates the cache before we serve from it.
+        await asyncio.to_thread(vectorstore_manager.refresh)
+        state['corpus_version'] = vectorstore_manager.corpus_version
+        cached = answer_cache.lookup(await aquery_vector(state))
+    except Exception as e:
+        print(f"answer_cache_lookup_node: lookup failed, continuing with retrieval: {e}")
+        return state
+    if cached:
+        discard_speculation(state)
+    return apply_cached_answer(state, cached)
+
+
+def apply_cached_answer(state: AgentState, cached):
+    if cached:
+        print(f"answer_cache_lookup_node: hit (similarity={cached['similarity']:.3f}) for cached question '{cached['question']}'")
+        state['messages'].append(AIMessage(content=cached['answer']))
+        state['answer_cache_hit'] = True
+    return state
+
+def answer_cache_router(state: AgentState) -> str:
+    return 'hit' if state.get('answer_cache_hit') else 'miss'
+
+def should_cache_answer(state: AgentState) -> bool:
+    return settings.ANSWER_CACHE_ENABLED and bool(state['documents']) and not has_user_filters(state)
+
+
+def cache_answer(state: AgentState, answer: str, vector=None):
+    if not should_cache_answer(state):
+        return
+    try:
+        answer_cache.put(
+            state['rephrased_question'],
+            vector if vector is not None else emb.embed_query(state['rephrased_question']),
+            answer,
+            state.get('corpus_version', vectorstore_manager.corpus_version)
+        )
+    except Exception as e:
+        print(f"Warning: could not store answer in cache: {e}")
 
 
-    if not documents_context and retriever is None:
+async def store_answer_in_cache(state: AgentState, answer: str):
+    if not should_cache_answer(state):
+        return
+    try:
+        vector = await emb.aembed_query(state['rephrased_question'])
+    except Exception as e:
+        print(f"Warning: could not store answer in cache: {e}")
+        return
+    cache_answer(state, answer, vector)
+
+
+def generation_inputs(state: AgentState, retriever_available: bool) -> dict:
+    if not state["documents"] and not retriever_available:
         if state.get('retrieval_intent_method') in ['fetch_doc', 'hybrid']:
             state["messages"].append(AIMessage(content="I am currently unable to access detailed policy documents. I will try to answer based on general knowledge and available data."))
-            history_for_generation = state["messages"]
 
+    return {"history": state["messages"], "context": state["documents"], "question": state["rephrased_question"]}
 
-    response = rag_chain.invoke(
-        {"history": history_for_generation, "context": documents_context, "question": question_to_answer}
-    )
+
+async def generate_doc_answer(state: AgentState):
+    print("Entered generate_doc_answer method")
+    retriever_available = bool(state["documents"]) or await asyncio.to_thread(vectorstore_manager.is_available)
+
+    response = await (await aget_rag_chain()).ainvoke(generation_inputs(state, retriever_available))
     generation = response.content.strip()
 
     state["messages"].append(AIMessage(content=generation))
     print(f"generate_doc_answer: Generated response: {generation}")
+    if state.get('retrieval_intent_method') == 'fetch_doc':
+        await store_answer_in_cache(state, generation)
     return state
 
 
@@ -286,97 +691,222 @@ def generate_doc_answer(state: AgentState):
 TABLE_NAMES = ["supply_chain_table"]
 MAX_AGENT_ITERATIONS = 7 
 
-try:
-    db = SQLDatabase.from_uri(settings.DATABASE_URL)
-    
-
-    toolkit = SQLDatabaseToolkit(db=db, llm=groq_llm) 
-    
-    all_available_sql_tools = toolkit.get_tools()
-
-    schema_tool = next((t for t in all_available_sql_tools if t.name == 'sql_db_schema'), None)
-    query_tool = next((t for t in all_available_sql_tools if t.name == 'sql_db_query'), None)
-    query_checker_tool = next((t for t in all_available_sql_tools if t.name == 'sql_db_query_checker'), None)
-
-    if not all([schema_tool, query_tool, query_checker_tool]):
-        missing = [
-            name for name, tool_instance in [
-                ('sql_db_schema', schema_tool), ('sql_db_query', query_tool), ('sql_db_query_checker', query_checker_tool)
-            ] if not tool_instance
-        ]
-        raise ValueError(f"Essential SQL tools missing: {missing}. Ensure they are provided by the SQLDatabaseToolkit.")
-
-
-    sql_tools_for_agent = [schema_tool, query_checker_tool, query_tool]
+SQL_AGENT_RULES = (
+    "**VERY IMPORTANT**: Unless the user explicitly asks for ALL items or a very large number then compute yourself, if list of outcome is there then YOU MUST ALWAYS add a `LIMIT` clause to your SQL queries to return a small number of results.\n"
+    "In database there are 180,000 transactions so write query in efficient way.\n" 
+    "Fetch data by yourself using sql_db_query instead of returning all thousands or millions of rows.\n"
+    "Focus on answering the user's question accurately using the available tools and table schema.\n"
+    "If there any error happans while computing or fetching then debug it.\n"
+    "if you ae facing error like searching for any varaible example **JUST FOR Reference** **Region** == Southwest but there is no any region in our database so if you are facing error problem then do unique values but wait if you search unique vlues once if there is no value then give reponse No such value which you are asking, so think logically.\n "
+    "If your rows exceeds 20 output then give count of that instead of giving rows in response and restrict yourself to use 'LIMIT' other wise it will through LLM token exhausted error.\n"
+    "If told to find count then create sql query and run using tool sql_db_query then after finding count give response.\n"
+    "Do NOT call or reference any other tool, or any table not listed above.\n"
+    "If facing error then do max try for 2 times then give error in response."
+    "Think step-by-step. First, understand the question. Then, use the tools as described to get the data."
+)
 
-    schema_text_for_prompt = ""
-    if schema_tool:
-        try:
-            schema_text_for_prompt = schema_tool.invoke(",".join(TABLE_NAMES))
-        except Exception as e:
-            print(f"Warning: Could not fetch schema for {TABLE_NAMES} for prompt: {e}")
-            schema_text_for_prompt = f"Schema for {', '.join(TABLE_NAMES)} unavailable. Use `{schema_tool.name}` tool."
-    
 
-    agent_prefix = (
+def build_classic_agent_prefix(resources: dict) -> str:
+    return (
         f"You are a PostgreSQL SQL agent. Your goal is to answer user questions using the table(s): {', '.join(TABLE_NAMES)}.\n"
         f"You MUST use the following tools in this general order for querying:\n"
-        f"1. `{schema_tool.name}`: Input a comma-separated string of table names (e.g., '{TABLE_NAMES[0]}'). Use this to understand table columns and structure BEFORE writing a query.\n"
-        f"2. `{query_checker_tool.name}`: Input the SQL query string you constructed. Use this to validate your PostgreSQL query for correctness BEFORE executing it.\n"
-        f"3. `{query_tool.name}`: Input the validated SQL query string to get results from the database.\n\n"
+        f"1. `{resources['schema_tool'].name}`: Input a comma-separated string of table names (e.g., '{TABLE_NAMES[0]}'). Use this to understand table columns and structure BEFORE writing a query.\n"
+        f"2. `{resources['query_checker_tool'].name}`: Input the SQL query string you constructed. Use this to validate your PostgreSQL query for correctness BEFORE executing it.\n"
+        f"3. `{resources['query_tool'].name}`: Input the validated SQL query string to get results from the database.\n\n"
         "IMPORTANT RULES:\n"
         f"- Focus on the {', '.join(TABLE_NAMES)} table(s).\n"
         "- For queries returning lists of data (not aggregations like COUNT), use `LIMIT` (e.g., `LIMIT 5` or `LIMIT 10`) unless the user asks for all items. If a query returns more than 10-15 rows, consider if a more specific query or an aggregation is needed, or summarize the findings instead of listing all rows in your final answer.\n"
         "- If the user asks for a count (e.g., 'order counts for X'), your final answer should be the count, not just the SQL query or intermediate IDs.\n"
         "- If you encounter an error, analyze it, use the schema tool if needed, correct your query, re-check it, and then try executing again.\n"
         f"- You have a maximum of {MAX_AGENT_ITERATIONS} steps to answer the question.\n"
-        f"- Initial schema for {', '.join(TABLE_NAMES)} (always verify with `{schema_tool.name}` before querying):\n{schema_text_for_prompt}\n"
+        f"- Initial schema for {', '.join(TABLE_NAMES)} (always verify with `{resources['schema_tool'].name}` before querying):\n{resources['schema_text']}\n"
+        + (f"{resources['rollup_text']}\n" if resources['rollup_text'] else "") +
         "When you need to inspect table structure, call the tool sql_db_schema with argument supply_chain_table.\n"
         "When you need to execute a SQL query, call the tool sql_db_query and pass exactly your SQL string.\n"
-        "**VERY IMPORTANT**: Unless the user explicitly asks for ALL items or a very large number then compute yourself, if list of outcome is there then YOU MUST ALWAYS add a `LIMIT` clause to your SQL queries to return a small number of results.\n"
-        "In database there are 180,000 transactions so write query in efficient way.\n" 
-        "Fetch data by yourself using sql_db_query instead of returning all thousands or millions of rows.\n"
-        "Focus on answering the user's question accurately using the available tools and table schema.\n"
-        "If there any error happans while computing or fetching then debug it.\n"
-        "if you ae facing error like searching for any varaible example **JUST FOR Reference** **Region** == Southwest but there is no any region in our database so if you are facing error problem then do unique values but wait if you search unique vlues once if there is no value then give reponse No such value which you are asking, so think logically.\n "
-        "If your rows exceeds 20 output then give count of that instead of giving rows in response and restrict yourself to use 'LIMIT' other wise it will through LLM token exhausted error.\n"
-        "If told to find count then create sql query and run using tool sql_db_query then after finding count give response.\n"
-        "Do NOT call or reference any other tool or table.\n"
-        "If facing error then do max try for 2 times then give error in response."
-        "Think step-by-step. First, understand the question. Then, use the tools as described to get the data."
+        + SQL_AGENT_RULES
+    )
+
+
+def build_lean_agent_prefix(resources: dict) -> str:
+    return (
+        f"You are a PostgreSQL SQL agent. Your goal is to answer user questions using the table(s): {', '.join(TABLE_NAMES)}.\n"
+        f"The complete, current schema for {', '.join(TABLE_NAMES)} (with sample rows) is below. Do NOT ask for the schema again:\n{resources['schema_text']}\n\n"
+        + (f"{resources['rollup_text']}\n\n" if resources['rollup_text'] else "") +
+        f"You have ONE tool, `{resources['query_tool'].name}`: Input a single read-only SQL query string. The query is validated locally (syntax check and EXPLAIN) before it runs; "
+        "if it returns an error, correct the query and call the tool again.\n\n"
+        "IMPORTANT RULES:\n"
+        f"- Focus on the {', '.join(TABLE_NAMES)} table(s).\n"
+        "- For queries returning lists of data (not aggregations like COUNT), use `LIMIT` (e.g., `LIMIT 5` or `LIMIT 10`) unless the user asks for all items. If a query returns more than 10-15 rows, consider if a more specific query or an aggregation is needed, or summarize the findings instead of listing all rows in your final answer.\n"
+        "- If the user asks for a count (e.g., 'order counts for X'), your final answer should be the count, not just the SQL query or intermediate IDs.\n"
+        f"- You have a maximum of {MAX_AGENT_ITERATIONS} steps to answer the question; most questions need exactly one `{resources['query_tool'].name}` call.\n"
+        + SQL_AGENT_RULES
     )
 
-    sql_agent = initialize_agent( 
-        tools=sql_tools_for_agent, 
-        llm=groq_llm,
+
+def run_validated_query(query: str) -> str:
+    query = clean_sql(query)
+    error = validate_sql(query, engine)
+    if error:
+        return error
+    return run_logged_query(query)
+
+
+def run_unvalidated_query(query: str) -> str:
+    return run_logged_query(clean_sql(query))
+
+
+def build_sql_agent(mode: str, resources: dict):
+    if mode == "lean":
+        validated_query_tool = Tool(
+            name=resources['query_tool'].name,
+            func=run_validated_query,
+            description=(
+                "Execute a single read-only SQL query against the database and get back the result. "
+                "The query is syntax-checked and EXPLAINed first; if it is invalid an error message is returned instead. "
+                "Rewrite the query and try again when that happens."
+            )
+        )
+        tools, prefix = [validated_query_tool], build_lean_agent_prefix(resources)
+    else:
+        logged_query_tool = Tool(name=resources['query_tool'].name, func=run_unvalidated_query, description=resources['query_tool'].description)
+        tools, prefix = [resources['schema_tool'], resources['query_checker_tool'], logged_query_tool], build_classic_agent_prefix(resources)
+
+    return initialize_agent( 
+        tools=tools, 
+        llm=get_llm("sql"),
         agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
         verbose=True,
-        agent_kwargs={"prefix": agent_prefix},
+        agent_kwargs={"prefix": prefix},
         max_iterations=MAX_AGENT_ITERATIONS,
         early_stopping_method="generate",
-        handle_parsing_errors=True
+        handle_parsing_errors=True,
+        return_intermediate_steps=True
     )
-    print("SQL Agent initialized successfully with simplified prefix and essential tools.")
 
-except Exception as e:
-    print(f"Error initializing SQL Agent: {e.__class__.__name__}: {e}. SQL functionalities will be unavailable.")
-    db = None
-    sql_agent = None
 
-def standalone_sql_agent_node(state: AgentState):
-    result = sql_agent.run(state['rephrased_question'])
-    response = rag_chain.invoke({
-        'history': state['messages'],
-        'context': result,
-        'question': state['rephrased_question']
-    })
-    state['messages'].append(AIMessage(content=response.content.strip()))
-    return state
+def _build_sql_resources() -> dict:
+    """
+    Connects to the database and builds the SQL agent. A failure (e.g. the DB is briefly down)
+    is retried by the next question after LAZY_INIT_RETRY_SECONDS instead of disabling SQL for good.
+    """
+    db = SQLDatabase.from_uri(settings.DATABASE_URL)
+    toolkit = SQLDatabaseToolkit(db=db, llm=get_llm("sql"))
+    all_available_sql_tools = toolkit.get_tools()
 
+    schema_tool = next((t for t in all_available_sql_tools if t.name == 'sql_db_schema'), None)
+    query_tool = next((t for t in all_available_sql_tools if t.name == 'sql_db_query'), None)
+    query_checker_tool = next((t for t in all_available_sql_tools if t.name == 'sql_db_query_checker'), None)
 
-def hybrid_sql_agent_node(state: AgentState):
-    result = sql_agent.run(state['hybrid_sql_question'])
-    response = rag_chain.invoke({
+    if not all([schema_tool, query_tool, query_checker_tool]):
+        missing = [
+            name for name, tool_instance in [
+                ('sql_db_schema', schema_tool), ('sql_db_query', query_tool), ('sql_db_query_checker', query_checker_tool)
+            ] if not tool_instance
+        ]
+        raise ValueError(f"Essential SQL tools missing: {missing}. Ensure they are provided by the SQLDatabaseToolkit.")
+
+    sql_agent_mode = settings.SQL_AGENT_MODE
+    try:
+        schema_text_for_prompt = schema_tool.invoke(",".join(TABLE_NAMES))
+    except Exception as e:
+        print(f"Warning: Could not fetch schema for {TABLE_NAMES} for prompt: {e}")
+        schema_text_for_prompt = f"Schema for {', '.join(TABLE_NAMES)} unavailable. Use `{schema_tool.name}` tool."
+        # The lean agent has no schema tool, so it cannot work without the injected schema.
+        sql_agent_mode = "classic"
+
+    resources = {
+        "db": db,
+        "schema_tool": schema_tool,
+        "query_tool": query_tool,
+        "query_checker_tool": query_checker_tool,
+        "schema_text": schema_text_for_prompt,
+        "rollup_text": describe_rollups_for_prompt(engine),
+        "mode": sql_agent_mode,
+    }
+    resources['agent'] = build_sql_agent(sql_agent_mode, resources)
+    print(f"SQL Agent initialized successfully in '{sql_agent_mode}' mode.")
+    return resources
+
+
+_sql_resources = LazyResource("sql_agent", _build_sql_resources, required=False)
+
+
+def get_sql_resources():
+    """The SQL agent and its tools, or None while the database is unavailable."""
+    return _sql_resources.get_or_none()
+
+sql_cache = SQLResultCache(engine, TABLE_NAMES)
+
+def cached_sql_answer(question: str):
+    cached = sql_cache.get(question)
+    if cached:
+        print(f"run_sql_agent: cache hit for '{question}'")
+        return cached['output']
+    return None
+
+
+def reuse_sql_plan(resources: dict, question: str, vector, cache: bool = True):
+    """Re-runs the stored SQL of a semantically identical question; None when there is none or it fails."""
+    plan = sql_cache.find_plan(vector, question)
+    if not plan:
+        return None
+    print(f"run_sql_agent: reusing SQL from '{plan['question']}': {plan['sql']}")
+    rows = run_logged_query(plan['sql'], source="plan_reuse")
+    if rows.startswith("Error:"):
+        print(f"run_sql_agent: reused SQL failed ({rows}), running agent")
+        return None
+    output = f"Result of SQL query `{plan['sql']}`: {rows}"
+    if cache:
+        sql_cache.put(question, vector, plan['sql'], output)
+    return output
+
+
+def agent_result_sql(resources: dict, result: dict):
+    return extract_final_sql(result.get("intermediate_steps"), resources["query_tool"].name)
+
+
+async def run_sql_agent(question: str, vector=None, cache: bool = True) -> str:
+    """
+    Answers a data question, reusing a cached answer for the same normalized question or
+    re-running the stored SQL of a semantically identical one before falling back to the agent.
+    The cache and plan queries hit the database, so they run in worker threads. With cache=False
+    the cache is only read: nothing from this run is stored as an answer or a reusable plan.
+    """
+    resources = await _sql_resources.aget_or_none()
+    if resources is None:
+        return "The SQL database is currently unavailable, so no data could be fetched."
+
+    if settings.SQL_CACHE_ENABLED:
+        try:
+            output = await asyncio.to_thread(cached_sql_answer, question)
+            if output is not None:
+                return output
+            if vector is None:
+                vector = await emb.aembed_query(question)
+            output = await asyncio.to_thread(reuse_sql_plan, resources, question, vector, cache)
+            if output is not None:
+                return output
+        except Exception as e:
+            print(f"run_sql_agent: cache unavailable, running agent: {e}")
+
+    result = await resources["agent"].ainvoke({"input": question})
+    output = result["output"]
+    if settings.SQL_CACHE_ENABLED and cache:
+        try:
+            sql = agent_result_sql(resources, result)
+            if sql:
+                if vector is None:
+                    vector = await emb.aembed_query(question)
+                await asyncio.to_thread(sql_cache.put, question, vector, sql, output)
+        except Exception as e:
+            print(f"Warning: could not cache SQL agent result: {e}")
+    return output
+
+
+async def standalone_sql_agent_node(state: AgentState):
+    discard_speculation(state, keep=('vector', 'sql_resources'))
+    result = await run_sql_agent(state['rephrased_question'], await speculative_result(state, 'vector'))
+    response = await (await aget_rag_chain()).ainvoke({
         'history': state['messages'],
         'context': result,
         'question': state['rephrased_question']
@@ -390,38 +920,105 @@ def hybrid_sql_agent_node(state: AgentState):
 
 
 # ------------- Off-topic -------------
-def off_topic_response_node(state: AgentState): 
+async def off_topic_response_node(state: AgentState): 
     print("Entering off_topic_response_node")
+    discard_speculation(state)
 
     state["messages"].append(AIMessage(content="I'm sorry, I can only answer questions related to DataCoGlobal's supply chain operations. How can I help you with that?"))
     return state
 
 # ------------- Hybrid Steps -------------
-def hybrid_step_1_analyze_docs_node(state: AgentState):
-    print("Entering hybrid_step_1_analyze_docs_node.")
-    state = retrieve_docs(state) 
-    state = generate_doc_answer(state) 
+# Hybrid questions run: retrieval -> a short policy extraction that distills only the definitions and
+# thresholds the data query needs -> the SQL agent on a question with those criteria filled in -> one
+# final synthesis. The documents are therefore summarised once, by the fast model, instead of being
+# answered in full before the SQL agent can start.
+
+POLICY_EXTRACTION_PROMPT = """
+You prepare the data query for a question that combines DataCoGlobal's supply chain policies with database data.
+You MUST use the 'PolicyExtraction' tool to provide your answer.
+
+1. 'criteria': From the 'Policy documents', copy only the definitions, thresholds, time windows and rules that the data part of the question depends on, each as one short, precise statement that keeps the exact numbers and units. Leave it empty if the documents define nothing the data query needs.
+2. 'data_question': Rewrite the data-specific part of the 'User question' as a self-contained question for a SQL analyst, with the criteria written out explicitly (e.g. "items with no sales in the last 180 days" rather than "no-movers").
+"""
+
+
+class PolicyExtraction(BaseModel):
+    criteria: List[str] = Field(default_factory=list, description="Definitions and thresholds from the documents that the data query must apply, with exact numbers. Empty if none.")
+    data_question: str = Field(description="The data part of the user question as a self-contained question for a SQL analyst, with the criteria written out.")
+
+
+def documents_text(documents: List[Document]) -> str:
+    return "\n\n".join(doc.page_content for doc in documents)
+
+
+def policy_extraction_prompt(state: AgentState) -> ChatPromptTemplate:
+    sys = SystemMessage(content=POLICY_EXTRACTION_PROMPT)
+    human = HumanMessage(content=f"Policy documents:\n{documents_text(state['documents']) or '(no documents found)'}\n\nUser question: {state['rephrased_question']}")
+    return ChatPromptTemplate.from_messages([sys, human])
+
+
+def apply_policy_extraction(state: AgentState, result: PolicyExtraction = None, error: Exception = None) -> AgentState:
+    if error is None and result.data_question.strip():
+        state['policy_context'] = "\n".join(f"- {criterion.strip()}" for criterion in result.criteria if criterion.strip())
+        state['hybrid_sql_question'] = result.data_question.strip()
+    else:
+        if error is not None:
+            print(f"Error in policy extraction, querying with the question alone: {error}")
+        state['policy_context'] = ""
+        state['hybrid_sql_question'] = f"Answer the data-specific part of this question: '{state['rephrased_question']}'"
+    print(f"Policy criteria for the data query: {state['policy_context'] or 'none'}; SQL question: {state['hybrid_sql_question']}")
     return state
 
-def hybrid_step_2_fetch_sql_node(state: AgentState): 
-    print("Entering hybrid_step_2_fetch_sql_node.")
 
-    doc_analysis_response = ""
-    if state['messages'] and isinstance(state['messages'][-1], AIMessage):
-        doc_analysis_response = state['messages'][-1].content
-    
-    enriched_hybrid_question = f"Based on the user question: '{state['rephrased_question']}', and the following information found from documents: '{doc_analysis_response}', now answer the data-specific part of the user's question."
-    state['hybrid_sql_question'] = enriched_hybrid_question
-    state = hybrid_sql_agent_node(state) 
+def hybrid_synthesis_inputs(state: AgentState, sql_result: str) -> dict:
+    context = (
+        f"Policy documents:\n{documents_text(state['documents']) or 'No policy documents were found.'}\n\n"
+        f"Policy criteria applied to the data query:\n{state['policy_context'] or 'None.'}\n\n"
+        f"Data query ({state['hybrid_sql_question']}) result:\n{sql_result}"
+    )
+    return {'history': state['messages'], 'context': context, 'question': state['rephrased_question']}
+
+
+async def hybrid_step_1_analyze_docs_node(state: AgentState):
+    print("Entering hybrid_step_1_analyze_docs_node.")
+    state = await retrieve_docs(state)
+    if settings.HYBRID_SQL_PREFETCH:
+        # Questions whose data part needs no policy criteria can use the agent's answer to the
+        # question itself, so it starts alongside the extraction. Its SQL applies no criteria, so
+        # it must not become a cached plan for the criteria-filled question.
+        add_speculative_task(state, 'hybrid_sql', run_sql_agent(state['rephrased_question'], cache=False))
+    structured_llm = (await aget_llm("fast")).with_structured_output(PolicyExtraction)
+    try:
+        return apply_policy_extraction(state, result=await (policy_extraction_prompt(state) | structured_llm).ainvoke({}))
+    except Exception as e:
+        return apply_policy_extraction(state, error=e)
+
+async def hybrid_step_2_fetch_sql_node(state: AgentState):
+    print("Entering hybrid_step_2_fetch_sql_node.")
+    result = None
+    if not state['policy_context']:
+        result = await speculative_result(state, 'hybrid_sql')
+        if result is not None:
+            print("hybrid_step_2_fetch_sql_node: no policy criteria needed, using the prefetched data answer")
+    cancel_speculative_task(state, 'hybrid_sql')
+    if result is None:
+        result = await run_sql_agent(state['hybrid_sql_question'])
+    response = await (await aget_rag_chain()).ainvoke(hybrid_synthesis_inputs(state, result))
+    state['messages'].append(AIMessage(content=response.content.strip()))
     return state
 
 # ------------- LangGraph Wiring -------------
+# Nodes are coroutines, so the graph is driven with ainvoke/astream: LLM and embedding calls are awaited,
+# and only the blocking parts (FAISS/BM25 search, the SQL cache and database, classifier scoring) use threads.
 workflow = StateGraph(AgentState) 
 
 # Add nodes
+workflow.add_node('fused_frontend_node', fused_frontend_node)
 workflow.add_node('question_rewriter_node', question_rewriter) 
+workflow.add_node('local_classifier_node', local_classifier_node)
 workflow.add_node('question_classifier_node', question_classifier)
 workflow.add_node('determine_intent_node', determine_and_set_retrieval_intent_node)
+workflow.add_node('answer_cache_lookup_node', answer_cache_lookup_node)
 workflow.add_node('retrieve_documents_node', retrieve_docs)
 workflow.add_node('generate_doc_answer_node', generate_doc_answer)
 workflow.add_node('standalone_sql_node', standalone_sql_agent_node)
@@ -431,10 +1028,40 @@ workflow.add_node('hybrid_fetch_sql_node', hybrid_step_2_fetch_sql_node)
 
 
 # Entry point
-workflow.set_entry_point('question_rewriter_node')
+workflow.set_conditional_entry_point(
+    entry_router,
+    {
+        'fused_frontend': 'fused_frontend_node',
+        'question_rewriter': 'question_rewriter_node'
+    }
+)
+
+workflow.add_conditional_edges(
+    'fused_frontend_node',
+    fused_frontend_router,
+    {
+        'fallback': 'question_rewriter_node',
+        'fetch_doc': 'answer_cache_lookup_node',
+        'fetch_sql': 'standalone_sql_node',
+        'hybrid': 'hybrid_analyze_docs_node',
+        'off_topic_response': 'off_topic_node'
+    }
+)
 
 # Edges
-workflow.add_edge('question_rewriter_node', 'question_classifier_node')
+workflow.add_edge('question_rewriter_node', 'local_classifier_node')
+
+workflow.add_conditional_edges(
+    'local_classifier_node',
+    local_classifier_router,
+    {
+        'llm_classifier': 'question_classifier_node',
+        'fetch_doc': 'answer_cache_lookup_node',
+        'fetch_sql': 'standalone_sql_node',
+        'hybrid': 'hybrid_analyze_docs_node',
+        'off_topic_response': 'off_topic_node'
+    }
+)
 
 # Conditional Edges after question_classifier
 workflow.add_conditional_edges(
@@ -450,7 +1077,7 @@ workflow.add_conditional_edges(
     'determine_intent_node', 
     route_on_retrieval_intent_condition,    
     {
-        'fetch_doc': 'retrieve_documents_node',
+        'fetch_doc': 'answer_cache_lookup_node',
         'fetch_sql': 'standalone_sql_node',
         'hybrid': 'hybrid_analyze_docs_node',
         'off_topic_response': 'off_topic_node' 
@@ -458,6 +1085,14 @@ workflow.add_conditional_edges(
 )
 
 # Paths for final actions
+workflow.add_conditional_edges(
+    'answer_cache_lookup_node',
+    answer_cache_router,
+    {
+        'hit': END,
+        'miss': 'retrieve_documents_node'
+    }
+)
 workflow.add_edge('retrieve_documents_node', 'generate_doc_answer_node')
 workflow.add_edge('generate_doc_answer_node', END)
 workflow.add_edge('standalone_sql_node', END)
@@ -466,6 +1101,9 @@ workflow.add_edge('hybrid_analyze_docs_node', 'hybrid_fetch_sql_node')
 workflow.add_edge('hybrid_fetch_sql_node', END)
 
 
+# Nodes whose rag_chain generation is the final user-facing answer.
+STREAMED_ANSWER_NODES = {'generate_doc_answer_node', 'standalone_sql_node', 'hybrid_fetch_sql_node'}
+
 
 runnable = workflow.compile()
 
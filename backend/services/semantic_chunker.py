@@ -1,36 +1,232 @@
 #services/semantic_chunker.py
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import tempfile
+from bisect import bisect_right
+from pypdf import PdfReader
+import json
+import mmap
 import os
-from typing import List
+import re
+from typing import BinaryIO, Iterable, Iterator, List, Tuple, Union
 from services.customeEmbedingModel import ClientAPIEmbeddings
-from langchain_experimental.text_splitter import SemanticChunker
+import numpy as np
 from core.config import settings
-SYN_MODEL_API_KEY = os.getenv('SYN_MODEL_API_KEY')
 
+SENTENCE_END_RE = re.compile(r"(?<=[.?!])\s+")
 
-def load_pdf_and_chunk(file) -> List[str]:
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(file.file.read())
-        tmp_path = tmp.name
 
-    loader = PyPDFLoader(tmp_path)
-    pages = loader.load()
+def iter_pdf_pages(source: Union[str, BinaryIO]) -> Iterator[Tuple[int, str]]:
+    """
+    Yields (page_number, text) one page at a time, page numbers starting at 1. A path is
+    memory-mapped so the PDF bytes stay in the page cache; a file object (e.g. an upload's
+    spooled file) is parsed in place without copying it to a temp file.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from _iter_reader_pages(PdfReader(mapped))
+    else:
+        source.seek(0)
+        yield from _iter_reader_pages(PdfReader(source))
 
-    custom_embeddings = ClientAPIEmbeddings(api_key = settings.SYN_MODEL_API_KEY)
-    
 
-    full_text = "\n\n".join([page.page_content for page in pages])
-    
-    splitter = SemanticChunker(
-        custom_embeddings,
-        breakpoint_threshold_type="gradient",
-        breakpoint_threshold_amount=95
-        
-    )
-    chunks = splitter.split_text(full_text)
+def _iter_reader_pages(reader: PdfReader) -> Iterator[Tuple[int, str]]:
+    for number, page in enumerate(reader.pages, start=1):
+        yield number, page.extract_text() or ""
 
-    os.remove(tmp_path)  
-    
-    return chunks
+
+def write_pdf_pages(pdf_path: str, pages_path: str) -> int:
+    """Streams the page texts of a PDF to a JSON-lines file. Top-level so it can run in a process pool."""
+    count = 0
+    tmp_path = f"{pages_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        for number, text in iter_pdf_pages(pdf_path):
+            out.write(json.dumps({"page": number, "text": text}) + "\n")
+            count += 1
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, pages_path)
+    return count
+
+
+def iter_pages_file(pages_path: str) -> Iterator[Tuple[int, str]]:
+    with open(pages_path, "r", encoding="utf-8") as f:
+        for line in f:
+            page = json.loads(line)
+            yield page["page"], page["text"]
+
+
+class LocalSemanticChunker:
+    """
+    Project-owned replacement for langchain's SemanticChunker (gradient breakpoints). Each sentence is
+    embedded together with its neighbours, consecutive cosine distances and their gradient are computed
+    with NumPy, and chunks break where the gradient exceeds the given percentile. Chunks are then capped
+    at max_chunk_chars, tiny ones merged forward, and overlap_sentences repeated from the previous chunk.
+    With derive_vectors, each chunk also gets a vector derived from the sentence vectors it already has,
+    so indexing does not have to embed the chunk again.
+    """
+
+    def __init__(self, embeddings, breakpoint_percentile: float = None, buffer_size: int = 1,
+                 max_chunk_chars: int = None, min_chunk_chars: int = None, overlap_sentences: int = None,
+                 derive_vectors: bool = None):
+        self.embeddings = embeddings
+        self.breakpoint_percentile = breakpoint_percentile if breakpoint_percentile is not None else settings.CHUNK_BREAKPOINT_PERCENTILE
+        self.buffer_size = buffer_size
+        self.max_chunk_chars = max_chunk_chars if max_chunk_chars is not None else settings.CHUNK_MAX_CHARS
+        self.min_chunk_chars = min_chunk_chars if min_chunk_chars is not None else settings.CHUNK_MIN_CHARS
+        self.overlap_sentences = overlap_sentences if overlap_sentences is not None else settings.CHUNK_OVERLAP_SENTENCES
+        self.derive_vectors = derive_vectors if derive_vectors is not None else settings.CHUNK_VECTORS_FROM_SENTENCES
+
+    @staticmethod
+    def sentence_spans(text: str) -> List[Tuple[int, int]]:
+        """(start, end) of each sentence, without surrounding whitespace; whitespace-only text has none."""
+        bounds = []
+        start = 0
+        for match in SENTENCE_END_RE.finditer(text):
+            bounds.append((start, match.start()))
+            start = match.end()
+        bounds.append((start, len(text)))
+
+        spans = []
+        for start, end in bounds:
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if end > start:
+                spans.append((start, end))
+        return spans
+
+    def sentence_vectors(self, sentences: List[str]) -> np.ndarray:
+        b = self.buffer_size
+        combined = [" ".join(sentences[max(0, i - b):i + b + 1]) for i in range(len(sentences))]
+        return np.asarray(self.embeddings.embed_documents(combined), dtype=np.float32)
+
+    def breakpoints(self, vectors: np.ndarray) -> np.ndarray:
+        """Sentence indices after which a chunk ends."""
+        if len(vectors) < 3:
+            return np.zeros(0, dtype=np.int64)
+        norms = np.linalg.norm(vectors, axis=1)
+        unit = vectors / np.where(norms == 0, 1, norms)[:, None]
+        distances = 1.0 - np.einsum("ij,ij->i", unit[:-1], unit[1:])
+        gradient = np.gradient(distances)
+        threshold = np.percentile(gradient, self.breakpoint_percentile)
+        return np.flatnonzero(gradient > threshold)
+
+    def _groups(self, spans: List[Tuple[int, int]], breaks: np.ndarray) -> List[Tuple[int, int]]:
+        """[first, last) sentence ranges after the semantic split, the size cap and the minimum size."""
+        groups = []
+        first = 0
+        for end in list(breaks + 1) + [len(spans)]:
+            if end > first:
+                groups.append((first, int(end)))
+                first = int(end)
+
+        capped = []
+        for first, last in groups:
+            start = first
+            for i in range(first + 1, last):
+                if spans[i][1] - spans[start][0] > self.max_chunk_chars:
+                    capped.append((start, i))
+                    start = i
+            capped.append((start, last))
+
+        merged = []
+        for first, last in capped:
+            if merged and spans[merged[-1][1] - 1][1] - spans[merged[-1][0]][0] < self.min_chunk_chars \
+                    and spans[last - 1][1] - spans[merged[-1][0]][0] <= self.max_chunk_chars:
+                merged[-1] = (merged[-1][0], last)
+            else:
+                merged.append((first, last))
+        return merged
+
+    def split_with_spans(self, text: str) -> List[dict]:
+        """Chunks as {"text", "start", "end"} character spans of text, plus "vector" when derive_vectors is set."""
+        spans = self.sentence_spans(text)
+        if not spans:
+            return []
+        sentences = [text[start:end] for start, end in spans]
+        vectors = self.sentence_vectors(sentences) if len(spans) >= 3 or self.derive_vectors else None
+        breaks = self.breakpoints(vectors) if vectors is not None else np.zeros(0, dtype=np.int64)
+
+        chunks = []
+        for first, last in self._groups(spans, breaks):
+            first = max(0, first - self.overlap_sentences) if chunks else first
+            start, end = spans[first][0], spans[last - 1][1]
+            chunk = {"text": text[start:end], "start": start, "end": end}
+            if self.derive_vectors:
+                chunk["vector"] = self.chunk_vector(vectors[first:last], spans[first:last]).tolist()
+            chunks.append(chunk)
+        return chunks
+
+    @staticmethod
+    def chunk_vector(vectors: np.ndarray, spans: List[Tuple[int, int]]) -> np.ndarray:
+        """Length-weighted mean of the sentence vectors, rescaled to their mean norm (the index uses L2)."""
+        weights = np.array([end - start for start, end in spans], dtype=np.float32)
+        mean = np.average(vectors, axis=0, weights=weights)
+        norm = np.linalg.norm(mean)
+        target = np.linalg.norm(vectors, axis=1).mean()
+        return mean * (target / norm) if norm > 0 else mean
+
+    def split_text(self, text: str) -> List[str]:
+        return [chunk["text"] for chunk in self.split_with_spans(text)]
+
+
+def _splitter(embeddings=None) -> LocalSemanticChunker:
+    custom_embeddings = embeddings or ClientAPIEmbeddings(api_key = settings.SYN_MODEL_API_KEY)
+    return LocalSemanticChunker(custom_embeddings)
+
+
+def chunk_pages(pages: Iterable[Tuple[int, str]], embeddings=None, window_chars: int = None,
+                chunker: LocalSemanticChunker = None) -> Iterator[dict]:
+    """
+    Chunks page texts incrementally. Pages are buffered until window_chars characters, that window
+    is split, and every chunk but the last is emitted; the last one may continue on the next page,
+    so it is carried into the next window. Yields {"text", "page", "page_end"} (plus "vector" when
+    the chunker derives chunk vectors).
+    """
+    splitter = chunker or _splitter(embeddings)
+    window_chars = window_chars or settings.CHUNK_WINDOW_CHARS
+    buffer = ""
+    offsets: List[int] = []  # buffer offset where each page starts
+    numbers: List[int] = []
+
+    def emit(chunks: List[dict]) -> Iterator[dict]:
+        for chunk in chunks:
+            out = {
+                "text": chunk["text"],
+                "page": numbers[max(0, bisect_right(offsets, chunk["start"]) - 1)],
+                "page_end": numbers[max(0, bisect_right(offsets, chunk["end"] - 1) - 1)],
+            }
+            if "vector" in chunk:
+                out["vector"] = chunk["vector"]
+            yield out
+
+    for number, text in pages:
+        text = text.strip()
+        if not text:
+            continue
+        if buffer:
+            buffer += "\n\n"
+        offsets.append(len(buffer))
+        numbers.append(number)
+        buffer += text
+        if len(buffer) < window_chars:
+            continue
+
+        chunks = splitter.split_with_spans(buffer)
+        if len(chunks) >= 2:
+            yield from emit(chunks[:-1])
+            base = chunks[-1]["start"]
+        elif len(buffer) >= 4 * window_chars:
+            yield from emit(chunks)
+            base = len(buffer)
+        else:
+            continue
+        buffer = buffer[base:]
+        if not buffer:
+            offsets, numbers = [], []
+            continue
+        page_index = max(0, bisect_right(offsets, base) - 1)
+        offsets = [0] + [offset - base for offset in offsets[page_index + 1:]]
+        numbers = numbers[page_index:]
+
+    if buffer:
+        yield from emit(splitter.split_with_spans(buffer))
@@ -0,0 +1,181 @@
+#services/sql_cache.py
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from typing import List, Optional, Set, Tuple
+import threading
+import string
+import time
+import re
+import numpy as np
+import sqlglot
+from sqlglot import exp
+from core.config import settings
+from services.cache_stats import hit_stats
+from services.sql_validation import SQLGLOT_DIALECTS
+
+_PUNCTUATION = str.maketrans("", "", string.punctuation.replace("_", ""))
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+QUOTED_RE = re.compile(r"[\"'\u201c\u2018]([^\"'\u201d\u2019]+)[\"'\u201d\u2019]")
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().translate(_PUNCTUATION).split())
+
+
+def question_literals(question: str) -> Set[str]:
+    """Numbers and quoted values in a question, normalized."""
+    literals = {normalize_question(number) for number in NUMBER_RE.findall(question)}
+    literals.update(normalize_question(quoted) for quoted in QUOTED_RE.findall(question))
+    return {literal for literal in literals if literal}
+
+
+def sql_literals(sql: str, dialect: Optional[str] = None) -> Set[str]:
+    """String and number literals of a query (filter values, LIMIT counts, ...), normalized."""
+    try:
+        literals = [literal.this for statement in sqlglot.parse(sql, read=dialect) if statement is not None
+                    for literal in statement.find_all(exp.Literal)]
+    except sqlglot.errors.ParseError:
+        literals = re.findall(r"'([^']*)'", sql) + NUMBER_RE.findall(sql)
+    return {normalize_question(str(literal)) for literal in literals if normalize_question(str(literal))}
+
+
+def _mentions(normalized_question: str, literal: str) -> bool:
+    return f" {literal} " in f" {normalized_question} "
+
+
+def extract_final_sql(intermediate_steps, query_tool_name: str = "sql_db_query") -> Optional[str]:
+    """Returns the last SQL statement the agent executed successfully, if any."""
+    for action, observation in reversed(intermediate_steps or []):
+        if getattr(action, "tool", None) != query_tool_name:
+            continue
+        if isinstance(observation, str) and observation.strip().lower().startswith("error"):
+            continue
+        tool_input = action.tool_input
+        if isinstance(tool_input, dict):
+            tool_input = tool_input.get("query") or next(iter(tool_input.values()), "")
+        return str(tool_input).strip().strip("`").strip()
+    return None
+
+
+class SQLResultCache:
+    """
+    Caches SQL agent answers per normalized question and remembers the validated SQL so a
+    semantically identical question can re-run it directly instead of going through the agent.
+    A plan is only reused when the two questions carry the same numbers and quoted values, and
+    every literal of the stored SQL that the old question mentions is mentioned by the new one
+    too, so "orders in Europe" never re-runs for "orders in Asia", nor "top 5" for "top 10".
+    Every entry is tagged with the table version (row count plus, on PostgreSQL, the
+    insert/update/delete counters) and is ignored once the table changes or the TTL expires.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        table_names: List[str],
+        ttl_seconds: float = settings.SQL_CACHE_TTL_SECONDS,
+        plan_threshold: float = settings.SQL_CACHE_PLAN_THRESHOLD,
+        max_entries: int = settings.SQL_CACHE_MAX_ENTRIES,
+        version_check_seconds: float = settings.SQL_TABLE_VERSION_CHECK_SECONDS,
+    ):
+        self.engine = engine
+        self.table_names = table_names
+        self.ttl_seconds = ttl_seconds
+        self.plan_threshold = plan_threshold
+        self.max_entries = max_entries
+        self.version_check_seconds = version_check_seconds
+        self.hits = 0
+        self.plan_hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._version: Optional[Tuple] = None
+        self._version_checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def table_version(self) -> Tuple:
+        now = time.time()
+        if self._version is not None and now - self._version_checked_at < self.version_check_seconds:
+            return self._version
+        version = []
+        with self.engine.connect() as conn:
+            for table in self.table_names:
+                version.append(conn.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar())
+                if self.engine.dialect.name == "postgresql":
+                    counters = conn.execute(
+                        text("SELECT n_tup_ins, n_tup_upd, n_tup_del FROM pg_stat_user_tables WHERE relname = :table"),
+                        {"table": table},
+                    ).fetchone()
+                    version.append(tuple(counters) if counters else None)
+        self._version = tuple(version)
+        self._version_checked_at = now
+        return self._version
+
+    def _is_valid(self, entry: dict, version: Tuple) -> bool:
+        return entry["version"] == version and entry["expires_at"] > time.time()
+
+    def get(self, question: str) -> Optional[dict]:
+        key = normalize_question(question)
+        version = self.table_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self._is_valid(entry, version):
+                self.hits += 1
+                return entry
+            if entry:
+                del self._entries[key]
+        return None
+
+    @staticmethod
+    def plan_applies(entry: dict, question: str) -> bool:
+        if question_literals(entry["question"]) != question_literals(question):
+            return False
+        old, new = normalize_question(entry["question"]), normalize_question(question)
+        return all(_mentions(new, literal) for literal in entry["literals"] if _mentions(old, literal))
+
+    def find_plan(self, vector: List[float], question: str) -> Optional[dict]:
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        version = self.table_version()
+        candidates = []
+        with self._lock:
+            for entry in self._entries.values():
+                if entry["vector"] is None or not entry["sql"] or not self._is_valid(entry, version):
+                    continue
+                score = float(entry["vector"] @ query)
+                if score >= self.plan_threshold:
+                    candidates.append((score, entry))
+        for _, entry in sorted(candidates, key=lambda candidate: candidate[0], reverse=True):
+            if self.plan_applies(entry, question):
+                self.plan_hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def put(self, question: str, vector: Optional[List[float]], sql: Optional[str], output: str):
+        if vector is not None:
+            vector = np.asarray(vector, dtype=np.float32)
+            vector = vector / (np.linalg.norm(vector) or 1.0)
+        entry = {
+            "question": question,
+            "vector": vector,
+            "sql": sql,
+            "literals": sql_literals(sql, SQLGLOT_DIALECTS.get(self.engine.dialect.name)) if sql else set(),
+            "output": output,
+            "version": self.table_version(),
+            "expires_at": time.time() + self.ttl_seconds,
+        }
+        with self._lock:
+            self._entries[normalize_question(question)] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+        self._version = None
+
+    def stats(self) -> dict:
+        return {
+            **hit_stats(self.misses, hits=self.hits, plan_hits=self.plan_hits),
+            "entries": len(self._entries),
+            "table_version": self._version,
+        }
@@ -0,0 +1,151 @@
+#services/sql_index_advisor.py
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List
+import statistics
+import time
+import re
+import sqlglot
+from sqlglot import exp
+from core.database import SessionLocal
+from models.base_models import SQLQueryLog
+from services.sql_query_log import flush_query_log
+from services.sql_validation import SQLGLOT_DIALECTS
+
+TARGET_TABLE = "supply_chain_table"
+
+# How much a column's appearance in each clause counts towards its index score.
+CLAUSE_WEIGHTS = {"where": 3.0, "join": 3.0, "group": 1.0, "order": 1.0}
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def load_query_log(days: int = 30) -> List[SQLQueryLog]:
+    flush_query_log()
+    db = SessionLocal()
+    try:
+        since = datetime.utcnow() - timedelta(days=days)
+        return db.query(SQLQueryLog).filter(SQLQueryLog.created_at >= since, SQLQueryLog.error.is_(None)).all()
+    finally:
+        db.close()
+
+
+def _columns_by_clause(statement: exp.Expression) -> Dict[str, set]:
+    clauses = {
+        "where": [node for node in statement.find_all(exp.Where)] + [node for node in statement.find_all(exp.Having)],
+        "join": [node.args.get("on") for node in statement.find_all(exp.Join) if node.args.get("on") is not None],
+        "group": list(statement.find_all(exp.Group)),
+        "order": list(statement.find_all(exp.Order)),
+    }
+    found = {}
+    for clause, nodes in clauses.items():
+        names = set()
+        for node in nodes:
+            names.update(column.name for column in node.find_all(exp.Column))
+        found[clause] = names
+    return found
+
+
+def analyze_query_log(engine: Engine, entries: List[SQLQueryLog]) -> List[dict]:
+    """
+    Scores supply_chain_table columns by how often (and how slowly) logged queries filter,
+    join, group or sort on them. Returns candidates sorted by score, best first.
+    """
+    table_columns = {_normalize(c["name"]): c["name"] for c in inspect(engine).get_columns(TARGET_TABLE)}
+    dialect = SQLGLOT_DIALECTS.get(engine.dialect.name)
+    stats = defaultdict(lambda: {"score": 0.0, "queries": 0, "total_ms": 0.0, "clauses": set(), "sql": set()})
+
+    for entry in entries:
+        if TARGET_TABLE not in entry.sql_text:
+            continue
+        try:
+            statement = sqlglot.parse_one(entry.sql_text, read=dialect)
+        except sqlglot.errors.ParseError:
+            continue
+        seen = set()
+        for clause, names in _columns_by_clause(statement).items():
+            for name in names:
+                column = table_columns.get(_normalize(name))
+                if column is None:
+                    continue
+                # Slow queries matter more: every 100 ms of runtime adds one more unit of weight.
+                stats[column]["score"] += CLAUSE_WEIGHTS[clause] * (1.0 + entry.duration_ms / 100.0)
+                stats[column]["clauses"].add(clause)
+                if column not in seen:
+                    seen.add(column)
+                    stats[column]["queries"] += 1
+                    stats[column]["total_ms"] += entry.duration_ms
+                    stats[column]["sql"].add(entry.sql_text)
+
+    return sorted(
+        ({"column": column, **values} for column, values in stats.items()),
+        key=lambda candidate: candidate["score"],
+        reverse=True,
+    )
+
+
+def indexed_leading_columns(engine: Engine) -> set:
+    return {index["column_names"][0] for index in inspect(engine).get_indexes(TARGET_TABLE) if index["column_names"]}
+
+
+def index_name_for(column: str) -> str:
+    return f"ix_{TARGET_TABLE}_{re.sub(r'[^a-z0-9]+', '_', column.lower()).strip('_')}"[:63]
+
+
+def recommend_indexes(engine: Engine, entries: List[SQLQueryLog], limit: int = 5, min_queries: int = 2) -> List[dict]:
+    existing = indexed_leading_columns(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    recommendations = []
+    for candidate in analyze_query_log(engine, entries):
+        if candidate["column"] in existing or candidate["queries"] < min_queries:
+            continue
+        name = index_name_for(candidate["column"])
+        candidate["index_name"] = name
+        candidate["ddl"] = f"CREATE INDEX IF NOT EXISTS {name} ON {TARGET_TABLE} ({quote(candidate['column'])})"
+        recommendations.append(candidate)
+        if len(recommendations) >= limit:
+            break
+    return recommendations
+
+
+def create_indexes(engine: Engine, recommendations: List[dict]):
+    if engine.dialect.name == "postgresql":
+        # CONCURRENTLY keeps supply_chain_table readable while the index builds; it needs autocommit.
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for recommendation in recommendations:
+                ddl = recommendation["ddl"].replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+                print(f"Creating index: {ddl}")
+                conn.exec_driver_sql(ddl)
+            conn.exec_driver_sql(f"ANALYZE {TARGET_TABLE}")
+    else:
+        with engine.begin() as conn:
+            for recommendation in recommendations:
+                print(f"Creating index: {recommendation['ddl']}")
+                conn.exec_driver_sql(recommendation["ddl"])
+            conn.exec_driver_sql(f"ANALYZE {TARGET_TABLE}")
+
+
+def time_queries(engine: Engine, queries: List[str], repeat: int = 3) -> Dict[str, float]:
+    timings = {}
+    # Logged agent SQL is run verbatim (no_parameters), so literal % signs are not taken as placeholders.
+    with engine.connect() as conn:
+        conn = conn.execution_options(no_parameters=True)
+        for sql in queries:
+            runs = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                try:
+                    conn.exec_driver_sql(sql).fetchall()
+                except Exception as e:
+                    print(f"Skipping query that no longer runs: {e}")
+                    conn.rollback()
+                    runs = []
+                    break
+                runs.append((time.perf_counter() - start) * 1000)
+            if runs:
+                timings[sql] = statistics.median(runs)
+    return timings
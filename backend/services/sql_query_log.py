@@ -0,0 +1,111 @@
+#services/sql_query_log.py
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from typing import Optional
+import atexit
+import queue
+import threading
+import time
+from core.config import settings
+from core.database import SessionLocal, engine
+from models.base_models import SQLQueryLog
+
+# Same truncation as SQLDatabase.run, so the agent sees the output format it was built around.
+MAX_STRING_LENGTH = 300
+LOG_BATCH_SIZE = 100
+
+# Log entries are written by one background thread in batches, off the query path.
+_pending: "queue.Queue[dict]" = queue.Queue(maxsize=10000)
+_writer_lock = threading.Lock()
+_writer: Optional[threading.Thread] = None
+
+
+def _write_batch(batch: list):
+    db = SessionLocal()
+    try:
+        db.add_all([SQLQueryLog(**entry) for entry in batch])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Warning: could not record {len(batch)} SQL query log entries: {e}")
+    finally:
+        db.close()
+
+
+def _drain(block: bool) -> list:
+    batch = []
+    try:
+        if block:
+            batch.append(_pending.get(timeout=settings.SQL_QUERY_LOG_FLUSH_SECONDS))
+        while len(batch) < LOG_BATCH_SIZE:
+            batch.append(_pending.get_nowait())
+    except queue.Empty:
+        pass
+    return batch
+
+
+def _write_loop():
+    while True:
+        batch = _drain(block=True)
+        if batch:
+            _write_batch(batch)
+
+
+def flush_query_log():
+    """Writes every pending entry now (e.g. before the index advisor reads the log, or at exit)."""
+    while True:
+        batch = _drain(block=False)
+        if not batch:
+            return
+        _write_batch(batch)
+
+
+atexit.register(flush_query_log)
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, name="sql-query-log", daemon=True)
+            _writer.start()
+
+
+def record_query(sql: str, duration_ms: float, rows_returned: Optional[int], error: Optional[str], source: str):
+    if not settings.SQL_QUERY_LOG_ENABLED:
+        return
+    _ensure_writer()
+    entry = {"sql_text": sql, "duration_ms": duration_ms, "rows_returned": rows_returned, "error": error,
+             "source": source, "created_at": datetime.utcnow()}
+    try:
+        _pending.put_nowait(entry)
+    except queue.Full:
+        print("Warning: SQL query log queue is full, dropping an entry")
+
+
+def _truncate(value):
+    if isinstance(value, str) and len(value) > MAX_STRING_LENGTH:
+        return value[:MAX_STRING_LENGTH] + "..."
+    return value
+
+
+def run_logged_query(sql: str, source: str = "agent") -> str:
+    """
+    Runs a query with the same output format and error string as SQLDatabase.run_no_throw and
+    records the statement, its execution time and row count in sql_query_log.
+    """
+    start = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            # Verbatim, like validate_sql's EXPLAIN: a literal % or :name in the SQL is not a parameter.
+            result = conn.execution_options(no_parameters=True).exec_driver_sql(sql)
+            rows = result.fetchall() if result.returns_rows else []
+    except SQLAlchemyError as e:
+        record_query(sql, (time.perf_counter() - start) * 1000, None, str(e), source)
+        return f"Error: {e}"
+    record_query(sql, (time.perf_counter() - start) * 1000, len(rows), None, source)
+
+    rows = [tuple(_truncate(value) for value in row) for row in rows]
+    return str(rows) if rows else ""
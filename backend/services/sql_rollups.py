@@ -0,0 +1,205 @@
+#services/sql_rollups.py
+from sqlalchemy import inspect, text
+from sqlalchemy.types import String
+from sqlalchemy.engine import Engine
+from datetime import datetime
+from typing import Dict, List, Optional
+import re
+
+SOURCE_TABLE = "supply_chain_table"
+ROLLUP_META_TABLE = "supply_chain_rollups_meta"
+
+# Logical column -> accepted spellings in supply_chain_table (matched case/punctuation-insensitively).
+COLUMN_CANDIDATES = {
+    "order_id": ["Order Id", "order_id"],
+    "order_region": ["Order Region", "order_region"],
+    "market": ["Market", "market"],
+    "product_name": ["Product Name", "product_name"],
+    "category_name": ["Category Name", "category_name"],
+    "order_status": ["Order Status", "order_status"],
+    "delivery_status": ["Delivery Status", "delivery_status"],
+    "shipping_mode": ["Shipping Mode", "shipping_mode"],
+    "order_date": ["order date (DateOrders)", "order_date", "order_date_dateorders"],
+    "sales": ["Sales", "sales"],
+    "profit": ["Order Profit Per Order", "order_profit_per_order"],
+    "quantity": ["Order Item Quantity", "order_item_quantity"],
+    "late_risk": ["Late_delivery_risk", "late_delivery_risk"],
+    "shipping_days": ["Days for shipping (real)", "days_for_shipping_real"],
+}
+
+MEASURES = [
+    ("order_lines", "COUNT(*)", None),
+    ("orders", "COUNT(DISTINCT {order_id})", "order_id"),
+    ("total_sales", "SUM({sales})", "sales"),
+    ("total_profit", "SUM({profit})", "profit"),
+    ("total_quantity", "SUM({quantity})", "quantity"),
+    ("late_deliveries", "SUM({late_risk})", "late_risk"),
+    ("avg_shipping_days", "AVG({shipping_days})", "shipping_days"),
+]
+
+ROLLUPS = {
+    "rollup_by_region": {
+        "dimensions": ["order_region", "market"],
+        "description": "order/sales/profit totals per order region and market",
+    },
+    "rollup_by_product": {
+        "dimensions": ["product_name", "category_name"],
+        "description": "order/sales/profit/quantity totals per product and category",
+    },
+    "rollup_by_order_status": {
+        "dimensions": ["order_status", "delivery_status"],
+        "description": "order counts and totals per order status and delivery status",
+    },
+    "rollup_by_month": {
+        "dimensions": ["order_month"],
+        "description": "order/sales/profit totals per calendar month of the order date",
+    },
+    "rollup_by_shipping_mode": {
+        "dimensions": ["shipping_mode", "delivery_status"],
+        "description": "order counts, late deliveries and average shipping days per shipping mode and delivery status",
+    },
+}
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def resolve_columns(engine: Engine) -> Dict[str, dict]:
+    columns = inspect(engine).get_columns(SOURCE_TABLE)
+    by_normalized = {_normalize(c["name"]): c for c in columns}
+    resolved = {}
+    for logical, candidates in COLUMN_CANDIDATES.items():
+        for candidate in candidates:
+            column = by_normalized.get(_normalize(candidate))
+            if column is not None:
+                resolved[logical] = column
+                break
+    return resolved
+
+
+def _month_expression(engine: Engine, column: dict, quoted: str) -> Optional[str]:
+    is_text = isinstance(column["type"], String)
+    if engine.dialect.name == "postgresql":
+        if is_text:
+            # DataCo exports dates as e.g. '1/31/2018 22:56'.
+            return f"date_trunc('month', to_timestamp({quoted}, 'MM/DD/YYYY HH24:MI'))::date"
+        return f"date_trunc('month', {quoted})::date"
+    if engine.dialect.name == "sqlite" and not is_text:
+        return f"strftime('%Y-%m-01', {quoted})"
+    return None
+
+
+def build_rollup_select(engine: Engine, name: str, columns: Dict[str, dict]) -> Optional[str]:
+    quote = engine.dialect.identifier_preparer.quote
+    quoted = {logical: quote(column["name"]) for logical, column in columns.items()}
+
+    select_parts, group_parts = [], []
+    for dimension in ROLLUPS[name]["dimensions"]:
+        if dimension == "order_month":
+            if "order_date" not in columns:
+                return None
+            expression = _month_expression(engine, columns["order_date"], quoted["order_date"])
+            if expression is None:
+                return None
+        elif dimension in quoted:
+            expression = quoted[dimension]
+        else:
+            return None
+        select_parts.append(f"{expression} AS {dimension}")
+        group_parts.append(expression)
+
+    for measure, template, requires in MEASURES:
+        if requires is not None and requires not in quoted:
+            continue
+        select_parts.append(f"{template.format(**quoted)} AS {measure}")
+
+    return f"SELECT {', '.join(select_parts)} FROM {quote(SOURCE_TABLE)} GROUP BY {', '.join(group_parts)}"
+
+
+def _ensure_meta_table(conn):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {ROLLUP_META_TABLE} ("
+        " rollup_name VARCHAR(100) PRIMARY KEY,"
+        " refreshed_at TIMESTAMP NOT NULL,"
+        " source_rows BIGINT NOT NULL,"
+        " rollup_rows BIGINT NOT NULL)"
+    ))
+
+
+def refresh_rollups(engine: Engine, names: Optional[List[str]] = None) -> List[dict]:
+    """
+    Rebuilds the rollup tables from supply_chain_table. Each rollup is built into a staging
+    table and swapped in within one transaction, so readers never see a half-built table.
+    """
+    columns = resolve_columns(engine)
+    results = []
+    with engine.begin() as conn:
+        _ensure_meta_table(conn)
+    source_rows = None
+    for name in names or list(ROLLUPS):
+        select = build_rollup_select(engine, name, columns)
+        if select is None:
+            print(f"Skipping {name}: required columns not found in {SOURCE_TABLE}")
+            results.append({"rollup": name, "status": "skipped"})
+            continue
+        staging = f"{name}__staging"
+        started = datetime.utcnow()
+        with engine.begin() as conn:
+            if source_rows is None:
+                source_rows = conn.execute(text(f"SELECT COUNT(*) FROM {SOURCE_TABLE}")).scalar()
+            conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+            conn.exec_driver_sql(f"CREATE TABLE {staging} AS {select}")
+            rollup_rows = conn.execute(text(f"SELECT COUNT(*) FROM {staging}")).scalar()
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            conn.execute(text(f"ALTER TABLE {staging} RENAME TO {name}"))
+            conn.execute(text(f"DELETE FROM {ROLLUP_META_TABLE} WHERE rollup_name = :name"), {"name": name})
+            conn.execute(
+                text(f"INSERT INTO {ROLLUP_META_TABLE} (rollup_name, refreshed_at, source_rows, rollup_rows) VALUES (:name, :refreshed_at, :source_rows, :rollup_rows)"),
+                {"name": name, "refreshed_at": started, "source_rows": source_rows, "rollup_rows": rollup_rows},
+            )
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        print(f"Refreshed {name}: {rollup_rows} rows in {elapsed:.2f}s")
+        results.append({"rollup": name, "status": "refreshed", "rows": rollup_rows, "seconds": elapsed})
+    return results
+
+
+def get_fresh_rollups(engine: Engine) -> List[dict]:
+    """Returns metadata for rollups built from the current row count of supply_chain_table."""
+    if not inspect(engine).has_table(ROLLUP_META_TABLE):
+        return []
+    with engine.connect() as conn:
+        source_rows = conn.execute(text(f"SELECT COUNT(*) FROM {SOURCE_TABLE}")).scalar()
+        rows = conn.execute(text(f"SELECT rollup_name, refreshed_at, source_rows, rollup_rows FROM {ROLLUP_META_TABLE}")).fetchall()
+    fresh = []
+    for rollup_name, refreshed_at, rollup_source_rows, rollup_rows in rows:
+        if rollup_name not in ROLLUPS:
+            continue
+        if rollup_source_rows != source_rows:
+            print(f"Rollup {rollup_name} is stale ({rollup_source_rows} vs {source_rows} source rows); run scripts.refresh_rollups")
+            continue
+        fresh.append({"name": rollup_name, "refreshed_at": refreshed_at, "rows": rollup_rows})
+    return fresh
+
+
+def describe_rollups_for_prompt(engine: Engine) -> str:
+    try:
+        fresh = get_fresh_rollups(engine)
+    except Exception as e:
+        print(f"Warning: could not inspect rollup tables: {e}")
+        return ""
+    if not fresh:
+        return ""
+    inspector = inspect(engine)
+    lines = [
+        f"Pre-aggregated summary tables built from {SOURCE_TABLE} (prefer these for counts, sums and averages grouped by the listed columns; "
+        f"use {SOURCE_TABLE} only for row-level details or filters these tables do not have). "
+        "Re-aggregate with SUM() over order_lines/orders/total_* columns when collapsing dimensions; do not SUM avg_shipping_days:"
+    ]
+    for rollup in fresh:
+        column_names = ", ".join(c["name"] for c in inspector.get_columns(rollup["name"]))
+        lines.append(
+            f"- {rollup['name']} ({rollup['rows']} rows, refreshed {str(rollup['refreshed_at'])[:16]} UTC): "
+            f"{ROLLUPS[rollup['name']]['description']}. Columns: {column_names}"
+        )
+    return "\n".join(lines)
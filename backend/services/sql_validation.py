@@ -0,0 +1,47 @@
+#services/sql_validation.py
+from sqlalchemy.engine import Engine
+from typing import Optional
+import sqlglot
+from sqlglot import exp
+
+SQLGLOT_DIALECTS = {"postgresql": "postgres", "sqlite": "sqlite", "mysql": "mysql", "mssql": "tsql"}
+
+_WRITE_EXPRESSIONS = tuple(
+    getattr(exp, name) for name in ("Insert", "Update", "Delete", "Drop", "Create", "Alter", "AlterTable", "Merge", "Command")
+    if hasattr(exp, name)
+)
+
+
+def clean_sql(sql: str) -> str:
+    sql = sql.strip()
+    if sql.startswith("```"):
+        sql = sql.strip("`")
+        if sql.lower().startswith("sql"):
+            sql = sql[3:]
+    return sql.strip().strip("`").strip().rstrip(";").strip()
+
+
+def validate_sql(sql: str, engine: Engine) -> Optional[str]:
+    """
+    Validates a generated query locally instead of asking the LLM checker: it must parse as a
+    single read-only statement and the database must accept it under EXPLAIN.
+    Returns None when the query is valid, otherwise an error message for the agent.
+    """
+    dialect = SQLGLOT_DIALECTS.get(engine.dialect.name)
+    try:
+        statements = [s for s in sqlglot.parse(sql, read=dialect) if s is not None]
+    except sqlglot.errors.ParseError as e:
+        return f"Error: SQL syntax error: {e}"
+    if len(statements) != 1:
+        return "Error: Provide exactly one SQL statement."
+    if isinstance(statements[0], _WRITE_EXPRESSIONS) or any(statements[0].find_all(*_WRITE_EXPRESSIONS)):
+        return "Error: Only read-only SELECT queries are allowed."
+
+    try:
+        # no_parameters: pass the SQL through verbatim, so a literal % (e.g. LIKE '%foo%') is not read as a psycopg2 placeholder.
+        with engine.connect() as conn:
+            conn.execution_options(no_parameters=True).exec_driver_sql(f"EXPLAIN {sql}")
+    except Exception as e:
+        message = str(getattr(e, "orig", e)).strip().splitlines()[0]
+        return f"Error: {message}"
+    return None
@@ -2,82 +2,477 @@
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 from services.customeEmbedingModel import ClientAPIEmbeddings
-import os, pickle
+from services.vectorstore_persistence import VectorStoreJournal
+from services.faiss_index_factory import apply_search_params, can_build, convert_vectorstore, delete_from_vectorstore, deleted_positions, ensure_direct_map, index_type_of, purge_deleted
+from services.mmap_docstore import load_mmap_vectorstore, materialize
+from services.bm25_index import BM25Index
+from services.hybrid_retrieval import hybrid_search
+from services.lazy_resource import LazyResource
+from contextlib import contextmanager
+from typing import List, Optional
+import numpy as np
+import threading
+import time
 from uuid import uuid4
 from core.config import settings
-from services.topic_extractor import extract_topics_from_text
 
 VECTOR_STORE_PATH =  settings.VECTOR_STORE_PATH
 METADATA_PATH = settings.METADATA_PATH
 embedding = ClientAPIEmbeddings(api_key=settings.SYN_MODEL_API_KEY)
-if os.path.exists(VECTOR_STORE_PATH):
-    vectorstore = FAISS.load_local(VECTOR_STORE_PATH, embedding, allow_dangerous_deserialization=True)
-else:
-    vectorstore = None
 
-if os.path.exists(METADATA_PATH):
-    with open(METADATA_PATH, "rb") as f:
-        metadata = pickle.load(f)
-else:
-    metadata = {} 
+# Adds/deletes are appended to a journal (O(document)); a full snapshot is only written on compaction.
+journal = VectorStoreJournal(VECTOR_STORE_PATH, legacy_metadata_path=METADATA_PATH)
 
+# An mmapped store is shared read-only with other workers; the first change in this process
+# switches it to a private in-memory copy until the next compaction maps the new snapshot.
+USE_MMAP = settings.VECTOR_STORE_LOAD_MODE == "mmap"
 
-def save_vectorstore():
-    vectorstore.save_local(VECTOR_STORE_PATH)
-    with open(METADATA_PATH, "wb") as f:
-        pickle.dump(metadata, f)
 
-def add_document(doc_id: str, file_name: str, chunks: list[str]):
-    global vectorstore
+class _ReadWriteLock:
+    """Many concurrent searches, or one writer mutating the index. Waiting writers go first."""
 
-    ids = [str(uuid4()) for _ in chunks]
-    metadatas = [{"doc_id": doc_id, "file_name": file_name}] * len(chunks)
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
 
-    if vectorstore is None:
-        vectorstore = FAISS.from_texts(chunks, embedding=embedding, metadatas=metadatas, ids=ids)
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+# _write_lock serializes writers (uploads, deletes, reloads, compaction); _search_lock keeps
+# searches off the index while a writer changes it in memory.
+_write_lock = threading.RLock()
+_search_lock = _ReadWriteLock()
+
+
+# The BM25 index mirrors the FAISS docstore (same chunk ids) and changes with it.
+def _apply_add(store, meta: dict, lexical: BM25Index, entry: dict):
+    store = materialize(store)
+    text_embeddings = list(zip(entry["texts"], entry["vectors"]))
+    if store is None:
+        store = FAISS.from_embeddings(text_embeddings, embedding=embedding, metadatas=entry["metadatas"], ids=entry["ids"])
     else:
-        vectorstore.add_texts(chunks, ids=ids, metadatas=metadatas)
-
-    full_text = "\n".join(chunks)
-    extracted_topics = extract_topics_from_text(full_text)
-    print(extracted_topics)
-    metadata[doc_id] = {
-        "file_name": file_name,
-        "vector_ids": ids,
-        "topics": extracted_topics  
-    }
+        store.add_embeddings(text_embeddings, metadatas=entry["metadatas"], ids=entry["ids"])
+    for chunk_id, text in zip(entry["ids"], entry["texts"]):
+        lexical.add(chunk_id, text)
+    meta[entry["doc_id"]] = entry["record"]
+    return store
+
+
+def _apply_delete(store, meta: dict, lexical: BM25Index, entry: dict):
+    store = materialize(store)
+    if store is not None and entry["vector_ids"]:
+        try:
+            delete_from_vectorstore(store, entry["vector_ids"])
+        except Exception as e:
+            print(f"Warning: failed to delete some vectors for {entry['doc_id']}: {e}")
+    for chunk_id in entry["vector_ids"]:
+        lexical.remove(chunk_id)
+    meta.pop(entry["doc_id"], None)
+    return store
+
+
+def _apply_entry(store, meta: dict, lexical: BM25Index, entry: dict):
+    if entry["op"] == "add":
+        store = _apply_add(store, meta, lexical, entry)
+    elif entry["op"] == "add_batch":
+        for document in entry["documents"]:
+            store = _apply_add(store, meta, lexical, document)
+    elif entry["op"] == "delete":
+        store = _apply_delete(store, meta, lexical, entry)
+    return store
+
+
+def _apply_entries(store, meta: dict, lexical: BM25Index, entries):
+    for _, entry in entries:
+        store = _apply_entry(store, meta, lexical, entry)
+    return store
+
+
+def _load_from_disk():
+    while True:
+        store, meta, seq = journal.load_snapshot(embedding, load_index=load_mmap_vectorstore if USE_MMAP else None)
+        entries = journal.entries_between(seq)
+        if entries is not None:
+            break
+        # Another process compacted past this snapshot while we read it; start over from the new one.
+    if store is not None:
+        apply_search_params(store.index)
+        # Snapshots written before IVF-PQ indexes kept a direct map cannot reconstruct without one.
+        ensure_direct_map(store.index)
+    lexical = BM25Index.from_vectorstore(store)
+    store = _apply_entries(store, meta, lexical, entries)
+    return store, meta, lexical, entries[-1][0] if entries else seq
+
+
+# Loaded on first use (or by the startup warm-up) rather than at import.
+vectorstore = None
+metadata = {}
+lexical_index = None
+applied_seq = 0
+
+# The corpus version is the last applied journal seq, so every worker process agrees on it.
+# Listeners (e.g. the answer cache) are notified with the new version after each change.
+corpus_version = 0
+_corpus_listeners = []
+_last_refresh_check = time.monotonic()
+
+
+def _initialize() -> bool:
+    # Must not take _write_lock: writers call ensure_loaded() while holding it.
+    global vectorstore, metadata, lexical_index, applied_seq
+    loaded = _load_from_disk()
+    with _search_lock.write():
+        vectorstore, metadata, lexical_index, applied_seq = loaded
+    print(f"Loaded vector store at version {applied_seq} ({len(metadata)} documents)")
+    if vectorstore is None:
+        print("No documents indexed yet. Document retrieval will be unavailable until PDFs are uploaded.")
+    _notify_corpus_changed()
+    return True
+
+
+_store = LazyResource("vector_store", _initialize)
+
+
+def ensure_loaded():
+    _store.get()
+
+
+def register_corpus_listener(callback):
+    _corpus_listeners.append(callback)
+
+
+def _notify_corpus_changed():
+    global corpus_version
+    if corpus_version == applied_seq:
+        return
+    corpus_version = applied_seq
+    for callback in _corpus_listeners:
+        try:
+            callback(corpus_version)
+        except Exception as e:
+            print(f"Warning: corpus listener {callback} failed: {e}")
+
+
+def _reload():
+    global vectorstore, metadata, lexical_index, applied_seq
+    loaded = _load_from_disk()
+    with _search_lock.write():
+        vectorstore, metadata, lexical_index, applied_seq = loaded
+
+
+def _catch_up(before_seq: int = None):
+    """
+    Applies journal entries written by other workers since our last applied seq. When some of
+    them were compacted away meanwhile, reloads from the newer snapshot instead.
+    """
+    global vectorstore, applied_seq
+    entries = journal.entries_between(applied_seq, before_seq)
+    if entries is None:
+        _reload()
+        return
+    if not entries:
+        return
+    with _search_lock.write():
+        vectorstore = _apply_entries(vectorstore, metadata, lexical_index, entries)
+        applied_seq = entries[-1][0]
+
+
+def refresh(force: bool = False) -> bool:
+    """
+    Picks up uploads/deletes made by other processes. Checks the journal at most every
+    VECTOR_STORE_RELOAD_CHECK_SECONDS; returns True if the in-memory store changed.
+    """
+    global _last_refresh_check
+    ensure_loaded()
+    now = time.monotonic()
+    if not force and now - _last_refresh_check < settings.VECTOR_STORE_RELOAD_CHECK_SECONDS:
+        return False
+    # Readers must not queue behind a writer that may be retraining the index or writing a snapshot:
+    # when the lock is busy, keep serving the current version and check again on a later call.
+    if not _write_lock.acquire(blocking=force):
+        return False
+    try:
+        _last_refresh_check = now
+        before = applied_seq
+        try:
+            _, snapshot_seq = journal.current_snapshot()
+            if snapshot_seq > applied_seq:
+                # Another worker compacted entries we never saw; load its snapshot, then swap.
+                _reload()
+            elif journal.last_seq() > applied_seq:
+                _catch_up()
+        except Exception as e:
+            print(f"Warning: could not refresh vector store, keeping version {applied_seq}: {e}")
+        if applied_seq == before:
+            return False
+        print(f"Vector store reloaded: version {before} -> {applied_seq}")
+    finally:
+        _write_lock.release()
+    _notify_corpus_changed()
+    return True
 
-    save_vectorstore()
+
+def _purge_deleted() -> bool:
+    with _search_lock.write():
+        purged = purge_deleted(vectorstore)
+    if purged:
+        print(f"Dropped deleted vectors from the index ({vectorstore.index.ntotal} left)")
+    return purged
+
+
+def _ensure_index_type(index_type: str, force: bool = False) -> bool:
+    """
+    Converts the in-memory index to index_type when it differs (or always, with force). Vectors
+    of deleted documents are dropped either way, so snapshots never carry them.
+    """
+    global vectorstore
+    if vectorstore is None:
+        return False
+    if not force and index_type_of(vectorstore.index) == index_type:
+        return _purge_deleted()
+    live_vectors = vectorstore.index.ntotal - len(deleted_positions(vectorstore))
+    if not can_build(index_type, live_vectors):
+        print(f"Keeping {index_type_of(vectorstore.index)} index: too few vectors ({live_vectors}) to build {index_type}")
+        return _purge_deleted()
+    with _search_lock.write():
+        vectorstore = materialize(vectorstore)
+        converted = convert_vectorstore(vectorstore, index_type)
+    if converted:
+        print(f"Rebuilt vector index as {index_type} ({vectorstore.index.ntotal} vectors)")
+    return converted
+
+
+def save_vectorstore():
+    """
+    Compacts the journal: writes a full snapshot of the in-memory store and drops the
+    journal entries it covers. Only needed periodically, not after every change.
+    """
+    ensure_loaded()
+    with _write_lock:
+        _catch_up()
+        _ensure_index_type(settings.VECTOR_INDEX_TYPE)
+        if not journal.write_snapshot(vectorstore, metadata, applied_seq):
+            # Another process compacted further; refresh() picks its snapshot up.
+            print(f"Skipped compaction at journal seq {applied_seq}: a newer snapshot already exists")
+            return
+        print(f"Compacted vector store into snapshot at journal seq {applied_seq}")
+        _remap_snapshot()
+
+
+def rebuild_index(index_type: str = None):
+    """Rebuilds (and for IVF-PQ re-trains) the index, then writes a snapshot with it."""
+    ensure_loaded()
+    with _write_lock:
+        _catch_up()
+        _ensure_index_type(index_type or settings.VECTOR_INDEX_TYPE, force=True)
+        if not journal.write_snapshot(vectorstore, metadata, applied_seq, overwrite=True):
+            print(f"Skipped writing the rebuilt index at journal seq {applied_seq}: a newer snapshot already exists")
+            return
+        _remap_snapshot()
+
+
+def _remap_snapshot():
+    """In mmap mode, drops this worker's private copy in favour of the snapshot just written."""
+    if not USE_MMAP:
+        return
+    _reload()
+
+
+def _commit(op: str, doc_id: str, payload: dict):
+    global vectorstore, applied_seq
+    seq = journal.append(op, doc_id, payload)
+    # Entries written by other workers since our last commit come first, so the order matches a replay.
+    _catch_up(before_seq=seq)
+    if applied_seq >= seq:
+        # _catch_up reloaded from a snapshot that already includes this entry.
+        return
+    with _search_lock.write():
+        vectorstore = _apply_entry(vectorstore, metadata, lexical_index, {"op": op, "doc_id": doc_id, **payload})
+        applied_seq = seq
+
+
+def _maybe_compact():
+    if journal.pending_entries() >= settings.VECTOR_STORE_COMPACT_EVERY:
+        save_vectorstore()
+
+
+def build_document_payload(doc_id: str, file_name: str, chunks: list[str], vectors: list, topics: list[str],
+                           chunk_metadatas: Optional[List[dict]] = None) -> dict:
+    """Journal/apply payload for one document whose chunks are already embedded. chunk_metadatas (e.g. page numbers) are merged per chunk."""
+    ids = [str(uuid4()) for _ in chunks]
+    chunk_metadatas = chunk_metadatas or [{} for _ in chunks]
     return {
-        "status": "added",
-        "chunks": len(chunks),
         "doc_id": doc_id,
-        "file_name": file_name,
-        "topics": extracted_topics
+        "ids": ids,
+        "texts": chunks,
+        "metadatas": [{**extra, "doc_id": doc_id, "file_name": file_name} for extra in chunk_metadatas],
+        "vectors": vectors,
+        "record": {
+            "file_name": file_name,
+            "vector_ids": ids,
+            "topics": topics
+        },
     }
 
 
+def commit_documents(documents: List[dict]):
+    """Adds several prepared documents with one journal entry, one index update and one notification."""
+    if not documents:
+        return
+    with _write_lock:
+        refresh(force=True)
+        if len(documents) == 1:
+            _commit("add", documents[0]["doc_id"], {k: v for k, v in documents[0].items() if k != "doc_id"})
+        else:
+            _commit("add_batch", f"batch-{uuid4()}", {"documents": documents})
+        _maybe_compact()
+    _notify_corpus_changed()
+
+
 def delete_document(doc_id: str):
-    if doc_id not in metadata:
-        return {"status": "not_found", "doc_id": doc_id}
-    try:
-        vectorstore.delete(ids=metadata[doc_id]["vector_ids"])
-    except Exception as e:
-        print(f"Warning: failed to delete some vectors for {doc_id}: {e}")
-    del metadata[doc_id]
-    save_vectorstore()
+    with _write_lock:
+        refresh(force=True)
+        if doc_id not in metadata:
+            return {"status": "not_found", "doc_id": doc_id}
+        _commit("delete", doc_id, {"vector_ids": metadata[doc_id]["vector_ids"]})
+        _maybe_compact()
+    _notify_corpus_changed()
     return {"status": "deleted", "doc_id": doc_id}
 
 
+def is_available() -> bool:
+    if _store.get_or_none() is None:
+        return False
+    refresh()
+    return vectorstore is not None
+
+
+_filter_index = {"key": None}
+
+
+def _get_filter_index() -> dict:
+    """
+    Inverted index from topic and file name to doc ids, plus chunk id -> FAISS position.
+    Rebuilt lazily after each corpus change (positions shift on delete).
+    """
+    global _filter_index
+    key = (applied_seq, id(vectorstore))
+    if _filter_index["key"] != key:
+        topics, file_names = {}, {}
+        for doc_id, meta in list(metadata.items()):
+            file_names.setdefault(meta["file_name"].lower(), set()).add(doc_id)
+            for topic in meta.get("topics", []):
+                topics.setdefault(topic.strip().lower(), set()).add(doc_id)
+        positions = {chunk_id: position for position, chunk_id in vectorstore.index_to_docstore_id.items()} if vectorstore is not None else {}
+        _filter_index = {"key": key, "topics": topics, "file_names": file_names, "positions": positions}
+    return _filter_index
+
+
+def _resolve_filters(topics: Optional[List[str]], file_names: Optional[List[str]]) -> set:
+    """Chunk ids of the documents matching any of the given topics or file names."""
+    index = _get_filter_index()
+    doc_ids = set()
+    for topic in topics or []:
+        doc_ids |= index["topics"].get(topic.strip().lower(), set())
+    for file_name in file_names or []:
+        doc_ids |= index["file_names"].get(file_name.strip().lower(), set())
+    chunk_ids = set()
+    for doc_id in doc_ids:
+        if doc_id in metadata:
+            chunk_ids.update(metadata[doc_id]["vector_ids"])
+    return chunk_ids
+
+
+def retrieve(query: str, k: int = 5, topics: Optional[List[str]] = None, file_names: Optional[List[str]] = None,
+             strict: bool = True, query_vector: Optional[List[float]] = None) -> list[Document]:
+    """
+    MMR vector search fused with BM25 (reciprocal-rank fusion) over the current index; sees
+    uploads from other workers within the reload interval. topics/file_names restrict the search
+    to matching documents. With strict=False (classifier-chosen topics) the filter is a hint:
+    results are topped up from the whole corpus when it matches too little. Pass query_vector when
+    the query is already embedded (e.g. with aembed_query).
+    """
+    refresh()
+    if vectorstore is None:
+        return []
+    if query_vector is None:
+        query_vector = embedding.embed_query(query)
+    with _search_lock.read():
+        if vectorstore is None:
+            return []
+        lexical = lexical_index if settings.HYBRID_RETRIEVAL_ENABLED else None
+        if not topics and not file_names:
+            return hybrid_search(vectorstore, lexical, query, query_vector, k=k)
+
+        allowed_ids = _resolve_filters(topics, file_names)
+        documents = []
+        if allowed_ids:
+            positions = _get_filter_index()["positions"]
+            allowed_positions = np.array(sorted(positions[chunk_id] for chunk_id in allowed_ids if chunk_id in positions), dtype=np.int64)
+            documents = hybrid_search(vectorstore, lexical, query, query_vector, k=k, allowed_ids=allowed_ids, allowed_positions=allowed_positions)
+        print(f"retrieve: filter topics={topics} file_names={file_names} matched {len(allowed_ids)} chunks, {len(documents)} results")
+        if strict or len(documents) >= k:
+            return documents
+        seen = {doc.page_content for doc in documents}
+        for doc in hybrid_search(vectorstore, lexical, query, query_vector, k=k):
+            if len(documents) >= k:
+                break
+            if doc.page_content not in seen:
+                documents.append(doc)
+        return documents
+
+
+def find_document_by_file_name(file_name: str):
+    refresh()
+    for doc_id, meta in list(metadata.items()):
+        if meta["file_name"].lower() == file_name.lower():
+            return doc_id
+    return None
+
+
+def has_document(doc_id: str) -> bool:
+    refresh(force=True)
+    return doc_id in metadata
+
+
 def get_all_documents():
-    return [{"doc_id": doc_id, "file_name": meta["file_name"], "chunks": len(meta["vector_ids"]), "topics": meta["topics"]} for doc_id, meta in metadata.items()]
+    refresh()
+    return [{"doc_id": doc_id, "file_name": meta["file_name"], "chunks": len(meta["vector_ids"]), "topics": meta["topics"]} for doc_id, meta in list(metadata.items())]
 
 
 def get_all_topics() -> list[str]:
+    refresh()
     all_topics = []
-    for doc_meta in metadata.values():
+    for doc_meta in list(metadata.values()):
         topics = doc_meta.get("topics", [])
         all_topics.extend(topics)
     return list(set(all_topics))
-
-    
\ No newline at end of file
@@ -0,0 +1,221 @@
+#services/vectorstore_persistence.py
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from services.mmap_docstore import save_snapshot_files
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+import fcntl
+import shutil
+import pickle
+import os
+
+# On-disk layout under VECTOR_STORE_PATH:
+#   CURRENT                    name of the live snapshot directory (swapped atomically)
+#   snapshot-<seq>/            FAISS save_local files, mmap-able docstore + metadata.pkl, covering journal entries <= seq
+#   journal/<seq>-<op>-<id>.pkl  one file per add/delete committed after that snapshot
+#   LOCK                       flock'd by every process while it claims a seq or switches snapshots
+# Without CURRENT, the legacy layout (save_local files in VECTOR_STORE_PATH + METADATA_PATH) is the base.
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "LOCK"
+JOURNAL_DIR = "journal"
+SNAPSHOT_PREFIX = "snapshot-"
+
+
+def _fsync_write(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class VectorStoreJournal:
+    def __init__(self, root: str, legacy_metadata_path: Optional[str] = None):
+        self.root = root
+        self.legacy_metadata_path = legacy_metadata_path
+        self.journal_dir = os.path.join(root, JOURNAL_DIR)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock shared by every process (API workers, ingestion workers, scripts) using this root."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _superseded(self, seq: int, overwrite: bool) -> bool:
+        snapshot_dir, snapshot_seq = self.current_snapshot()
+        if snapshot_dir is None:
+            return False
+        return snapshot_seq > seq or (snapshot_seq == seq and not overwrite)
+
+    # ---- snapshots ----
+
+    def current_snapshot(self) -> Tuple[Optional[str], int]:
+        """Returns (snapshot directory or None for the legacy layout, journal seq it covers)."""
+        current_path = os.path.join(self.root, CURRENT_FILE)
+        if not os.path.exists(current_path):
+            return None, 0
+        with open(current_path, "r", encoding="utf-8") as f:
+            name = f.read().strip()
+        return os.path.join(self.root, name), int(name[len(SNAPSHOT_PREFIX):])
+
+    def load_snapshot(self, embedding: Embeddings, load_index=None):
+        """Loads the base snapshot. load_index(path, embedding) defaults to FAISS.load_local."""
+        load_index = load_index or (lambda path, emb: FAISS.load_local(path, emb, allow_dangerous_deserialization=True))
+        snapshot_dir, seq = self.current_snapshot()
+        while snapshot_dir is not None:
+            try:
+                vectorstore = load_index(snapshot_dir, embedding) if os.path.exists(os.path.join(snapshot_dir, "index.faiss")) else None
+                with open(os.path.join(snapshot_dir, "metadata.pkl"), "rb") as f:
+                    metadata = pickle.load(f)
+                return vectorstore, metadata, seq
+            except Exception:
+                # A compaction in another process may have switched CURRENT and removed this
+                # snapshot while we read it; load the new one then, otherwise the error is real.
+                previous_dir = snapshot_dir
+                snapshot_dir, seq = self.current_snapshot()
+                if snapshot_dir == previous_dir:
+                    raise
+
+        vectorstore = None
+        if os.path.exists(os.path.join(self.root, "index.faiss")):
+            vectorstore = load_index(self.root, embedding)
+        metadata = {}
+        if self.legacy_metadata_path and os.path.exists(self.legacy_metadata_path):
+            with open(self.legacy_metadata_path, "rb") as f:
+                metadata = pickle.load(f)
+        return vectorstore, metadata, 0
+
+    def write_snapshot(self, vectorstore, metadata: dict, seq: int, save_index=None, overwrite: bool = False) -> bool:
+        """
+        Writes a full snapshot covering journal entries <= seq, switches CURRENT to it and
+        removes the superseded snapshot and journal files. Returns False without switching when
+        another process already wrote a snapshot at or past seq (overwrite allows an equal seq,
+        e.g. to replace the index after a rebuild).
+        """
+        with self._locked():
+            if self._superseded(seq, overwrite):
+                return False
+
+        # The files are written without the lock so appends are not blocked meanwhile.
+        save_index = save_index or save_snapshot_files
+        name = f"{SNAPSHOT_PREFIX}{seq:012d}"
+        final_dir = os.path.join(self.root, name)
+        tmp_dir = f"{final_dir}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        if vectorstore is not None:
+            save_index(vectorstore, tmp_dir)
+        _fsync_write(os.path.join(tmp_dir, "metadata.pkl"), pickle.dumps(metadata))
+
+        with self._locked():
+            if self._superseded(seq, overwrite):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return False
+            shutil.rmtree(final_dir, ignore_errors=True)
+            os.replace(tmp_dir, final_dir)
+
+            current_tmp = os.path.join(self.root, CURRENT_FILE + ".tmp")
+            _fsync_write(current_tmp, name.encode("utf-8"))
+            os.replace(current_tmp, os.path.join(self.root, CURRENT_FILE))
+            _fsync_dir(self.root)
+
+            for entry in os.listdir(self.root):
+                # Other processes' in-progress snapshots end in .tmp and are theirs to clean up.
+                if entry.startswith(SNAPSHOT_PREFIX) and entry != name and not entry.endswith(".tmp"):
+                    shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+            for entry_seq, path in self._journal_files():
+                if entry_seq <= seq:
+                    os.remove(path)
+        return True
+
+    # ---- journal ----
+
+    def _journal_files(self) -> Iterator[Tuple[int, str]]:
+        if not os.path.isdir(self.journal_dir):
+            return iter(())
+        entries = []
+        for name in os.listdir(self.journal_dir):
+            if name.endswith(".pkl"):
+                entries.append((int(name.split("-", 1)[0]), os.path.join(self.journal_dir, name)))
+        return iter(sorted(entries))
+
+    def last_seq(self) -> int:
+        _, snapshot_seq = self.current_snapshot()
+        return max([snapshot_seq] + [seq for seq, _ in self._journal_files()])
+
+    def append(self, op: str, doc_id: str, payload: dict) -> int:
+        """Durably appends one operation and returns its sequence number."""
+        os.makedirs(self.journal_dir, exist_ok=True)
+        data = pickle.dumps({"op": op, "doc_id": doc_id, **payload})
+        tmp_path = os.path.join(self.journal_dir, f".{os.getpid()}-{doc_id}.tmp")
+        _fsync_write(tmp_path, data)
+        try:
+            # Under the lock so no other process claims the same seq or compacts past it meanwhile.
+            with self._locked():
+                seq = self.last_seq() + 1
+                os.replace(tmp_path, os.path.join(self.journal_dir, f"{seq:012d}-{op}-{doc_id}.pkl"))
+                _fsync_dir(self.journal_dir)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return seq
+
+    def entries_after(self, seq: int) -> Iterator[Tuple[int, dict]]:
+        for entry_seq, path in self._journal_files():
+            if entry_seq <= seq:
+                continue
+            try:
+                with open(path, "rb") as f:
+                    yield entry_seq, pickle.load(f)
+            except Exception as e:
+                print(f"Warning: skipping unreadable journal entry {path}: {e}")
+
+    def entries_between(self, seq: int, before_seq: Optional[int] = None) -> Optional[List[Tuple[int, dict]]]:
+        """
+        Entries after seq (and before before_seq, when given), in order. Returns None when some of
+        them are gone, i.e. another process compacted them into a newer snapshot meanwhile: the
+        caller then has to reload from that snapshot instead of skipping them.
+        """
+        entries, expected = [], seq + 1
+        for entry_seq, path in self._journal_files():
+            if entry_seq <= seq:
+                continue
+            if before_seq is not None and entry_seq >= before_seq:
+                break
+            if entry_seq != expected:
+                return None
+            expected += 1
+            try:
+                with open(path, "rb") as f:
+                    entries.append((entry_seq, pickle.load(f)))
+            except FileNotFoundError:
+                return None
+            except Exception as e:
+                print(f"Warning: skipping unreadable journal entry {path}: {e}")
+        if before_seq is not None:
+            return entries if expected == before_seq else None
+        # Compacted past the last entry we saw: the entries in between may already be deleted.
+        _, snapshot_seq = self.current_snapshot()
+        return entries if snapshot_seq < expected else None
+
+    def pending_entries(self) -> int:
+        _, snapshot_seq = self.current_snapshot()
+        return sum(1 for seq, _ in self._journal_files() if seq > snapshot_seq)
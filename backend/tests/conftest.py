@@ -0,0 +1,11 @@
+#tests/conftest.py
+import os
+import tempfile
+
+# Tests must never touch the configured database, spool or vector store; core.config reads these at import.
+_tmp = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["INGEST_SPOOL_DIR"] = os.path.join(_tmp, "ingest_jobs")
+os.environ["VECTOR_STORE_PATH"] = os.path.join(_tmp, "vector_store", "faiss_index")
+os.environ["METADATA_PATH"] = os.path.join(_tmp, "vector_store", "metadata.pkl")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(_tmp, "vector_store", "embedding_cache.sqlite3")
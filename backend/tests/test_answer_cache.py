@@ -0,0 +1,75 @@
+#tests/test_answer_cache.py
+from types import SimpleNamespace
+
+import services.answer_cache as answer_cache
+from services.answer_cache import SemanticAnswerCache, bypasses_cache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def make_cache(monkeypatch, **options):
+    clock = Clock()
+    monkeypatch.setattr(answer_cache, "time", SimpleNamespace(time=clock.time))
+    settings = dict(threshold=0.9, ttl_seconds=60, max_entries=10)
+    settings.update(options)
+    return SemanticAnswerCache(**settings), clock
+
+
+def test_hit_needs_a_similar_enough_question(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.put("what is the refund policy", [1.0, 0.0, 0.0], "30 days", corpus_version=0)
+
+    hit = cache.lookup([0.99, 0.1, 0.0])
+    assert hit["answer"] == "30 days"
+    assert hit["question"] == "what is the refund policy"
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    cache, clock = make_cache(monkeypatch, ttl_seconds=60)
+    cache.put("question", [1.0, 0.0], "answer", corpus_version=0)
+
+    clock.now += 59
+    assert cache.lookup([1.0, 0.0]) is not None
+    clock.now += 2
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_corpus_change_invalidates_and_rejects_stale_answers(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.put("question", [1.0, 0.0], "old answer", corpus_version=0)
+
+    cache.invalidate(corpus_version=5)
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["corpus_version"] == 5
+
+    # Generated before the change, finished after it: must not be cached.
+    cache.put("question", [1.0, 0.0], "old answer", corpus_version=0)
+    assert cache.lookup([1.0, 0.0]) is None
+    cache.put("question", [1.0, 0.0], "new answer", corpus_version=5)
+    assert cache.lookup([1.0, 0.0])["answer"] == "new answer"
+
+
+def test_oldest_entries_are_dropped_past_max_entries(monkeypatch):
+    cache, _ = make_cache(monkeypatch, max_entries=2)
+    for i, vector in enumerate(([1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0])):
+        cache.put(f"question {i}", vector, f"answer {i}", corpus_version=0)
+
+    assert cache.lookup([1.0, 0.0, 0.0]) is None
+    assert cache.lookup([0.0, 0.0, 1.0])["answer"] == "answer 2"
+
+
+def test_filtered_questions_bypass_the_cache():
+    assert not bypasses_cache(None)
+    assert not bypasses_cache({})
+    assert not bypasses_cache({"topics": [], "file_names": []})
+    assert bypasses_cache({"topics": ["refunds"]})
+    assert bypasses_cache({"file_names": ["policy.pdf"]})
@@ -0,0 +1,58 @@
+#tests/test_embedding_cache.py
+import itertools
+from types import SimpleNamespace
+
+import services.embedding_cache as embedding_cache
+from services.embedding_cache import EmbeddingCache, embedding_cache_key
+
+
+def make_cache(tmp_path, monkeypatch, max_bytes=10 ** 6) -> EmbeddingCache:
+    # A strictly increasing clock, so last_access orders every read and write.
+    clock = itertools.count(1)
+    monkeypatch.setattr(embedding_cache, "time", SimpleNamespace(time=lambda: float(next(clock))))
+    return EmbeddingCache(str(tmp_path / "cache" / "embeddings.sqlite3"), max_bytes)
+
+
+def test_round_trip_is_keyed_by_model_and_text(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch)
+    cache.put_many("model-a", ["alpha", "beta"], [[0.1, 0.2], [0.3, 0.4]])
+
+    found = cache.get_many("model-a", ["alpha", "beta", "gamma", "alpha"])
+    assert found == {
+        embedding_cache_key("model-a", "alpha"): [0.1, 0.2],
+        embedding_cache_key("model-a", "beta"): [0.3, 0.4],
+    }
+    assert cache.get("model-b", "alpha") is None
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["hit_rate"] == 3 / 5
+
+
+def test_entries_survive_reopening(tmp_path, monkeypatch):
+    make_cache(tmp_path, monkeypatch).put("model", "alpha", [1.0, 2.0, 3.0])
+    assert make_cache(tmp_path, monkeypatch).get("model", "alpha") == [1.0, 2.0, 3.0]
+
+
+def test_eviction_drops_least_recently_used_entries_first(tmp_path, monkeypatch):
+    vector_bytes = 4 * 8
+    cache = make_cache(tmp_path, monkeypatch, max_bytes=3 * vector_bytes)
+    for text in ("a", "b", "c", "d"):
+        cache.put("model", text, [1.0, 2.0, 3.0, 4.0])
+    cache.get("model", "a")
+
+    cache.evict()
+
+    assert cache.stats()["bytes"] == 3 * vector_bytes
+    assert cache.get("model", "b") is None
+    assert all(cache.get("model", text) is not None for text in ("a", "c", "d"))
+
+
+def test_eviction_runs_by_itself_after_enough_writes(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch, max_bytes=100 * 8)
+    texts = [f"text-{i}" for i in range(256)]
+    for i, text in enumerate(texts):
+        cache.put("model", text, [float(i)])
+
+    assert cache.stats()["bytes"] <= 100 * 8
+    assert cache.get("model", texts[255]) == [255.0]
+    assert cache.get("model", texts[0]) is None
@@ -0,0 +1,76 @@
+#tests/test_hybrid_retrieval.py
+import math
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import FakeEmbeddings
+
+from services.bm25_index import BM25Index, tokenize
+from services.hybrid_retrieval import hybrid_search, reciprocal_rank_fusion
+
+CHUNKS = {
+    "refunds": "Refunds are issued within 30 days of purchase.",
+    "shipping": "Shipping takes 5 business days; express shipping takes 2.",
+    "sku": "Product SKU-1042 is discontinued.",
+    "section": "Section 4.2.1 covers warranty claims for refunds.",
+}
+
+
+def make_index() -> BM25Index:
+    index = BM25Index()
+    for chunk_id, text in CHUNKS.items():
+        index.add(chunk_id, text)
+    return index
+
+
+def test_tokenize_keeps_identifiers_whole_and_as_parts():
+    assert tokenize("What is SKU-1042 in section 4.2.1?") == ["sku-1042", "sku", "1042", "section", "4.2.1", "4", "2", "1"]
+    assert tokenize("Refunds and shipments") == ["refund", "shipment"]
+
+
+def test_search_ranks_by_bm25():
+    index = make_index()
+    ranked = index.search("express shipping")
+    assert [chunk_id for chunk_id, _ in ranked] == ["shipping"]
+
+    n_docs, avg_length = len(CHUNKS), sum(len(tokenize(text)) for text in CHUNKS.values()) / len(CHUNKS)
+    shipping_length = len(tokenize(CHUNKS["shipping"]))
+
+    def term_score(tf, df):
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        return idf * tf * 2.5 / (tf + 1.5 * (0.25 + 0.75 * shipping_length / avg_length))
+
+    assert ranked[0][1] == pytest.approx(term_score(tf=1, df=1) + term_score(tf=2, df=1))
+
+
+def test_rarer_terms_weigh_more_and_allowed_restricts_results():
+    index = make_index()
+    assert [chunk_id for chunk_id, _ in index.search("refunds warranty")] == ["section", "refunds"]
+    assert [chunk_id for chunk_id, _ in index.search("refunds warranty", allowed={"refunds"})] == ["refunds"]
+    assert index.search("SKU-1042")[0][0] == "sku"
+
+
+def test_removed_chunks_are_no_longer_found():
+    index = make_index()
+    index.remove("sku")
+    index.remove("sku")
+    assert index.search("discontinued") == []
+    assert len(index) == 3
+
+
+def test_rrf_orders_by_summed_reciprocal_ranks():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "b", "d"]], rrf_k=60)
+    # c (first and third) edges out b (second twice): 1/61 + 1/63 > 2/62. Both beat single-list ids.
+    assert fused == ["c", "b", "a", "d"]
+    assert reciprocal_rank_fusion([["a", "b"], []], rrf_k=60) == ["a", "b"]
+
+
+def test_hybrid_search_fuses_vector_and_lexical_rankings():
+    ids = list(CHUNKS)
+    vectors = [[1.0 if i == j else 0.0 for j in range(len(ids))] for i in range(len(ids))]
+    store = FAISS.from_embeddings(list(zip(CHUNKS.values(), vectors)), FakeEmbeddings(size=len(ids)), ids=ids)
+
+    # The vector side points at "refunds", the lexical side at "sku".
+    results = hybrid_search(store, make_index(), "SKU-1042", vectors[0], k=2)
+    assert {doc.page_content for doc in results} == {CHUNKS["refunds"], CHUNKS["sku"]}
+    assert hybrid_search(store, None, "SKU-1042", vectors[0], k=1)[0].page_content == CHUNKS["refunds"]
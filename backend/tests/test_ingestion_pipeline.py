@@ -0,0 +1,134 @@
+#tests/test_ingestion_pipeline.py
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("langchain.prompts", reason="services.topic_extractor needs langchain")
+
+import services.ingestion_pipeline as ingestion_pipeline
+from core.config import settings
+from core.database import SessionLocal, engine
+from models.base_models import Base, IngestionJob, IngestionJobFile
+from services.ingestion_pipeline import _heartbeat, _outcome, claim_next_job, get_job, process_job
+
+
+@pytest.fixture(autouse=True)
+def tables():
+    Base.metadata.create_all(engine, tables=[IngestionJob.__table__, IngestionJobFile.__table__])
+    yield
+    Base.metadata.drop_all(engine, tables=[IngestionJobFile.__table__, IngestionJob.__table__])
+
+
+def add_job(job_id: str, stages=("queued",), created_at=None, **fields) -> str:
+    db = SessionLocal()
+    try:
+        job = IngestionJob(id=job_id, status="queued", created_at=created_at or datetime.utcnow(), **fields)
+        for i, stage in enumerate(stages):
+            job.files.append(IngestionJobFile(file_name=f"{job_id}-{i}.pdf", doc_id=f"{job_id}-doc-{i}", stage=stage))
+        db.add(job)
+        db.commit()
+    finally:
+        db.close()
+    return job_id
+
+
+def load(job_id: str) -> IngestionJob:
+    db = SessionLocal()
+    try:
+        return db.get(IngestionJob, job_id)
+    finally:
+        db.close()
+
+
+def test_jobs_are_claimed_oldest_first_and_only_once():
+    now = datetime.utcnow()
+    add_job("newer", created_at=now)
+    add_job("older", created_at=now - timedelta(minutes=1))
+
+    assert claim_next_job("worker-1") == "older"
+    assert claim_next_job("worker-2") == "newer"
+    assert claim_next_job("worker-3") is None
+
+    job = load("older")
+    assert (job.status, job.worker_id, job.attempts) == ("running", "worker-1", 1)
+    assert job.started_at is not None
+
+
+def test_stale_running_job_is_claimed_again_and_the_old_worker_loses_it():
+    add_job("job")
+    assert claim_next_job("worker-1") == "job"
+    assert claim_next_job("worker-2") is None
+
+    db = SessionLocal()
+    try:
+        stale = datetime.utcnow() - timedelta(seconds=settings.INGEST_JOB_STALE_SECONDS + 1)
+        db.query(IngestionJob).filter(IngestionJob.id == "job").update({IngestionJob.heartbeat_at: stale})
+        db.commit()
+    finally:
+        db.close()
+
+    assert claim_next_job("worker-2") == "job"
+    assert (load("job").worker_id, load("job").attempts) == ("worker-2", 2)
+    assert not _heartbeat("job", "worker-1")
+    assert _heartbeat("job", "worker-2")
+
+
+@pytest.fixture
+def prepared_files(monkeypatch):
+    """Every file 'reaches' the embedded stage at once; indexing is up to the test."""
+    monkeypatch.setattr(ingestion_pipeline, "_advance_file",
+                        lambda job_id, file_id, doc_id, *args: {"doc_id": doc_id})
+    monkeypatch.setattr(ingestion_pipeline.vectorstore_manager, "has_document", lambda doc_id: False)
+
+
+def test_failed_attempt_is_queued_for_retry_until_attempts_run_out(prepared_files, monkeypatch):
+    def commit_documents(documents):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ingestion_pipeline.vectorstore_manager, "commit_documents", commit_documents)
+    add_job("job")
+
+    for attempt in range(1, settings.INGEST_MAX_ATTEMPTS):
+        assert claim_next_job("worker") == "job"
+        process_job("job", "worker")
+        assert (load("job").status, load("job").attempts, load("job").error) == ("queued", attempt, "disk full")
+
+    assert claim_next_job("worker") == "job"
+    process_job("job", "worker")
+    assert load("job").status == "failed"
+
+    # Claimed again anyway (e.g. by a stale-job sweep): the job gives up instead of retrying forever.
+    db = SessionLocal()
+    try:
+        db.query(IngestionJob).filter(IngestionJob.id == "job").update({IngestionJob.status: "queued"})
+        db.commit()
+    finally:
+        db.close()
+    assert claim_next_job("worker") == "job"
+    process_job("job", "worker")
+    job = get_job("job")
+    assert job["status"] == "failed"
+    assert {file["stage"] for file in job["files"].values()} == {"failed"}
+
+
+def test_successful_job_indexes_every_prepared_file(prepared_files, monkeypatch):
+    committed = []
+    monkeypatch.setattr(ingestion_pipeline.vectorstore_manager, "commit_documents", committed.extend)
+    add_job("job", stages=("queued", "queued"))
+
+    assert claim_next_job("worker") == "job"
+    process_job("job", "worker")
+
+    job = get_job("job")
+    assert (job["status"], job["error"], job["progress"]) == ("completed", None, 1.0)
+    assert sorted(document["doc_id"] for document in committed) == ["job-doc-0", "job-doc-1"]
+
+
+@pytest.mark.parametrize("stages, expected", [
+    (("indexed", "indexed"), ("completed", None)),
+    (("indexed", "failed", "failed"), ("completed_with_errors", "2 of 3 files failed")),
+    (("failed", "failed"), ("failed", "none of the 2 files could be indexed")),
+])
+def test_outcome_reports_partial_and_total_failures(stages, expected):
+    add_job("job", stages=stages)
+    assert _outcome("job") == expected
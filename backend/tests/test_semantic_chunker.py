@@ -0,0 +1,164 @@
+#tests/test_semantic_chunker.py
+import numpy as np
+import pytest
+
+from services.semantic_chunker import LocalSemanticChunker, SENTENCE_END_RE, chunk_pages
+
+TOPICS = ("apple", "rocket", "ocean")
+
+
+class KeywordEmbeddings:
+    """Fake embedder: one dimension per topic keyword, so sentences about the same topic are close."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [[text.lower().count(word) + 0.01 for word in TOPICS] for text in texts]
+
+
+def topic_text(per_topic: int = 5) -> str:
+    sentences = []
+    for topic in TOPICS:
+        sentences += [f"The {topic} fact number {i} is here." for i in range(per_topic)]
+    return " ".join(sentences)
+
+
+def sentences_of(text: str):
+    return [sentence for sentence in SENTENCE_END_RE.split(text) if sentence]
+
+
+def make_chunker(**overrides) -> LocalSemanticChunker:
+    options = dict(breakpoint_percentile=80, max_chunk_chars=10000, min_chunk_chars=0,
+                   overlap_sentences=0, derive_vectors=False)
+    options.update(overrides)
+    return LocalSemanticChunker(KeywordEmbeddings(), **options)
+
+
+def test_chunks_are_ordered_spans_covering_every_sentence_once():
+    text = topic_text()
+    chunks = make_chunker().split_with_spans(text)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk["text"] == text[chunk["start"]:chunk["end"]]
+    assert [c["start"] for c in chunks] == sorted(c["start"] for c in chunks)
+    assert [s for c in chunks for s in sentences_of(c["text"])] == sentences_of(text)
+
+
+def test_breaks_follow_topic_shifts():
+    chunks = make_chunker().split_with_spans(topic_text())
+
+    assert len(chunks) == len(TOPICS)
+    for chunk, topic in zip(chunks, TOPICS):
+        counts = {word: chunk["text"].count(word) for word in TOPICS}
+        assert max(counts, key=counts.get) == topic
+
+
+def test_max_chunk_chars_caps_every_multi_sentence_chunk():
+    chunks = make_chunker(max_chunk_chars=80).split_with_spans(topic_text())
+
+    for chunk in chunks:
+        assert len(chunk["text"]) <= 80 or len(sentences_of(chunk["text"])) == 1
+    assert [s for c in chunks for s in sentences_of(c["text"])] == sentences_of(topic_text())
+
+
+def test_small_chunks_are_merged_forward_up_to_the_cap():
+    text = topic_text()
+    assert [c["text"] for c in make_chunker(min_chunk_chars=len(text)).split_with_spans(text)] == [text]
+
+    capped = make_chunker(min_chunk_chars=len(text), max_chunk_chars=200).split_with_spans(text)
+    assert len(capped) > 1
+    assert all(len(c["text"]) <= 200 for c in capped)
+
+
+def test_short_text_is_one_chunk_without_embedding_calls():
+    chunker = make_chunker()
+    assert chunker.split_with_spans("Only one sentence here. And a second one.") == [
+        {"text": "Only one sentence here. And a second one.", "start": 0, "end": 41}
+    ]
+    assert chunker.embeddings.calls == 0
+    assert chunker.split_with_spans("   ") == []
+
+
+def test_overlap_repeats_previous_sentences_and_derived_vectors_cover_them():
+    text = topic_text()
+    chunker = make_chunker(overlap_sentences=1, derive_vectors=True)
+    chunks = chunker.split_with_spans(text)
+    plain = make_chunker().split_with_spans(text)
+
+    assert len(chunks) == len(plain) > 1
+    for previous, chunk in zip(plain, chunks[1:]):
+        assert chunk["text"].startswith(sentences_of(previous["text"])[-1])
+        assert chunk["end"] == plain[chunks.index(chunk)]["end"]
+
+    spans = chunker.sentence_spans(text)
+    vectors = chunker.sentence_vectors([text[start:end] for start, end in spans])
+    for chunk in chunks:
+        first = next(i for i, (start, _) in enumerate(spans) if start == chunk["start"])
+        last = next(i for i, (_, end) in enumerate(spans) if end == chunk["end"]) + 1
+        expected = LocalSemanticChunker.chunk_vector(vectors[first:last], spans[first:last])
+        np.testing.assert_allclose(chunk["vector"], expected, rtol=1e-5)
+
+
+def test_chunk_vector_is_length_weighted_mean_rescaled_to_mean_norm():
+    vectors = np.array([[3.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    spans = [(0, 30), (30, 40)]
+    mean = (vectors[0] * 30 + vectors[1] * 10) / 40
+
+    result = LocalSemanticChunker.chunk_vector(vectors, spans)
+
+    np.testing.assert_allclose(result / np.linalg.norm(result), mean / np.linalg.norm(mean), rtol=1e-6)
+    assert np.linalg.norm(result) == pytest.approx(2.0)
+
+
+def paged_sentences():
+    pages = []
+    for number, topic in enumerate(TOPICS * 2, start=1):
+        pages.append((number, " ".join(f"Page {number} {topic} fact {i} is here." for i in range(4))))
+    return pages
+
+
+@pytest.mark.parametrize("window_chars", [50, 300, 100000])
+def test_chunk_pages_carries_the_window_without_losing_or_repeating_text(window_chars):
+    pages = paged_sentences() + [(7, "   ")]
+    chunks = list(chunk_pages(pages, window_chars=window_chars, chunker=make_chunker()))
+
+    expected = [s for _, text in pages for s in sentences_of(text.strip())]
+    assert [s for c in chunks for s in sentences_of(c["text"])] == expected
+    for chunk in chunks:
+        numbers = [int(s.split()[1]) for s in sentences_of(chunk["text"])]
+        assert (chunk["page"], chunk["page_end"]) == (numbers[0], numbers[-1])
+        assert "vector" not in chunk
+
+
+def test_chunk_pages_passes_derived_vectors_through():
+    chunks = list(chunk_pages(paged_sentences(), window_chars=300, chunker=make_chunker(derive_vectors=True)))
+    assert chunks and all(len(chunk["vector"]) == len(TOPICS) for chunk in chunks)
+
+
+class WholeTextChunker:
+    """Never finds a break, so chunk_pages has to fall back to flushing the whole window."""
+
+    def split_with_spans(self, text):
+        return [{"text": text, "start": 0, "end": len(text)}]
+
+
+def test_chunk_pages_flushes_an_unbreakable_window_before_reading_every_page():
+    consumed = []
+
+    def pages():
+        for number in range(1, 21):
+            consumed.append(number)
+            yield number, "x" * 30
+
+    stream = chunk_pages(pages(), window_chars=50, chunker=WholeTextChunker())
+    first = next(stream)
+
+    assert len(consumed) < 20
+    assert len(first["text"]) >= 4 * 50
+    assert (first["page"], first["page_end"]) == (1, consumed[-1])
+    rest = list(stream)
+    assert sum(c["text"].count("x") for c in [first] + rest) == 20 * 30
+    assert rest[-1]["page_end"] == 20
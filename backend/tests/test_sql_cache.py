@@ -0,0 +1,64 @@
+#tests/test_sql_cache.py
+import pytest
+from sqlalchemy import create_engine, text
+
+from services.sql_cache import SQLResultCache, normalize_question, question_literals, sql_literals
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'orders.db'}")
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE "orders" (id INTEGER PRIMARY KEY, region TEXT)'))
+        conn.execute(text("INSERT INTO orders (region) VALUES ('Europe'), ('Asia')"))
+    return engine
+
+
+def make_cache(engine, **options) -> SQLResultCache:
+    settings = dict(ttl_seconds=600, plan_threshold=0.9, max_entries=10, version_check_seconds=0)
+    settings.update(options)
+    return SQLResultCache(engine, ["orders"], **settings)
+
+
+def test_questions_are_keyed_case_whitespace_and_punctuation_insensitively(engine):
+    assert normalize_question("  How many ORDERS,   per region? ") == "how many orders per region"
+    assert normalize_question("total_sales by month!") == "total_sales by month"
+
+    cache = make_cache(engine)
+    cache.put("How many orders per region?", None, None, "2 regions")
+    assert cache.get("how many orders  per REGION")["output"] == "2 regions"
+    assert cache.get("how many orders per country") is None
+
+
+def test_literals_come_from_numbers_quotes_and_sql_values():
+    assert question_literals('Top 5 customers in "Europe" for 2023') == {"5", "europe", "2023"}
+    assert sql_literals("SELECT * FROM orders WHERE region = 'Europe' AND name LIKE '%foo%' LIMIT 5") == {"europe", "foo", "5"}
+
+
+def test_table_change_invalidates_entries(engine):
+    cache = make_cache(engine)
+    cache.put("how many orders", [1.0, 0.0], "SELECT COUNT(*) FROM orders", "2")
+    assert cache.get("how many orders") is not None
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO orders (region) VALUES ('Africa')"))
+
+    assert cache.get("how many orders") is None
+    assert cache.find_plan([1.0, 0.0], "how many orders") is None
+
+
+def test_entries_expire_after_the_ttl(engine):
+    cache = make_cache(engine, ttl_seconds=0)
+    cache.put("how many orders", None, None, "2")
+    assert cache.get("how many orders") is None
+
+
+def test_plan_is_only_reused_for_the_same_literals(engine):
+    cache = make_cache(engine)
+    cache.put("orders in Europe", [1.0, 0.0], "SELECT COUNT(*) FROM orders WHERE region = 'Europe'", "1")
+
+    assert cache.find_plan([1.0, 0.0], "number of orders in europe")["sql"].endswith("'Europe'")
+    assert cache.find_plan([1.0, 0.0], "orders in Asia") is None
+    assert cache.find_plan([0.0, 1.0], "orders in Europe") is None
+    stats = cache.stats()
+    assert (stats["plan_hits"], stats["misses"]) == (1, 2)
@@ -0,0 +1,49 @@
+#tests/test_sql_validation.py
+import pytest
+from sqlalchemy import create_engine, text
+
+from services.sql_validation import clean_sql, validate_sql
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'orders.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE orders (id INTEGER PRIMARY KEY, region TEXT, amount REAL)"))
+    return engine
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT region, SUM(amount) FROM orders GROUP BY region",
+    "SELECT * FROM orders WHERE region LIKE '%rope%'",
+    "WITH totals AS (SELECT region, SUM(amount) AS total FROM orders GROUP BY region) SELECT * FROM totals",
+])
+def test_read_only_queries_are_valid(engine, sql):
+    assert validate_sql(sql, engine) is None
+
+
+@pytest.mark.parametrize("sql", [
+    "INSERT INTO orders (region) VALUES ('Europe')",
+    "UPDATE orders SET amount = 0",
+    "DELETE FROM orders",
+    "DROP TABLE orders",
+    "CREATE TABLE copy AS SELECT * FROM orders",
+    "ALTER TABLE orders ADD COLUMN note TEXT",
+    "WITH gone AS (DELETE FROM orders RETURNING id) SELECT * FROM gone",
+])
+def test_writes_are_rejected(engine, sql):
+    assert validate_sql(sql, engine) == "Error: Only read-only SELECT queries are allowed."
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT name FROM sqlite_master WHERE name = 'orders'")).scalar() == "orders"
+
+
+def test_more_than_one_statement_is_rejected(engine):
+    assert validate_sql("SELECT 1; DROP TABLE orders", engine) == "Error: Provide exactly one SQL statement."
+
+
+def test_database_errors_are_reported_for_the_agent(engine):
+    assert "no such column" in validate_sql("SELECT missing FROM orders", engine)
+
+
+def test_clean_sql_strips_markdown_fences():
+    assert clean_sql("```sql\nSELECT 1;\n```") == "SELECT 1"
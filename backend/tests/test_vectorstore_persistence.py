@@ -0,0 +1,143 @@
+#tests/test_vectorstore_persistence.py
+import multiprocessing
+import os
+
+from services.vectorstore_persistence import VectorStoreJournal, JOURNAL_DIR
+
+WRITERS = 4
+ENTRIES_PER_WRITER = 15
+
+
+def _no_index(vectorstore, path):
+    pass
+
+
+def _writer(root: str, writer: int, results):
+    """Appends entries and compacts after every few of them, like API and ingestion workers do."""
+    journal = VectorStoreJournal(root)
+    seqs = []
+    for i in range(ENTRIES_PER_WRITER):
+        seqs.append(journal.append("add", f"doc-{writer}-{i}", {"ids": [], "vectors": []}))
+        if i % 3 == 2:
+            journal.write_snapshot(None, {"writer": writer}, seqs[-1], save_index=_no_index)
+    results.put(seqs)
+
+
+def test_concurrent_appends_and_compactions_lose_no_entries(tmp_path):
+    root = str(tmp_path)
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_writer, args=(root, writer, results)) for writer in range(WRITERS)]
+    for process in processes:
+        process.start()
+    seqs = [seq for _ in processes for seq in results.get(timeout=60)]
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    total = WRITERS * ENTRIES_PER_WRITER
+    assert sorted(seqs) == list(range(1, total + 1))
+
+    journal = VectorStoreJournal(root)
+    snapshot_dir, snapshot_seq = journal.current_snapshot()
+    assert os.path.isdir(snapshot_dir)
+    # Every entry is either covered by the live snapshot or still in the journal.
+    remaining = [seq for seq, _ in journal.entries_after(snapshot_seq)]
+    assert remaining == list(range(snapshot_seq + 1, total + 1))
+    assert journal.last_seq() == total
+    snapshots = [entry for entry in os.listdir(root) if entry.startswith("snapshot-")]
+    assert snapshots == [os.path.basename(snapshot_dir)]
+
+
+def test_older_snapshot_does_not_replace_newer_one(tmp_path):
+    journal = VectorStoreJournal(str(tmp_path))
+    for i in range(12):
+        journal.append("add", f"doc-{i}", {})
+
+    assert journal.write_snapshot(None, {"seq": 12}, 12, save_index=_no_index)
+    assert not journal.write_snapshot(None, {"seq": 10}, 10, save_index=_no_index)
+
+    snapshot_dir, snapshot_seq = journal.current_snapshot()
+    assert snapshot_seq == 12
+    assert os.path.isdir(snapshot_dir)
+    assert os.listdir(os.path.join(str(tmp_path), JOURNAL_DIR)) == []
+    assert journal.append("add", "doc-12", {}) == 13
+
+
+def test_overwrite_replaces_snapshot_at_same_seq(tmp_path):
+    journal = VectorStoreJournal(str(tmp_path))
+    journal.append("add", "doc-0", {})
+    assert journal.write_snapshot(None, {"version": 1}, 1, save_index=_no_index)
+    assert not journal.write_snapshot(None, {"version": 2}, 1, save_index=_no_index)
+    assert journal.write_snapshot(None, {"version": 2}, 1, save_index=_no_index, overwrite=True)
+    _, metadata, seq = journal.load_snapshot(embedding=None)
+    assert (metadata, seq) == ({"version": 2}, 1)
+
+
+def test_entries_between_reports_entries_compacted_after_the_snapshot_was_read(tmp_path):
+    root = str(tmp_path)
+    reader, writer = VectorStoreJournal(root), VectorStoreJournal(root)
+    for i in range(3):
+        writer.append("add", f"doc-{i}", {"i": i})
+    applied_seq = 1
+
+    # refresh() reads the snapshot seq first and the journal afterwards; compact in between.
+    _, snapshot_seq = reader.current_snapshot()
+    assert snapshot_seq <= applied_seq
+    assert writer.write_snapshot(None, {}, 3, save_index=_no_index)
+    writer.append("add", "doc-3", {"i": 3})
+
+    assert reader.entries_between(applied_seq) is None
+    assert [seq for seq, _ in reader.entries_between(3)] == [4]
+
+
+def test_entries_between_reports_entries_compacted_while_they_are_read(tmp_path):
+    root = str(tmp_path)
+    reader, writer = VectorStoreJournal(root), VectorStoreJournal(root)
+    for i in range(4):
+        writer.append("add", f"doc-{i}", {"i": i})
+    list_files = reader._journal_files
+
+    def list_then_compact():
+        files = list_files()
+        writer.write_snapshot(None, {}, 4, save_index=_no_index)
+        return files
+
+    reader._journal_files = list_then_compact
+    assert reader.entries_between(1) is None
+    assert reader.entries_between(1, before_seq=3) is None
+
+
+def test_entries_between_checks_the_range_before_a_commit(tmp_path):
+    journal = VectorStoreJournal(str(tmp_path))
+    for i in range(5):
+        journal.append("add", f"doc-{i}", {"i": i})
+
+    assert [entry["i"] for _, entry in journal.entries_between(1, before_seq=4)] == [1, 2]
+    assert journal.entries_between(4, before_seq=5) == []
+    os.remove(next(path for seq, path in journal._journal_files() if seq == 3))
+    assert journal.entries_between(1, before_seq=5) is None
+
+
+def test_load_snapshot_retries_when_a_compaction_removes_it_meanwhile(tmp_path):
+    root = str(tmp_path)
+    reader, writer = VectorStoreJournal(root), VectorStoreJournal(root)
+
+    def save_index(vectorstore, path):
+        open(os.path.join(path, "index.faiss"), "w").close()
+
+    for i in range(2):
+        writer.append("add", f"doc-{i}", {})
+    assert writer.write_snapshot("index", {"seq": 1}, 1, save_index=save_index)
+    writer.append("add", "doc-2", {})
+    loaded_from = []
+
+    def load_index(path, embedding):
+        if not loaded_from:
+            assert writer.write_snapshot("index", {"seq": 2}, 2, save_index=save_index)
+        loaded_from.append(os.path.basename(path))
+        with open(os.path.join(path, "index.faiss")):
+            return "index"
+
+    assert reader.load_snapshot(embedding=None, load_index=load_index) == ("index", {"seq": 2}, 2)
+    assert loaded_from == ["snapshot-000000000001", "snapshot-000000000002"]